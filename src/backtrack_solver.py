@@ -1,5 +1,9 @@
 # from abc import ABC, abstractmethod
 from solver import Solver
+from deadlines import check_deadline
+from search_engine import SearchEngine
+from solve_trace import GridRenderer, finished, show
+from stats import phase
 
 
 class BacktrackSolver(Solver):
@@ -7,47 +11,180 @@ class BacktrackSolver(Solver):
     This method is pretty much a depth-first search. """
 
     @staticmethod
-    def solve(filename="game.txt", show_solving=False):
+    def solve(filename="game.txt", show_solving=False, ordering="row-major", forward_checking=False, stats=None):
         """ Solve the sudoku at filename and return it.
         Parameters:
             filename (string): filename that sudoku is saved in
             show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            ordering (string): which cell to branch on next, one of search_engine.ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+            stats (SolveStats): stats to fill in, None for no stats
         Returns:
             sudoku (Board): The solved sudoku (or None if not possible)
         """
-        board = BacktrackSolver.get_board(filename)
-        BacktrackSolver.backtrack(board, (-1, 0), show_solving)
+        board = BacktrackSolver.get_board(filename, stats=stats)
+        return BacktrackSolver.solve_board(board, show_solving, ordering, forward_checking, stats)
+
+    @staticmethod
+    def solve_board(board, show_solving=False, ordering="row-major", forward_checking=False, stats=None):
+        """ Solve the already loaded sudoku in place and return it.
+        Plain row-major backtracking works on the board itself, the other orderings and forward checking
+        search with a SearchEngine. The solving is shown from the SearchEngine's trace (see trace).
+        Parameters:
+            board (Board): sudoku to solve, with its candidates filled in
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            ordering (string): which cell to branch on next, one of search_engine.ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            sudoku (Board): The solved sudoku
+        """
+        if show_solving:
+            show(BacktrackSolver.trace(board, ordering, forward_checking, stats), board)
+            return board
+        with phase(stats, "search", board):
+            if ordering == "row-major" and not forward_checking:
+                BacktrackSolver.backtrack(board, (-1, 0), stats=stats)
+            else:
+                BacktrackSolver.search(board, ordering, forward_checking, stats)
         return board
 
     @staticmethod
-    def backtrack(board, last_pos, show_solving=False):
+    def search(board, ordering="mrv", forward_checking=False, stats=None):
+        """ Solve the board with a SearchEngine, leaving it untouched if there is no solution.
+        Parameters:
+            board (Board): sudoku to solve, with its candidates filled in
+            ordering (string): which cell to branch on next, one of search_engine.ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+            stats (SolveStats): stats to record the search's nodes, backtracks and depth in, None for no stats
+        Returns:
+            valid (boolean): Whether it was solved or not
+        """
+        engine = SearchEngine(board, ordering, forward_checking)
+        solved = engine.search()
+        if stats is not None:
+            stats.add_search(engine.nodes, engine.backtracks, engine.max_depth)
+        if not solved:
+            return False
+        engine.write_to(board)
+        return True
+
+    @staticmethod
+    def trace(board, ordering="row-major", forward_checking=False, stats=None, slice_nodes=256):
+        """ Solve the already loaded sudoku in place like solve_board, yielding each step as it goes.
+        The search runs with a SearchEngine, slice_nodes nodes at a time, and the steps of each slice are
+        yielded before the next, so they come out while it runs and few are held at once.
+        Parameters:
+            board (Board): sudoku to solve, with its candidates filled in
+            ordering (string): which cell to branch on next, one of search_engine.ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+            stats (SolveStats): stats to fill in, None for no stats
+            slice_nodes (int): search nodes between handing out steps
+        Returns:
+            steps (generator): a solve_trace.Step for every guess ("place", rule "branch") and every guess taken
+                back ("undo", rule "backtrack"), then a last "solved" or "unsolved" step
+        """
+        with phase(stats, "search", board):
+            engine = SearchEngine(board, ordering, forward_checking)
+            engine.trace = steps = []
+        searching = True
+        while searching:
+            with phase(stats, "search", board):
+                searching = not engine.run(slice_nodes)
+            check_deadline()
+            yield from steps
+            steps.clear()
+        with phase(stats, "search", board):
+            engine.write_to(board)
+        if stats is not None:
+            stats.add_search(engine.nodes, engine.backtracks, engine.max_depth)
+        yield finished(board)
+
+    @staticmethod
+    def count_solutions(board, limit=2, ordering="mrv", forward_checking=True):
+        """ Count the solutions of the board, stopping as soon as limit of them are found.
+        A limit of 2 is enough to tell whether the solution is unique. The board isn't changed.
+        Parameters:
+            board (Board): sudoku to count the solutions of, with its candidates filled in
+            limit (int): most solutions to look for
+            ordering (string): which cell to branch on next, one of search_engine.ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+        Returns:
+            count (int): number of solutions found, at most limit
+        """
+        return SearchEngine(board, ordering, forward_checking).count_solutions(limit)
+
+    @staticmethod
+    def has_unique_solution(board):
+        """ Does the board have exactly one solution?
+        Parameters:
+            board (Board): sudoku to check, with its candidates filled in
+        Returns:
+            unique (bool): whether there is exactly one solution
+        """
+        return BacktrackSolver.count_solutions(board, 2) == 1
+
+    @staticmethod
+    def backtrack(board, last_pos, show_solving=False, stats=None, depth=0):
         """ Given the game board, solve it with backtracking
+        The cells being tried are kept on a stack rather than recursing, so big boards don't run into
+        the recursion limit.
         Parameters:
             board (Board): game board to backtrack from
             last_pos (tuple): last searched coordinate
             show_solving (boolean): Spit out each iteration of the board to the console?
+            stats (SolveStats): stats to count nodes, backtracks and depth in, None for no stats
+            depth (int): how many cells the backtracking has filled in so far
         Returns:
             valid (boolean): Whether it was solved or not
         """
+        stack = []  # Frames of [x, y, candidates, how many candidates have been tried]
+        nodes = 0
+        renderer = None
         if show_solving:
-            print(board, end="\n"+"="*21+"\n")  # Print board out with a line of equal signs below it
+            renderer = GridRenderer(board.n)
+            renderer.load(board)
+        while True:
+            if show_solving:
+                # Print board out with a line of equal signs below it
+                print(renderer.render(), end="\n" + "=" * renderer.line_width + "\n")
 
-        next_blank = BacktrackSolver.get_next_blank(board, last_pos)
-        if next_blank is None:  # No more blanks = we complete
-            return True
-        else:
+            next_blank = BacktrackSolver.get_next_blank(board, last_pos)
+            if next_blank is None:  # No more blanks = we complete
+                return True
             x, y = next_blank
-        candidates = board.get_board_item(x, y)
-
-        for candidate in candidates:
-            board.set_board_item(candidate, x, y)
-            if board.is_valid():
-                if BacktrackSolver.backtrack(board, (x, y), show_solving):
-                    return True
+            nodes += 1
+            if not nodes & 1023:
+                check_deadline()
+            if stats is not None:
+                stats.add_search(1, 0, depth + len(stack))
+            stack.append([x, y, board.get_board_item(x, y), 0])
 
-        # If this code is reached, then this branch is a failure
-        board.set_board_item(candidates, x, y)
-        return False
+            # Try the next candidate of the cell on top of the stack, going back up it as cells run out
+            while stack:
+                frame = stack[-1]
+                x, y, candidates, tried = frame
+                while tried < len(candidates):
+                    board.set_board_item(candidates[tried], x, y)
+                    tried += 1
+                    if board.is_valid():
+                        break
+                else:
+                    # If this code is reached, then this branch is a failure
+                    board.set_board_item(candidates, x, y)
+                    if show_solving:
+                        renderer.set(x + y * board.size, 0)
+                    if stats is not None:
+                        stats.backtracks += 1
+                    stack.pop()
+                    continue
+                frame[3] = tried
+                last_pos = x, y
+                if show_solving:
+                    renderer.set(x + y * board.size, candidates[tried - 1])
+                break
+            else:
+                return False
 
     @staticmethod
     def get_next_blank(board, last_pos):
@@ -59,11 +196,12 @@ class BacktrackSolver(Solver):
             position (tuple): first blank pos after last_pos. None is returned if the board is full
         """
         x, y = last_pos
-        while not (y >= 8 and x >= 8):
+        last = board.size - 1
+        while not (y >= last and x >= last):
             x += 1
-            if x >= 9:  # New line
+            if x > last:  # New line
                 y += 1
-                x -= 9
+                x -= board.size
             if type(board.get_board_item(x, y)) == list:
                 return x, y
         return None
@@ -79,8 +217,8 @@ if __name__ == "__main__":
     print(solved_board)
     print("Completed in {}s".format(round(end_time - start_time, 3)))
 
-    for y in range(9):
-        for x in range(9):
+    for y in range(solved_board.size):
+        for x in range(solved_board.size):
             print(solved_board.get_board_item(x, y), end="")
         print()
 
@@ -0,0 +1,272 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from solver import Solver
+from backtrack_solver import BacktrackSolver
+from constraint_solver import ConstraintSolver
+from constraint_backtrack_solver import ConstraintBacktrackSolver
+from dlx_solver import DLXSolver
+from packed_corpus import PackedCorpus, PackedCorpusWriter, is_packed
+from portfolio_solver import PortfolioSolver
+from solver_session import SessionSolver
+from solution_cache import SolutionCache
+from stats import SolveStats
+
+SOLVERS = {
+    "backtrack": BacktrackSolver,
+    "constraint": ConstraintSolver,
+    "constraint_backtrack": ConstraintBacktrackSolver,
+    "dlx": DLXSolver,
+    "portfolio": PortfolioSolver,
+    "session": SessionSolver,
+}
+
+
+def read_puzzles(file):
+    """ Stream the puzzles out of an open file, one at a time.
+    Each puzzle is a line of 81 characters, "." or "0" for blanks (or any other format Board.load_string takes,
+    as long as it fits on a line).
+    Empty lines and lines starting with "#" are skipped.
+    Parameters:
+        file (file): file to read from
+    Returns:
+        puzzles (generator): the puzzle strings
+    """
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def solve_puzzle(puzzle, solver=ConstraintBacktrackSolver, stats=None):
+    """ Solve a single puzzle string.
+    Parameters:
+        puzzle (string): the cells row by row, "." or "0" for blanks (see Board.load_string)
+        solver (type): solver class to solve it with
+        stats (SolveStats): stats to fill in, None for no stats
+    Returns:
+        solution (string): the solved puzzle, as a string in the same layout
+    """
+    board = Solver.get_board_from_string(puzzle, stats=stats)
+    if stats is None:
+        return solver.solve_board(board).to_string()
+    return solver.solve_board(board, stats=stats).to_string()
+
+
+def solve_batch(puzzles, solver=ConstraintBacktrackSolver, cache=None, record_stats=None):
+    """ Lazily solve every puzzle in puzzles.
+    Parameters:
+        puzzles (iterable): puzzle strings
+        solver (type): solver class to solve them with
+        cache (SolutionCache): cache to look the puzzles up in first, None to always solve them
+        record_stats (function): called with the SolveStats of each puzzle solved, None for no stats
+            (puzzles answered from the cache aren't solved, so have no stats)
+    Returns:
+        solutions (generator): the solution strings, in the same order as the puzzles
+    """
+    for puzzle in puzzles:
+        if cache is not None:
+            solution = cache.get(puzzle) if len(puzzle) == 81 else None
+            if solution is not None:
+                yield solution
+                continue
+        if record_stats is None:
+            solution = solve_puzzle(puzzle, solver)
+        else:
+            stats = SolveStats()
+            solution = solve_puzzle(puzzle, solver, stats)
+            record_stats(stats)
+        if cache is not None and len(puzzle) == 81 and "." not in solution:
+            cache.put(puzzle, solution)
+        yield solution
+
+
+def _solve_chunk(solver_name, chunk, with_stats=False):
+    """ Solve a chunk of puzzles in a worker process.
+    Puzzles come in and solutions go out packed in one bytes object, a line each,
+    so little has to be pickled between the processes.
+    Parameters:
+        solver_name (string): key of the solver in SOLVERS
+        chunk (bytes): the packed puzzles
+        with_stats (bool): whether to send back the SolveStats of each puzzle too
+    Returns:
+        solutions (bytes): the packed solutions, in the same order
+        stats (list): the SolveStats of each puzzle, in the same order (only returned with_stats)
+    """
+    solver = SOLVERS[solver_name]
+    puzzles = chunk.decode("ascii").split("\n")
+    if not with_stats:
+        return "\n".join(solve_puzzle(puzzle, solver) for puzzle in puzzles).encode("ascii")
+    stats = [SolveStats() for _ in puzzles]
+    solutions = [solve_puzzle(puzzle, solver, puzzle_stats) for puzzle, puzzle_stats in zip(puzzles, stats)]
+    return "\n".join(solutions).encode("ascii"), stats
+
+
+def solve_parallel(puzzles, solver_name="constraint_backtrack", workers=None, chunk_size=256, min_parallel=1024,
+                   cache=None, record_stats=None):
+    """ Lazily solve every puzzle in puzzles across a pool of worker processes.
+    The puzzles are sent to the workers in chunks and only a few chunks per worker are in flight at once,
+    so puzzles can be streamed through without reading them all into memory.
+    If there are fewer than min_parallel puzzles they are solved in this process instead.
+    With a cache, each chunk's puzzles are looked up in this process before it's sent, only the misses go to
+    the workers, and their solutions are cached as they come back.
+    Parameters:
+        puzzles (iterable): puzzle strings
+        solver_name (string): key of the solver in SOLVERS
+        workers (int): number of worker processes, defaults to the number of cpus
+        chunk_size (int): number of puzzles sent to a worker at a time
+        min_parallel (int): smallest number of puzzles worth starting the pool for
+        cache (SolutionCache): cache to look the puzzles up in first, None to always solve them
+        record_stats (function): called in this process with the SolveStats of each puzzle solved, in order,
+            None for no stats (see solve_batch)
+    Returns:
+        solutions (generator): the solution strings, in the same order as the puzzles
+    """
+    solver = SOLVERS[solver_name]
+    puzzles = iter(puzzles)
+    head = list(itertools.islice(puzzles, min_parallel))
+    workers = workers or os.cpu_count() or 1
+    if len(head) < min_parallel or workers == 1:
+        yield from solve_batch(itertools.chain(head, puzzles), solver, cache, record_stats)
+        return
+
+    puzzles = itertools.chain(head, puzzles)
+    del head
+    pending = deque()
+    with multiprocessing.Pool(workers) as pool:
+        while True:
+            # Keep every worker busy with a couple of chunks queued up behind it
+            while len(pending) < workers * 2:
+                chunk = list(itertools.islice(puzzles, chunk_size))
+                if not chunk:
+                    break
+                solutions = [None, ] * len(chunk)
+                if cache is not None:
+                    solutions = [cache.get(puzzle) if len(puzzle) == 81 else None for puzzle in chunk]
+                misses = [puzzle for puzzle, solution in zip(chunk, solutions) if solution is None]
+                result = None
+                if misses:
+                    result = pool.apply_async(_solve_chunk, (solver_name, "\n".join(misses).encode("ascii"),
+                                                             record_stats is not None))
+                pending.append((chunk, solutions, result))
+            if not pending:
+                break
+            chunk, solutions, result = pending.popleft()
+            if result is not None:
+                packed = result.get()
+                if record_stats is not None:
+                    packed, stats = packed
+                    for puzzle_stats in stats:
+                        record_stats(puzzle_stats)
+                solved = iter(packed.decode("ascii").split("\n"))
+                for index, puzzle in enumerate(chunk):
+                    if solutions[index] is None:
+                        solution = solutions[index] = next(solved)
+                        if cache is not None and len(puzzle) == 81 and "." not in solution:
+                            cache.put(puzzle, solution)
+            yield from solutions
+
+
+def main(argv=None):
+    """ Solve every puzzle in a file and write the solutions out, one per line. """
+    parser = argparse.ArgumentParser(description="Solve a file of sudokus, one puzzle per line "
+                                                 "(81 characters for 9x9, 256 for 16x16), or a packed corpus.")
+    parser.add_argument("input", help="file of puzzles (text or a packed corpus), - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="file to write the solutions to, - for stdout")
+    parser.add_argument("--packed", action="store_true",
+                        help="append the solutions to the output as a packed corpus (see packed_corpus.py)")
+    parser.add_argument("-s", "--solver", choices=sorted(SOLVERS), default="constraint_backtrack",
+                        help="solver to use")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="number of worker processes, 0 for one per cpu (default 1, solve in this process)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=256,
+                        help="number of puzzles sent to a worker process at a time")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="fill in singles for a whole batch of puzzles at once with numpy before searching")
+    parser.add_argument("--batch-size", type=int, default=4096,
+                        help="number of puzzles in each --vectorized batch")
+    parser.add_argument("--cache-size", type=int, default=0,
+                        help="remember up to this many solutions, so repeated (or equivalent) puzzles aren't solved again")
+    parser.add_argument("--cache-file", help="file to keep the solution cache in between runs (implies --cache-size)")
+    parser.add_argument("--stats", metavar="FILE",
+                        help="write each puzzle's solver stats to FILE as a line of JSON, and the totals to stderr "
+                             "(- for just the totals)")
+    args = parser.parse_args(argv)
+    if args.packed and args.output == "-":
+        parser.error("--packed needs an output file")
+    if args.vectorized and (args.cache_size or args.cache_file):
+        parser.error("--vectorized can't be used with the solution cache")
+    if args.vectorized and args.workers != 1:
+        parser.error("--vectorized solves in this process, it can't be used with --workers")
+    if args.vectorized and args.stats:
+        parser.error("--vectorized doesn't keep solver stats, it can't be used with --stats")
+
+    if args.input != "-" and is_packed(args.input):
+        input_file = PackedCorpus(args.input)
+        puzzles = input_file.puzzles()
+    else:
+        input_file = sys.stdin if args.input == "-" else open(args.input, "r")
+        puzzles = read_puzzles(input_file)
+    if args.packed:
+        output_file = PackedCorpusWriter(args.output)
+        write_solution = output_file.append_string
+    else:
+        output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+
+        def write_solution(solution):
+            output_file.write(solution + "\n")
+    cache = None
+    if args.cache_size or args.cache_file:
+        cache = SolutionCache(args.cache_size or 100000, args.cache_file)
+    total_stats = None
+    stats_file = None
+    record_stats = None
+    if args.stats:
+        total_stats = SolveStats.aggregate(())
+        if args.stats != "-":
+            stats_file = open(args.stats, "w")
+
+        def record_stats(stats):
+            total_stats.merge(stats)
+            if stats_file is not None:
+                stats_file.write(stats.to_json() + "\n")
+    solved = 0
+    start_time = time.time()
+    try:
+        if args.vectorized:
+            from vectorized import solve_vectorized  # Only this mode needs numpy
+            solutions = solve_vectorized(puzzles, SOLVERS[args.solver], args.batch_size)
+        elif args.workers == 1:
+            solutions = solve_batch(puzzles, SOLVERS[args.solver], cache, record_stats)
+        else:
+            solutions = solve_parallel(puzzles, args.solver, args.workers or None, args.chunk_size, cache=cache,
+                                       record_stats=record_stats)
+        for solution in solutions:
+            write_solution(solution)
+            solved += 1
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+        if cache is not None:
+            cache.close()
+        if stats_file is not None:
+            stats_file.close()
+    elapsed = time.time() - start_time
+
+    rate = solved / elapsed if elapsed > 0 else 0.0
+    print("Solved {} puzzles in {}s ({} puzzles/s)".format(solved, round(elapsed, 3), round(rate, 1)),
+          file=sys.stderr)
+    if cache is not None:
+        print("Cache: {} hits, {} misses".format(cache.hits, cache.misses), file=sys.stderr)
+    if total_stats is not None:
+        print(total_stats.to_json(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from solver import Solver
+from engines import ENGINES, EngineTimeout, register_engine, run_engine, verify
+from portfolio_solver import PortfolioSolver
+
+CORPORA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpora")
+CORPORA = ("easy", "hard", "17clue", "pathological")
+# Solve times a result needs before its p95 is compared, a p95 of fewer is little more than the slowest puzzle
+MIN_TAIL_SAMPLES = 50
+
+register_engine("portfolio", PortfolioSolver)
+
+
+def load_corpus(name):
+    """ Read one of the bundled corpora (or any file of puzzles, one per line).
+    Parameters:
+        name (string): one of CORPORA, or the path of a file
+    Returns:
+        puzzles (list): the puzzle strings
+    """
+    path = name if os.path.exists(name) else os.path.join(CORPORA_DIRECTORY, name + ".txt")
+    with open(path, "r") as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+
+def run_one(engine, puzzle, timeout=None):
+    """ Solve one puzzle with an engine and time it.
+    Parameters:
+        engine (string): key of the engine in ENGINES
+        puzzle (string): puzzle to solve
+        timeout (float): seconds to give up after, None for no limit (see engines.run_engine)
+    Returns:
+        seconds (float): how long it took
+        outcome (string): "solved", "wrong" (no or an incorrect solution) or "timeout"
+    """
+    start = time.perf_counter()
+    try:
+        board = Solver.get_board_from_string(puzzle)
+        solution = run_engine(engine, board, timeout).to_string()
+    except EngineTimeout:
+        return time.perf_counter() - start, "timeout"
+    seconds = time.perf_counter() - start
+    return seconds, "solved" if verify(puzzle, solution) else "wrong"
+
+
+def percentile(values, fraction):
+    """ Get the nearest rank percentile of the sorted values.
+    Parameters:
+        values (list): sorted values
+        fraction (float): 0.5 for the median, 0.95 for the 95th percentile and so on
+    Returns:
+        value (float): the percentile, None if there are no values
+    """
+    if not values:
+        return None
+    rank = max(int(-(-fraction * len(values) // 1)), 1)  # ceil(fraction * n)
+    return values[min(rank, len(values)) - 1]
+
+
+def run_benchmark(engines, corpora, timeout=10.0, repeat=1, progress=None):
+    """ Run every engine over every corpus.
+    Latencies are of the puzzles that were solved correctly, timeouts count as taking the whole timeout
+    towards the throughput. Each corpus is run repeat times: the median is the median of the runs' medians, so
+    one noisy run doesn't move it, and the percentiles and max are over every solve of every run.
+    A puzzle that isn't solved correctly isn't tried again.
+    Parameters:
+        engines (list): keys of ENGINES
+        corpora (list): corpus names (see load_corpus)
+        timeout (float): seconds to give each puzzle, None for no limit
+        repeat (int): how many times to run each corpus
+        progress (file): file to write a line to as each engine finishes a corpus, None for quiet
+    Returns:
+        results (dict): for each "engine/corpus", a dict of puzzles, solved, wrong, timeouts,
+            median, p95, p99 and max (seconds), samples (solve times the percentiles are of), runs
+            and throughput (puzzles/s)
+    """
+    results = {}
+    for corpus in corpora:
+        puzzles = load_corpus(corpus)
+        for engine in engines:
+            runs = [[] for _ in range(repeat)]  # runs[run] holds the solve times of that run
+            outcomes = {"solved": 0, "wrong": 0, "timeout": 0}
+            attempts = 0
+            total = 0.0
+            for puzzle in puzzles:
+                for run in runs:
+                    seconds, outcome = run_one(engine, puzzle, timeout)
+                    attempts += 1
+                    total += seconds
+                    if outcome != "solved":
+                        break
+                    run.append(seconds)
+                outcomes[outcome] += 1
+            latencies = sorted(seconds for run in runs for seconds in run)
+            medians = sorted(percentile(sorted(run), 0.5) for run in runs if run)
+            result = {
+                "puzzles": len(puzzles),
+                "solved": outcomes["solved"],
+                "wrong": outcomes["wrong"],
+                "timeouts": outcomes["timeout"],
+                "median": percentile(medians, 0.5),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+                "max": latencies[-1] if latencies else None,
+                "samples": len(latencies),
+                "runs": repeat,
+                "throughput": attempts / total if total > 0 else None,
+            }
+            results[engine + "/" + corpus] = result
+            if progress is not None:
+                print(format_row(engine + "/" + corpus, result), file=progress, flush=True)
+    return results
+
+
+def _milliseconds(seconds):
+    return "-" if seconds is None else "{:.2f}".format(seconds * 1000)
+
+
+def format_row(name, result):
+    """ Format one result as a line of the report table. """
+    throughput = "-" if result["throughput"] is None else "{:.1f}".format(result["throughput"])
+    return "{:<36} {:>5}/{:<5} {:>5} {:>5} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        name, result["solved"], result["puzzles"], result["wrong"], result["timeouts"],
+        _milliseconds(result["median"]), _milliseconds(result["p95"]), _milliseconds(result["p99"]),
+        _milliseconds(result["max"]), throughput)
+
+
+HEADER = "{:<36} {:>11} {:>5} {:>5} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+    "engine/corpus", "solved", "wrong", "t/o", "median ms", "p95 ms", "p99 ms", "max ms", "puzzles/s")
+
+
+def save_results(results, filename):
+    """ Save the results, with a note of the machine they were measured on, as JSON. """
+    with open(filename, "w") as file:
+        json.dump({"python": platform.python_version(), "machine": platform.platform(), "results": results},
+                  file, indent=2, sort_keys=True)
+
+
+def load_results(filename):
+    """ Load results saved by save_results. """
+    with open(filename, "r") as file:
+        return json.load(file)["results"]
+
+
+def compare(results, baseline, threshold=0.1, min_samples=MIN_TAIL_SAMPLES):
+    """ Find the engine/corpus pairs that got slower, or stopped solving puzzles, since the baseline.
+    The p95 is only compared when both results have at least min_samples solve times (run the benchmark
+    with more repeats to get them), the median always is.
+    Parameters:
+        results (dict): results from run_benchmark
+        baseline (dict): earlier results to compare against
+        threshold (float): how much slower the median or p95 can get before it counts, 0.1 for 10%
+        min_samples (int): solve times each result needs before its p95 is compared
+    Returns:
+        regressions (list): a line describing each regression
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result["solved"] < old["solved"]:
+            regressions.append("{}: solved {} puzzles, down from {}".format(name, result["solved"], old["solved"]))
+        keys = ["median"]
+        # Results saved before samples were counted had one solve time per solved puzzle
+        if min(result.get("samples", result["solved"]), old.get("samples", old["solved"])) >= min_samples:
+            keys.append("p95")
+        for key in keys:
+            if result[key] is not None and old[key] and result[key] > old[key] * (1 + threshold):
+                regressions.append("{}: {} went from {} ms to {} ms (+{:.0%})".format(
+                    name, key, _milliseconds(old[key]), _milliseconds(result[key]), result[key] / old[key] - 1))
+    return regressions
+
+
+def main(argv=None):
+    """ Run the benchmark, print a report and optionally save it or compare it to a baseline. """
+    parser = argparse.ArgumentParser(description="Time the solvers over the bundled puzzle corpora.")
+    parser.add_argument("-e", "--engines", nargs="+", default=sorted(ENGINES), choices=sorted(ENGINES),
+                        metavar="ENGINE", help="engines to run, from {}".format(", ".join(sorted(ENGINES))))
+    parser.add_argument("-c", "--corpora", nargs="+", default=list(CORPORA), metavar="CORPUS",
+                        help="corpora to run over, from {} or files of puzzles".format(", ".join(CORPORA)))
+    parser.add_argument("-t", "--timeout", type=float, default=10.0, help="seconds to give each puzzle")
+    parser.add_argument("-r", "--repeat", type=int, default=1,
+                        help="times to run each corpus, the median of the runs' medians is reported")
+    parser.add_argument("-o", "--output", help="file to save the results to, as JSON")
+    parser.add_argument("-b", "--baseline", help="results saved earlier to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown of the median or p95 that counts as a regression (default 0.1, 10%%)")
+    parser.add_argument("--min-samples", type=int, default=MIN_TAIL_SAMPLES,
+                        help="solve times needed before the p95 is compared (default {})".format(MIN_TAIL_SAMPLES))
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    print(HEADER)
+    results = run_benchmark(args.engines, args.corpora, args.timeout or None, args.repeat, sys.stdout)
+    if args.output:
+        save_results(results, args.output)
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.threshold, args.min_samples)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against {}".format(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+from board import Board, ConstraintTracker, snapshot_n, snapshot_size, split_snapshot
+from units import format_puzzle, get_layout, parse_puzzle
+
+
+class BitBoard:
+    """ Compact representation of the board.
+    The values are kept flat, one byte per cell (0 is a blank) and the candidates of each cell
+    are kept as a bit mask, bit d - 1 is set when d is a candidate.
+    A ConstraintTracker keeps the mask of digits used in every row, column and section.
+
+    Has the same interface as Board so the solvers can run on either, for any section width n.
+    Cells are indexed x + y * size internally.
+
+    The candidates, values and tracker all live in one bytearray, the candidates and values laid out as a
+    snapshot (see board.split_snapshot) with the tracker after them, so snapshot and get_copy are each a single
+    copy of it (restore copies the snapshot in, then rebuilds the tracker from the values).
+    """
+
+    stats = None  # SolveStats to count is_valid calls into, set by stats.phase while it times a phase
+
+    def __init__(self, n=3, snapshot=None):
+        """ Initialize an empty board, or one from a snapshot.
+        Parameters:
+            n (int): width of a section in cells
+            snapshot (bytes): snapshot to start from (of a board of n by n sections), None for an empty board
+        """
+        self.n = n
+        self.layout = get_layout(n)
+        self.size = self.layout.size
+        self._mask_digits = self.layout.mask_digits
+        self._snapshot_size = snapshot_size(n)
+        tracker_start = -(-self._snapshot_size // 8) * 8  # Keeps the tracker's masks aligned
+        self._buffer = bytearray(tracker_start + ConstraintTracker.buffer_size(n))
+        buffer = memoryview(self._buffer)
+        self._candidates, self._values = split_snapshot(buffer[:self._snapshot_size], n)
+        self._tracker = ConstraintTracker(n, buffer[tracker_start:])
+        if snapshot is not None:
+            self.restore(snapshot)
+
+    def load_board(self, filename="game.txt"):
+        """ Load the board at filename into this
+        Takes the same file formats as Board.load_board. """
+        Board.load_board(self, filename)
+
+    def load_string(self, puzzle):
+        """ Load the puzzle string into this, resizing the board to fit it.
+        Takes the same formats as Board.load_string.
+        Parameters:
+            puzzle (string): puzzle to load
+        """
+        n, values = parse_puzzle(puzzle)
+        self.load_values(values, n)
+
+    def load_values(self, values, n=3):
+        """ Load the value of every cell into this, resizing the board to fit.
+        Parameters:
+            values (iterable): the value of every cell row by row, 0 for blanks
+            n (int): width of the puzzle's sections
+        """
+        if n != self.n:
+            self.__init__(n)
+        size = self.size
+        board_values = self._values
+        candidates = self._candidates
+        tracker = self._tracker
+        for index, value in enumerate(values):
+            if value:
+                # set_board_item, inlined as boards are loaded in bulk from packed corpora
+                old = board_values[index]
+                if old != value:
+                    if old:
+                        tracker.remove(old, index % size, index // size)
+                    tracker.add(value, index % size, index // size)
+                    board_values[index] = value
+                candidates[index] = 0
+
+    def get_values(self):
+        """ Get the value of every cell.
+        Returns:
+            values (bytes): the value of every cell row by row, 0 for blanks
+        """
+        return bytes(self._values)
+
+    def to_string(self):
+        """ Get the board as a string, row by row with "." for blanks (see Board.to_string).
+        Returns:
+            puzzle (string): the board as a string
+        """
+        if self.size == 9:
+            return "".join(".123456789"[value] for value in self._values)
+        return format_puzzle(self._values, self.size)
+
+    def get_copy(self):
+        """ Return a copy of the board, a single copy of its buffer. """
+        new_board = BitBoard(self.n)
+        new_board._buffer[:] = self._buffer
+        new_board._tracker.conflicts = self._tracker.conflicts
+        return new_board
+
+    def snapshot(self):
+        """ Save the values and candidates of the board as bytes, to put back later with restore.
+        Returns:
+            snapshot (bytes): the snapshot, laid out as described in board.split_snapshot
+        """
+        return bytes(self._buffer[:self._snapshot_size])
+
+    def restore(self, snapshot):
+        """ Put the board back as it was when snapshot was taken, resizing it if need be.
+        Parameters:
+            snapshot (bytes): snapshot from BitBoard.snapshot or Board.snapshot
+        """
+        if len(snapshot) != self._snapshot_size:
+            self.__init__(snapshot_n(snapshot))
+        self._buffer[:self._snapshot_size] = snapshot
+        self._tracker.rebuild(self._values)
+
+    def set_board_item(self, number, x, y):
+        """ Set the item at x, y on the board.
+        x and y are to between 0 and size - 1 (inclusive)
+
+        Parameters:
+            number (int, list or None): number to set, list of candidates or None for a blank
+            x (int): x ordinate
+            y (int): y ordinate
+        """
+        index = x + y * self.size
+        old = self._values[index]
+        if type(number) == int:
+            if old != number:
+                if old:
+                    self._tracker.remove(old, x, y)
+                self._tracker.add(number, x, y)
+                self._values[index] = number
+            self._candidates[index] = 0
+        else:
+            if old:
+                self._tracker.remove(old, x, y)
+                self._values[index] = 0
+            mask = 0
+            if number is not None:
+                for candidate in number:
+                    mask |= 1 << (candidate - 1)
+            self._candidates[index] = mask
+
+    def can_place(self, number, x, y):
+        """ Can number go at (x, y) without breaking a constraint?
+        Whatever is at (x, y) now is ignored. Runs in constant time.
+        Parameters:
+            number (int): number to place
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            legal (bool): whether the placement is legal
+        """
+        return self._tracker.can_place(number, x, y, self._values[x + y * self.size])
+
+    def remove_candidate(self, number, x, y):
+        """ Remove number from the candidates of the cell at (x, y).
+        Parameters:
+            number (int): candidate to remove
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            change (bool): whether number was a candidate
+        """
+        index = x + y * self.size
+        mask = self._candidates[index]
+        bit = 1 << (number - 1)
+        if mask & bit:
+            self._candidates[index] = mask & ~bit
+            return True
+        return False
+
+    def contains_value(self, x, y):
+        """ Is the cell at (x, y) occupied by an integer?
+        Parameters:
+            x (int): x ordinate
+            y (int): y ordinate
+        """
+        return self._values[x + y * self.size] != 0
+
+    def get_board_item(self, x, y):
+        """ Get the item at x, y on the board.
+        x and y are to between 0 and size - 1 (inclusive)
+        Blanks are returned as a (new) list of their candidates.
+
+        Parameters:
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            item (number or list): the number on the board at (x, y)
+        """
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise IndexError("Cannot get item at ({}, {})".format(x, y))
+        index = x + y * self.size
+        value = self._values[index]
+        if value:
+            return value
+        return list(self._mask_digits[self._candidates[index]])
+
+    def get_candidate_mask(self, x, y):
+        """ Get the candidate mask of the cell at (x, y), 0 if the cell holds a value.
+        Parameters:
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            mask (int): bit d - 1 is set when d is a candidate
+        """
+        return self._candidates[x + y * self.size]
+
+    def get_used_mask(self, x, y):
+        """ Get the mask of all digits used in the row, column and section of (x, y).
+        Parameters:
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            mask (int): bit d - 1 is set when d is used by a unit of (x, y)
+        """
+        return self._tracker.get_used_mask(x, y)
+
+    def fill_candidates(self):
+        """ Set the candidates of every blank to the digits its row, column and section don't use
+        (see Solver.fill_candidates, which calls this for a BitBoard). """
+        all_digits = self.layout.all_digits
+        used = self._tracker.used
+        values = self._values
+        candidates = self._candidates
+        for index, (row, column, section) in enumerate(self.layout.cell_units):
+            if not values[index]:
+                candidates[index] = all_digits & ~(used[row] | used[column] | used[section])
+
+    def get_column(self, x):
+        """ Get a copy of the column at y
+        Parameters:
+            x (int): x ordinate of row to get
+        Returns:
+            row (list): list of items in row (includes the lists of candidates)
+        """
+        return [self.get_board_item(x, y) for y in range(self.size)]
+
+    def get_row(self, y):
+        """ Get a copy of the row at y
+        Parameters:
+            y (int): y ordinate of row to get
+        Returns:
+            row (list): list of items in row (includes the lists of candidates)
+        """
+        return [self.get_board_item(x, y) for x in range(self.size)]
+
+    def get_section(self, section_x, section_y):
+        """ Get a copy of the section at (section_x, section_y)
+        Parameters:
+            section_x (int): x ordinate of the section (0 to n - 1)
+            section_y (int): y ordinate of the section (0 to n - 1)
+        Returns:
+            section (list): list of items in the section, row by row
+        """
+        n = self.n
+        return [self.get_board_item(section_x * n + x, section_y * n + y) for y in range(n) for x in range(n)]
+
+    def is_solved(self):
+        """ Is the board solved?
+        Is solved if it is valid and there are no blank spots. """
+        if 0 in self._values:
+            return False
+        return self.is_valid()
+
+    def is_valid(self):
+        """ Is the board valid?
+        Blanks are ignored.
+        Does it violate any of the constraints?
+        - is there two or more of the same numbers in the same section
+        - are there two or more of the same numbers in the same line
+        The constraint tracker keeps count of the repeats, so this runs in constant time.
+        """
+        if self.stats is not None:
+            self.stats.is_valid_calls += 1
+        return self._tracker.conflicts == 0
+
+    def __str__(self):
+        """ Create a nice string representation of the board. """
+        return Board.__str__(self)
@@ -1,15 +1,213 @@
+import struct
+from units import format_puzzle, get_layout, parse_puzzle
+
+
+class ConstraintTracker:
+    """ Keeps count of how many times each digit is used in every row, column and section.
+    The counts are updated as cells are set and cleared, so asking whether a placement is legal,
+    or whether the board is valid, doesn't need to rescan the board.
+
+    Units are numbered as in units.py, rows 0 to 8, columns 9 to 17 and sections 18 to 26 on a 9x9 board.
+    The counts can be rebuilt from the values of the cells (see rebuild), so board snapshots leave the tracker out.
+    """
+
+    def __init__(self, n=3, buffer=None):
+        """ Initialize the tracker for an empty board.
+        Parameters:
+            n (int): width of the board's sections
+            buffer (memoryview): zeroed bytes to keep the masks and counts in, ConstraintTracker.buffer_size(n)
+                of them (so a board can keep its tracker in the same buffer as its cells), None for its own
+        """
+        layout = get_layout(n)
+        self.n = n
+        self._stride = layout.size + 1
+        self._cell_units = layout.cell_units
+        self._width = layout.size
+        if buffer is None:
+            buffer = memoryview(bytearray(ConstraintTracker.buffer_size(n)))
+        self.buffer = buffer
+        typecode = mask_typecode(n)
+        used_size = layout.unit_count * struct.calcsize(typecode)
+        self.used = buffer[:used_size].cast(typecode)  # Mask of the digits used in each unit
+        self.counts = buffer[used_size:]  # counts[unit * (size + 1) + digit]
+        self.conflicts = 0  # How many repeated digits there are across all units
+
+    @staticmethod
+    def buffer_size(n=3):
+        """ Get how many bytes the tracker of a board of n by n sections keeps its masks and counts in. """
+        layout = get_layout(n)
+        return layout.unit_count * struct.calcsize(mask_typecode(n)) + layout.unit_count * (layout.size + 1)
+
+    def add(self, number, x, y):
+        """ Record that number was placed at (x, y).
+        Parameters:
+            number (int): number placed
+            x (int): x ordinate
+            y (int): y ordinate
+        """
+        counts = self.counts
+        stride = self._stride
+        for unit in self._cell_units[x + y * self._width]:
+            index = unit * stride + number
+            count = counts[index] + 1
+            counts[index] = count
+            if count == 1:
+                self.used[unit] |= 1 << (number - 1)
+            else:
+                self.conflicts += 1
+
+    def remove(self, number, x, y):
+        """ Record that number was removed from (x, y).
+        Parameters:
+            number (int): number removed
+            x (int): x ordinate
+            y (int): y ordinate
+        """
+        counts = self.counts
+        stride = self._stride
+        for unit in self._cell_units[x + y * self._width]:
+            index = unit * stride + number
+            count = counts[index] - 1
+            counts[index] = count
+            if count == 0:
+                self.used[unit] &= ~(1 << (number - 1))
+            else:
+                self.conflicts -= 1
+
+    def rebuild(self, values):
+        """ Recount every unit from scratch, from the value of every cell.
+        Parameters:
+            values (bytes): the value of every cell row by row, 0 for blanks
+        """
+        buffer = self.buffer
+        buffer[:] = bytes(len(buffer))
+        used = self.used
+        counts = self.counts
+        stride = self._stride
+        cell_units = self._cell_units
+        conflicts = 0
+        for index, number in enumerate(values):
+            if number:
+                bit = 1 << (number - 1)
+                for unit in cell_units[index]:
+                    count = counts[unit * stride + number] + 1
+                    counts[unit * stride + number] = count
+                    if count == 1:
+                        used[unit] |= bit
+                    else:
+                        conflicts += 1
+        self.conflicts = conflicts
+
+    def can_place(self, number, x, y, current=None):
+        """ Can number go at (x, y) without repeating a digit in its row, column or section?
+        Parameters:
+            number (int): number to place
+            x (int): x ordinate
+            y (int): y ordinate
+            current (int): number currently at (x, y), it is not counted against the placement
+        Returns:
+            legal (bool): whether the placement is legal
+        """
+        counts = self.counts
+        stride = self._stride
+        allowed = 1 if current == number else 0
+        row, column, section = self._cell_units[x + y * self._width]
+        return (counts[row * stride + number] <= allowed and
+                counts[column * stride + number] <= allowed and
+                counts[section * stride + number] <= allowed)
+
+    def get_used_mask(self, x, y):
+        """ Get the mask of all digits used in the row, column and section of (x, y).
+        Parameters:
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            mask (int): bit d - 1 is set when d is used by a unit of (x, y)
+        """
+        used = self.used
+        row, column, section = self._cell_units[x + y * self._width]
+        return used[row] | used[column] | used[section]
+
+    def get_copy(self):
+        """ Return a copy of the tracker. """
+        new_tracker = ConstraintTracker(self.n)
+        new_tracker.buffer[:] = self.buffer
+        new_tracker.conflicts = self.conflicts
+        return new_tracker
+
+
+def mask_typecode(n=3):
+    """ Get the smallest memoryview typecode whose items can hold a digit mask of a board of n by n sections.
+    Parameters:
+        n (int): width of a section in cells
+    Returns:
+        typecode (string): "B" up to 8 digits, "H" up to 16, "I" up to 32 and "Q" past that
+    """
+    size = n * n
+    for typecode in "BHI":
+        if struct.calcsize(typecode) * 8 >= size:
+            return typecode
+    return "Q"
+
+
+def snapshot_size(n=3):
+    """ Get the length of a snapshot of a board of n by n sections (see split_snapshot).
+    Parameters:
+        n (int): width of a section in cells
+    Returns:
+        length (int): bytes in the snapshot, 243 for a 9x9 board
+    """
+    cell_count = get_layout(n).cell_count
+    return cell_count * (struct.calcsize(mask_typecode(n)) + 1)
+
+
+def snapshot_n(snapshot):
+    """ Work out the section width of the board a snapshot was taken of, from its length.
+    Parameters:
+        snapshot (bytes): the snapshot
+    Returns:
+        n (int): width of a section in cells
+    """
+    for n in range(2, 7):
+        if snapshot_size(n) == len(snapshot):
+            return n
+    raise ValueError("A board snapshot can't be {} bytes long".format(len(snapshot)))
+
+
+def split_snapshot(buffer, n=3):
+    """ Split a board snapshot into views of its parts.
+    A snapshot is one contiguous run of bytes: the candidate mask of every cell (in the smallest item that holds
+    one, see mask_typecode, 0 for cells holding a value) then the value of every cell (1 byte each, 0 for blanks).
+    The ConstraintTracker is left out, it's rebuilt from the values on restore. A BitBoard keeps itself in exactly
+    this form (followed by its tracker), so it can be snapshotted and copied with a single copy of its buffer.
+    Parameters:
+        buffer (memoryview): the snapshot, snapshot_size(n) bytes
+        n (int): width of a section in cells
+    Returns:
+        candidates (memoryview): the candidate masks, indexed by cell
+        values (memoryview): the values, indexed by cell
+    """
+    cell_count = get_layout(n).cell_count
+    typecode = mask_typecode(n)
+    values = cell_count * struct.calcsize(typecode)
+    return buffer[:values].cast(typecode), buffer[values:values + cell_count]
+
 
 class Section:
     """ Class to represent a section of the sudoku board.
-    Splits the section into 9 other sections. """
+    Splits the section into n * n (9 on a 9x9 board) other sections. """
 
-    def __init__(self):
-        """ Initialize the Section, sets each slot to None. """
-        self._slots = [None, ] * 9
+    def __init__(self, n=3):
+        """ Initialize the Section, sets each slot to None.
+        Parameters:
+            n (int): width of the section in slots
+        """
+        self.n = n
+        self._slots = [None, ] * (n * n)
 
     def get_at(self, x, y):
         """ Get the item in the slot at (x, y).
-        x and y must be between 0 and 2 (inclusive).
+        x and y must be between 0 and n - 1 (inclusive).
 
         Parameters:
             x (int): x ordinate
@@ -17,9 +215,9 @@ class Section:
         Returns:
             item (object): item at (x, y)
         """
-        if not (0 <= x <= 2 and 0 <= y <= 2):
+        if not (0 <= x < self.n and 0 <= y < self.n):
             raise IndexError("Can't get item at ({}, {})".format(x, y))
-        return self._slots[x + y * 3]
+        return self._slots[x + y * self.n]
 
     def set_at(self, item, x, y):
         """ Set the item at (x, y) to item.
@@ -28,18 +226,18 @@ class Section:
             x (int): x ordinate
             y (int): y ordinate
         """
-        self._slots[x + y * 3] = item
+        self._slots[x + y * self.n] = item
 
     def __str__(self):
         """ Return a basic string representation. """
-        column_widths = [1, ] * 3
-        for x in range(3):
-            for y in range(3):
+        column_widths = [1, ] * self.n
+        for x in range(self.n):
+            for y in range(self.n):
                 column_widths[x] = max(column_widths[x], len(str(self.get_at(x, y))))
 
         string = ""
-        for y in range(3):
-            for x in range(3):
+        for y in range(self.n):
+            for x in range(self.n):
                 cell = self.get_at(x, y)
                 string += str(cell) + " " * (1 + column_widths[x] - len(str(cell)))
             string += "\n"
@@ -48,50 +246,206 @@ class Section:
 
 class Board(Section):
     """ Class to represent the board,
-    Is really just a section class but each slot is another section rather than a number. """
+    Is really just a section class but each slot is another section rather than a number.
+    A board of n by n sections is n * n cells wide and holds the digits 1 to n * n (9x9 for n = 3). """
+
+    stats = None  # SolveStats to count is_valid calls into, set by stats.phase while it times a phase
 
-    def __init__(self):
-        Section.__init__(self)
+    def __init__(self, n=3):
+        """ Initialize an empty board.
+        Parameters:
+            n (int): width of a section in cells
+        """
+        Section.__init__(self, n)
+        self.layout = get_layout(n)
+        self.size = self.layout.size
+        self._tracker = ConstraintTracker(n)
         self.set_sections()
 
     def load_board(self, filename="game.txt"):
         """ Load the board at filename into this
-        The file is to be layed out in a 9x9 grid of characters directly representing the game.
-        Blanks are to be left as spaces. """
+        The file is to be layed out in a grid of characters directly representing the game, one line per row.
+        Blanks are to be left as spaces, digits past 9 are letters (see units.SYMBOLS).
+        Alternatively each line can hold the row's numbers separated by whitespace or commas, "." or "0" for blanks.
+        The size of the board is worked out from the number and length of the lines. """
         file = open(filename, "r")
-        board_raw = file.read()
+        lines = file.read().rstrip("\n").splitlines()
         file.close()
-        for y, line in enumerate(board_raw.splitlines()):
-            for x, char in enumerate(line):
-                if x >= 9:
-                    break
-                if char != " ":
-                    self.set_board_item(int(char), x, y)
+        if len(lines) > 1 and all(len(line.replace(",", " ").split()) == len(lines) for line in lines):
+            self.load_string(" ".join(line.replace(",", " ") for line in lines))
+            return
+        width = max([len(lines)] + [len(line) for line in lines])
+        n = 2
+        while n * n < width:
+            n += 1
+        size = n * n
+        lines += [""] * (size - len(lines))
+        self.load_string("".join(line.ljust(size) for line in lines).replace(" ", "."))
+
+    def load_string(self, puzzle):
+        """ Load the puzzle string into this, resizing the board to fit it.
+        The string holds the cells row by row, one character each (81 characters for a 9x9 board),
+        or as numbers separated by whitespace or commas. Blanks are "." or "0".
+        Parameters:
+            puzzle (string): puzzle to load
+        """
+        n, values = parse_puzzle(puzzle)
+        self.load_values(values, n)
+
+    def load_values(self, values, n=3):
+        """ Load the value of every cell into this, resizing the board to fit.
+        Parameters:
+            values (iterable): the value of every cell row by row, 0 for blanks
+            n (int): width of the puzzle's sections
+        """
+        if n != self.n:
+            self.__init__(n)
+        size = self.size
+        for index, value in enumerate(values):
+            if value:
+                self.set_board_item(value, index % size, index // size)
+
+    def get_values(self):
+        """ Get the value of every cell.
+        Returns:
+            values (bytes): the value of every cell row by row, 0 for blanks
+        """
+        return bytes(cell if type(cell) == int else 0 for y in range(self.size) for cell in self.get_row(y))
+
+    def to_string(self):
+        """ Get the board as a string, row by row with "." for blanks.
+        That's one character per cell (81 characters for a 9x9 board) unless the board has too many digits
+        for single characters, then it's the cells' numbers separated by spaces.
+        Returns:
+            puzzle (string): the board as a string
+        """
+        return format_puzzle((cell if type(cell) == int else 0
+                              for y in range(self.size) for cell in self.get_row(y)), self.size)
 
     def get_copy(self):
-        """ Return a copy of the board. """
-        new_board = Board()
-        for x in range(9):
-            for y in range(9):
-                new_board.set_board_item(self.get_board_item(x, y), x, y)
+        """ Return a copy of the board.
+        The lists of candidates are copied too, so changing them on one board doesn't change them on the other. """
+        new_board = Board(self.n)
+        for x in range(self.size):
+            for y in range(self.size):
+                item = self.get_board_item(x, y)
+                new_board.set_board_item(list(item) if type(item) == list else item, x, y)
         return new_board
 
+    def snapshot(self):
+        """ Save the values and candidates of the board as bytes, to put back later with restore.
+        It's the same form a BitBoard snapshots itself in (see split_snapshot), so either kind of board can be
+        restored from the snapshot of the other.
+        Returns:
+            snapshot (bytes): the snapshot
+        """
+        buffer = memoryview(bytearray(snapshot_size(self.n)))
+        candidates, values = split_snapshot(buffer, self.n)
+        for index, (x, y) in enumerate(self.layout.cells):
+            item = self.get_board_item(x, y)
+            if type(item) == int:
+                values[index] = item
+            elif item:
+                mask = 0
+                for candidate in item:
+                    mask |= 1 << (candidate - 1)
+                candidates[index] = mask
+        return buffer.tobytes()
+
+    def restore(self, snapshot):
+        """ Put the board back as it was when snapshot was taken, resizing it if need be.
+        Blanks get their candidates back as lists, blanks that had none are set to None.
+        Parameters:
+            snapshot (bytes): snapshot from Board.snapshot or BitBoard.snapshot
+        """
+        n = snapshot_n(snapshot)
+        if n != self.n:
+            self.__init__(n)
+        candidates, values = split_snapshot(memoryview(snapshot), n)
+        mask_digits = self.layout.mask_digits
+        for index, (x, y) in enumerate(self.layout.cells):
+            value = values[index]
+            if value:
+                self.set_board_item(value, x, y)
+            else:
+                mask = candidates[index]
+                self.set_board_item(list(mask_digits[mask]) if mask else None, x, y)
+
     def set_sections(self):
         """ Set all the sections of self to new sections. """
-        for x in range(3):
-            for y in range(3):
-                self.set_at(Section(), x, y)
+        for x in range(self.n):
+            for y in range(self.n):
+                self.set_at(Section(self.n), x, y)
 
     def set_board_item(self, number, x, y):
         """ Set the item at x, y on the board.
-        x and y are to between 0 and 8 (inclusive)
+        x and y are to between 0 and size - 1 (inclusive)
 
         Parameters:
             number (int): number to set
             x (int): x ordinate
             y (int): y ordinate
         """
-        self.get_at(x // 3, y // 3).set_at(number, x % 3, y % 3)
+        n = self.n
+        section = self.get_at(x // n, y // n)
+        old = section.get_at(x % n, y % n)
+        if type(old) == int:
+            self._tracker.remove(old, x, y)
+        if type(number) == int:
+            self._tracker.add(number, x, y)
+        section.set_at(number, x % n, y % n)
+
+    def can_place(self, number, x, y):
+        """ Can number go at (x, y) without breaking a constraint?
+        Whatever is at (x, y) now is ignored. Runs in constant time.
+        Parameters:
+            number (int): number to place
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            legal (bool): whether the placement is legal
+        """
+        return self._tracker.can_place(number, x, y, self.get_board_item(x, y))
+
+    def remove_candidate(self, number, x, y):
+        """ Remove number from the list of candidates at (x, y), in place.
+        Parameters:
+            number (int): candidate to remove
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            change (bool): whether number was a candidate
+        """
+        cell = self.get_board_item(x, y)
+        if type(cell) == list and number in cell:
+            cell.remove(number)
+            return True
+        return False
+
+    def get_candidate_mask(self, x, y):
+        """ Get the candidate mask of the cell at (x, y), 0 if the cell holds a value.
+        Parameters:
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            mask (int): bit d - 1 is set when d is a candidate
+        """
+        cell = self.get_board_item(x, y)
+        mask = 0
+        if type(cell) != int:
+            for candidate in cell or ():
+                mask |= 1 << (candidate - 1)
+        return mask
+
+    def get_used_mask(self, x, y):
+        """ Get the mask of all digits used in the row, column and section of (x, y).
+        Parameters:
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            mask (int): bit d - 1 is set when d is used by a unit of (x, y)
+        """
+        return self._tracker.get_used_mask(x, y)
 
     def contains_value(self, x, y):
         """ Is the cell at (x, y) occupied by an integer?
@@ -103,7 +457,7 @@ class Board(Section):
 
     def get_board_item(self, x, y):
         """ Get the item at x, y on the board.
-        x and y are to between 0 and 8 (inclusive)
+        x and y are to between 0 and size - 1 (inclusive)
 
         Parameters:
             x (int): x ordinate
@@ -111,9 +465,10 @@ class Board(Section):
         Returns:
             item (number): the number on the board at (x, y)
         """
-        if not (0 <= x <= 8 and 0 <= y <= 8):
+        n = self.n
+        if not (0 <= x < self.size and 0 <= y < self.size):
             raise IndexError("Cannot get item at ({}, {})".format(x, y))
-        return self.get_at(x // 3, y // 3).get_at(x % 3, y % 3)
+        return self.get_at(x // n, y // n).get_at(x % n, y % n)
 
     def get_column(self, x):
         """ Get a copy of the column at y
@@ -122,7 +477,7 @@ class Board(Section):
         Returns:
             row (list): list of items in row (includes the lists of candidates)
         """
-        return [self.get_board_item(x, y) for y in range(9)]
+        return [self.get_board_item(x, y) for y in range(self.size)]
 
     def get_row(self, y):
         """ Get a copy of the row at y
@@ -131,15 +486,26 @@ class Board(Section):
         Returns:
             row (list): list of items in row (includes the lists of candidates)
         """
-        return [self.get_board_item(x, y) for x in range(9)]
+        return [self.get_board_item(x, y) for x in range(self.size)]
+
+    def get_section(self, section_x, section_y):
+        """ Get a copy of the section at (section_x, section_y)
+        Parameters:
+            section_x (int): x ordinate of the section (0 to n - 1)
+            section_y (int): y ordinate of the section (0 to n - 1)
+        Returns:
+            section (list): list of items in the section, row by row
+        """
+        section = self.get_at(section_x, section_y)
+        return [section.get_at(x, y) for y in range(self.n) for x in range(self.n)]
 
     def is_solved(self):
         """ Is the board solved?
         Is solved if it is valid and there are no blank spots. """
-        for x in range(9):
-            for y in range(9):
-                if self.get_board_item(x, y) is None:
-                    return False    # There's a blank spot!
+        for x in range(self.size):
+            for y in range(self.size):
+                if type(self.get_board_item(x, y)) != int:
+                    return False    # There's a blank spot (or a list of candidates)!
         # Only gets to this line if there are no blanks
         return self.is_valid()
 
@@ -149,21 +515,11 @@ class Board(Section):
         Does it violate any of the constraints?
         - is there two or more of the same numbers in the same section
         - are there two or more of the same numbers in the same line
+        The constraint tracker keeps count of the repeats, so this runs in constant time.
         """
-        # All vertical lines
-        for x in range(9):
-            if not self.is_line_valid_vertical(x):
-                return False
-        # All horizontal lines
-        for y in range(9):
-            if not self.is_line_valid_horizontal(y):
-                return False
-        # All sections
-        for x in range(3):
-            for y in range(3):
-                if not self.is_section_valid(x, y):
-                    return False
-        return True
+        if self.stats is not None:
+            self.stats.is_valid_calls += 1
+        return self._tracker.conflicts == 0
 
     def is_line_valid_horizontal(self, y):
         """ Is the horizontal line valid?
@@ -172,8 +528,8 @@ class Board(Section):
         Returns:
             valid (bool): whether the line is valid
         """
-        taken_numbers = [0, ] * 9
-        for x in range(9):
+        taken_numbers = [0, ] * self.size
+        for x in range(self.size):
             number = self.get_board_item(x, y)
             if number is not None and type(number) == int:
                 index = int(number) - 1
@@ -189,8 +545,8 @@ class Board(Section):
         Returns:
             valid (bool): whether the line is valid
         """
-        taken_numbers = [0, ] * 9
-        for y in range(9):
+        taken_numbers = [0, ] * self.size
+        for y in range(self.size):
             number = self.get_board_item(x, y)
             if number is not None and type(number) == int:
                 index = int(number) - 1
@@ -204,9 +560,9 @@ class Board(Section):
         If a cell has a list it is ignored
         invalid if there are two or more of the same number in the section. """
         section = self.get_at(section_x, section_y)
-        taken_numbers = [0, ] * 9
-        for x in range(3):
-            for y in range(3):
+        taken_numbers = [0, ] * self.size
+        for x in range(self.n):
+            for y in range(self.n):
                 number = section.get_at(x, y)
                 if number is not None and type(number) == int:
                     index = number - 1
@@ -219,27 +575,29 @@ class Board(Section):
         """ Create a nice string representation of the board. """
 
         # Find how wide each column has to be
-        column_widths = [1, ] * 9
-        for x in range(9):
-            for y in range(9):
+        size = self.size
+        n = self.n
+        column_widths = [1, ] * size
+        for x in range(size):
+            for y in range(size):
                 column_widths[x] = max(column_widths[x], len(str(self.get_board_item(x, y))))
-        total_width = sum(column_widths) + 12
+        total_width = sum(column_widths) + size + (n - 1) * 2 - 1
 
         string = ""
-        for y in range(9):
-            for x in range(9):
+        for y in range(size):
+            for x in range(size):
 
                 cell = self.get_board_item(x, y)
                 string += str(cell) + " " * (column_widths[x] - len(str(cell)) + 1)
 
                 # Vertical section split
-                if x == 2 or x == 5:
+                if x % n == n - 1 and x != size - 1:
                     string += "| "
 
             string += "\n"
 
             # Horizontal section split
-            if y == 2 or y == 5:
+            if y % n == n - 1 and y != size - 1:
                 string += "-" * total_width + "\n"
 
         return string[:-1]  # Gotta remove the last newline
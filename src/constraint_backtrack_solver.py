@@ -1,31 +1,64 @@
 from constraint_solver import ConstraintSolver
 from backtrack_solver import BacktrackSolver
+from solve_trace import show
 
 
 class ConstraintBacktrackSolver(ConstraintSolver, BacktrackSolver):
 
     @staticmethod
-    def solve(filename="game.txt", show_solving=False):
+    def solve(filename="game.txt", show_solving=False, ordering="row-major", forward_checking=False, rules=None,
+              stats=None):
         """ Solve the sudoku at filename and return it.
         Parameters:
             filename (string): filename that sudoku is saved in
             show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            ordering (string): which cell to branch on next, one of search_engine.ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+            rules (tuple): names of the constraint rules to apply before searching, from propagator.RULES
+            stats (SolveStats): stats to fill in, None for no stats
         Returns:
             sudoku (Board): The solved sudoku (or None if not possible)
         """
-        board = ConstraintBacktrackSolver.get_board(filename)
-
-        print("Using constraints...")
-        change = False
-        while change:
-            if show_solving:
-                print(board, end="\n" + "=" * 21 + "\n\n")  # Print board out with a line of equal signs below it
-            if not (ConstraintSolver.partial_solve_eliminate(board) or ConstraintSolver.naked_twins(board)):
-                change = False
-        print("Backtracking...")
-        BacktrackSolver.backtrack(board, (-1, 0), show_solving)
+        board = ConstraintBacktrackSolver.get_board(filename, stats=stats)
+        return ConstraintBacktrackSolver.solve_board(board, show_solving, ordering, forward_checking, rules, stats)
+
+    @staticmethod
+    def solve_board(board, show_solving=False, ordering="row-major", forward_checking=False, rules=None,
+                    stats=None):
+        """ Solve the already loaded sudoku in place and return it.
+        Parameters:
+            board (Board): sudoku to solve, with its candidates filled in
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            ordering (string): which cell to branch on next, one of search_engine.ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+            rules (tuple): names of the constraint rules to apply before searching, from propagator.RULES
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            sudoku (Board): The solved sudoku
+        """
+        if show_solving:
+            show(ConstraintBacktrackSolver.trace(board, ordering, forward_checking, rules, stats), board)
+            return board
+        ConstraintSolver.propagate(board, rules, stats)
+        BacktrackSolver.solve_board(board, False, ordering, forward_checking, stats)
         return board
 
+    @staticmethod
+    def trace(board, ordering="row-major", forward_checking=False, rules=None, stats=None):
+        """ Solve the already loaded sudoku in place like solve_board, yielding each step as it goes.
+        Parameters:
+            board (Board): sudoku to solve, with its candidates filled in
+            ordering (string): which cell to branch on next, one of search_engine.ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+            rules (tuple): names of the constraint rules to apply before searching, from propagator.RULES
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            steps (generator): the propagation's steps (see ConstraintSolver.trace), then the search's
+                (see BacktrackSolver.trace), ending with a "solved" or "unsolved" step
+        """
+        yield from ConstraintSolver.propagate_steps(board, rules, stats)
+        yield from BacktrackSolver.trace(board, ordering, forward_checking, stats)
+
 
 if __name__ == "__main__":
     import time
@@ -37,8 +70,8 @@ if __name__ == "__main__":
     print(solved_board)
     print("Completed in {}s".format(round(end_time - start_time, 3)))
 
-    for y in range(9):
-        for x in range(9):
+    for y in range(solved_board.size):
+        for x in range(solved_board.size):
             print(solved_board.get_board_item(x, y), end="")
         print()
     input()
\ No newline at end of file
@@ -0,0 +1,39 @@
+import threading
+import time
+
+# Each thread has its own deadline, so engines running in several threads at once each keep to their own.
+# The searches call check_deadline every so many nodes, which is cheap enough to leave in when there's no
+# deadline, and works in any thread (unlike SIGALRM, which only works in the main thread).
+_deadlines = threading.local()
+
+
+class EngineTimeout(Exception):
+    """ Raised when a solve runs past its deadline (see engines.run_engine). """
+    pass
+
+
+def get_deadline():
+    """ Get the calling thread's deadline.
+    Returns:
+        deadline (float): time.monotonic() time to stop solving at, None for no deadline
+    """
+    return getattr(_deadlines, "deadline", None)
+
+
+def set_deadline(deadline):
+    """ Set the calling thread's deadline.
+    Parameters:
+        deadline (float): time.monotonic() time to stop solving at, None for no deadline
+    Returns:
+        previous (float): the deadline it replaced, to put back once the solve is over
+    """
+    previous = get_deadline()
+    _deadlines.deadline = deadline
+    return previous
+
+
+def check_deadline():
+    """ Raise EngineTimeout if the calling thread's deadline has passed. """
+    deadline = getattr(_deadlines, "deadline", None)
+    if deadline is not None and time.monotonic() > deadline:
+        raise EngineTimeout()
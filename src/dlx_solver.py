@@ -0,0 +1,342 @@
+from array import array
+from deadlines import check_deadline
+from solver import Solver
+from units import get_layout
+from stats import phase
+
+# The exact cover matrix has a row for every (cell, digit) choice and a column for each constraint:
+# every cell has a digit, and every row, column and section has each digit once.
+# That's 729 rows and 324 columns on a 9x9 board.
+# Node 0 is the root, the next nodes are the column headers and every matrix row adds 4 more.
+
+
+def _build_matrix(n=3):
+    """ Build the links of the full matrix, before any clues are applied.
+    Parameters:
+        n (int): width of the board's sections
+    Returns:
+        links (tuple): left, right, up, down, column and row arrays (indexed by node),
+            column sizes and the first node of each matrix row
+    """
+    layout = get_layout(n)
+    size = layout.size
+    cell_count = layout.cell_count
+    column_count = cell_count * 4
+    left = list(range(-1, column_count))
+    right = list(range(1, column_count + 2))
+    left[0], right[column_count] = column_count, 0
+    up = list(range(column_count + 1))
+    down = list(range(column_count + 1))
+    column_of = list(range(column_count + 1))
+    row_of = [-1, ] * (column_count + 1)
+    sizes = [0, ] * (column_count + 1)
+    first_nodes = []
+
+    for row in range(cell_count * size):
+        if not row & 1023:
+            check_deadline()  # Big boards have tens of thousands of rows
+        index, digit = divmod(row, size)
+        x, y = layout.cells[index]
+        section = layout.cell_units[index][2] - size * 2
+        first = len(left)
+        first_nodes.append(first)
+        for offset, column in enumerate((1 + index, 1 + cell_count + y * size + digit,
+                                         1 + cell_count * 2 + x * size + digit,
+                                         1 + cell_count * 3 + section * size + digit)):
+            node = first + offset
+            left.append(first + (offset - 1) % 4)
+            right.append(first + (offset + 1) % 4)
+            up.append(up[column])
+            down.append(column)
+            down[up[column]] = node
+            up[column] = node
+            column_of.append(column)
+            row_of.append(row)
+            sizes[column] += 1
+
+    return (array("i", left), array("i", right), array("i", up), array("i", down),
+            array("i", column_of), array("i", row_of), array("i", sizes), array("i", first_nodes))
+
+
+_MATRICES = {3: _build_matrix(3)}  # The prebuilt matrix for each section width, built when first needed
+
+
+class DancingLinks:
+    """ Algorithm X over the sudoku's exact cover matrix, with dancing links.
+    The nodes are kept as flat integer arrays of their left, right, up and down neighbours
+    rather than as one object per node. Each instance starts from a copy of a prebuilt matrix.
+    """
+
+    def __init__(self, n=3):
+        """ Copy the matrix for a board of n by n sections.
+        Parameters:
+            n (int): width of the board's sections
+        """
+        if n not in _MATRICES:
+            _MATRICES[n] = _build_matrix(n)
+        left, right, up, down, column_of, row_of, sizes, first_nodes = _MATRICES[n]
+        self.left = left[:]
+        self.right = right[:]
+        self.up = up[:]
+        self.down = down[:]
+        self.sizes = sizes[:]
+        self.column_of = column_of
+        self.row_of = row_of
+        self.first_nodes = first_nodes
+        self.covered = bytearray(len(sizes))
+        self.solution = []
+        self.nodes = 0
+        self.backtracks = 0  # Columns that ran out of rows to try
+        self.max_depth = 0  # Most rows chosen by the search at once, on top of the clues
+        self.limit = 1  # Stop once this many solutions are found
+        self.solutions = 0
+        self.first_solution = None  # Rows of the first solution found
+        self._clue_rows = 0
+        # Every node scans the columns, so the deadline is looked at every 1024 nodes on 9x9 and more often
+        # on bigger boards, in proportion to their columns (a power of two less one, to mask the node count)
+        self._deadline_mask = (1 << max((1024 * 325 // len(sizes)).bit_length() - 1, 4)) - 1
+
+    def cover(self, column):
+        """ Remove the column from the header list and every row that has a node in it from the matrix. """
+        left, right, up, down, sizes, column_of = self.left, self.right, self.up, self.down, self.sizes, self.column_of
+        right[left[column]] = right[column]
+        left[right[column]] = left[column]
+        self.covered[column] = 1
+        row = down[column]
+        while row != column:
+            node = right[row]
+            while node != row:
+                down[up[node]] = down[node]
+                up[down[node]] = up[node]
+                sizes[column_of[node]] -= 1
+                node = right[node]
+            row = down[row]
+
+    def uncover(self, column):
+        """ Put the column back, the exact reverse of cover. """
+        left, right, up, down, sizes, column_of = self.left, self.right, self.up, self.down, self.sizes, self.column_of
+        row = up[column]
+        while row != column:
+            node = left[row]
+            while node != row:
+                sizes[column_of[node]] += 1
+                down[up[node]] = node
+                up[down[node]] = node
+                node = left[node]
+            row = up[row]
+        self.covered[column] = 0
+        right[left[column]] = column
+        left[right[column]] = column
+
+    def select(self, row):
+        """ Take a matrix row as part of the solution, covering all of its columns.
+        Parameters:
+            row (int): matrix row, cell index * size + digit - 1
+        Returns:
+            consistent (bool): False if one of its constraints is already satisfied
+        """
+        first = self.first_nodes[row]
+        node = first
+        while True:
+            if self.covered[self.column_of[node]]:
+                return False
+            node = self.right[node]
+            if node == first:
+                break
+        while True:
+            self.cover(self.column_of[node])
+            node = self.right[node]
+            if node == first:
+                break
+        self.solution.append(row)
+        return True
+
+    def search(self):
+        """ Search for an exact cover of the remaining columns.
+        Returns:
+            solved (bool): whether one was found, if so its rows are in solution
+        """
+        return self.count_solutions(1) == 1
+
+    def count_solutions(self, limit=2):
+        """ Count the exact covers, stopping as soon as limit of them are found.
+        Parameters:
+            limit (int): most solutions to look for
+        Returns:
+            count (int): number of solutions found, at most limit
+        """
+        self.limit = limit
+        self._clue_rows = len(self.solution)
+        self._search()
+        return self.solutions
+
+    def _search(self):
+        """ Branch on the column with the fewest rows, depth first.
+        The search keeps its own stack of the column branched on at each level and the row being tried in it,
+        rather than recursing, so a big board (over a thousand levels deep on 36x36) isn't limited by the
+        recursion limit.
+        Returns:
+            stop (bool): whether enough solutions were found to stop searching, the matrix is left as it was
+                at the last solution if so
+        """
+        right, down, left, sizes, column_of, row_of = (self.right, self.down, self.left, self.sizes, self.column_of,
+                                                       self.row_of)
+        cover, uncover = self.cover, self.uncover
+        solution = self.solution
+        stack = []  # (column, row) for each level, the column branched on and the row being tried in it
+        descending = True
+        while True:
+            if descending:
+                if right[0] == 0:
+                    self.solutions += 1
+                    if self.first_solution is None:
+                        self.first_solution = list(solution)
+                    if self.solutions >= self.limit:
+                        return True
+                    descending = False
+                    continue
+                self.nodes += 1
+                if not self.nodes & self._deadline_mask:
+                    check_deadline()
+                depth = len(solution) - self._clue_rows
+                if depth > self.max_depth:
+                    self.max_depth = depth
+
+                # Branch on the column with the fewest rows left
+                column = right[0]
+                best = column
+                while column != 0:
+                    if sizes[column] < sizes[best]:
+                        best = column
+                        if sizes[best] <= 1:
+                            break
+                    column = right[column]
+                if sizes[best] == 0:
+                    descending = False
+                    continue
+                cover(best)
+                row = down[best]
+            else:
+                # Take back the row being tried on the top level, and move on to the next row of its column
+                if not stack:
+                    return False
+                best, row = stack.pop()
+                node = left[row]
+                while node != row:
+                    uncover(column_of[node])
+                    node = left[node]
+                solution.pop()
+                row = down[row]
+                if row == best:
+                    uncover(best)
+                    self.backtracks += 1
+                    continue
+
+            solution.append(row_of[row])
+            node = right[row]
+            while node != row:
+                cover(column_of[node])
+                node = right[node]
+            stack.append((best, row))
+            descending = True
+
+
+class DLXSolver(Solver):
+    """ Solve the sudoku as an exact cover problem with Dancing Links (Knuth's Algorithm X).
+    Much steadier than a depth first search on puzzles made to be awkward for it. """
+
+    @staticmethod
+    def solve(filename="game.txt", show_solving=False, grid=None, stats=None):
+        """ Solve the sudoku at filename (or grid) and return it.
+        Parameters:
+            filename (string): filename that sudoku is saved in
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            grid (string or list): puzzle to solve instead of the file, either a puzzle string
+                or a list of rows of numbers (0 or None for blanks)
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            sudoku (Board): The solved sudoku (or None if not possible)
+        """
+        if grid is None:
+            board = DLXSolver.get_board(filename, stats=stats)
+        else:
+            board = DLXSolver.get_board_from_grid(grid, stats)
+        return DLXSolver.solve_board(board, show_solving, stats)
+
+    @staticmethod
+    def get_board_from_grid(grid, stats=None):
+        """ Load an in memory puzzle, fill in initial candidates and return it
+        Parameters:
+            grid (string or list): a puzzle string, or a list of rows of numbers (0 or None for blanks)
+            stats (SolveStats): stats to time the loading into, None for no stats
+        Returns:
+            board (Board): the sudoku
+        """
+        if type(grid) != str:
+            grid = " ".join(str(cell) if cell else "." for row in grid for cell in row)
+        return Solver.get_board_from_string(grid, stats=stats)
+
+    @staticmethod
+    def solve_board(board, show_solving=False, stats=None):
+        """ Solve the already loaded sudoku in place and return it.
+        Parameters:
+            board (Board): sudoku to solve
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            sudoku (Board): The solved sudoku, unchanged if there is no solution
+        """
+        with phase(stats, "search", board):
+            links = DLXSolver.get_links(board)
+            solved = links is not None and links.search()
+        if stats is not None and links is not None:
+            stats.add_search(links.nodes, links.backtracks, links.max_depth)
+        if solved:
+            for row in links.first_solution:
+                index, digit = divmod(row, board.size)
+                x, y = board.layout.cells[index]
+                if not board.contains_value(x, y):
+                    board.set_board_item(digit + 1, x, y)
+        if show_solving:
+            print(board, end="\n" + "=" * 21 + "\n")
+        return board
+
+    @staticmethod
+    def count_solutions(board, limit=2):
+        """ Count the solutions of the sudoku, stopping as soon as limit of them are found.
+        Parameters:
+            board (Board): sudoku to count the solutions of
+            limit (int): most solutions to look for, 2 is enough to tell if the solution is unique
+        Returns:
+            count (int): number of solutions found, at most limit
+        """
+        links = DLXSolver.get_links(board)
+        if links is None:
+            return 0
+        return links.count_solutions(limit)
+
+    @staticmethod
+    def get_links(board):
+        """ Build the exact cover matrix for the board, with its clues selected.
+        Parameters:
+            board (Board): sudoku to build the matrix for
+        Returns:
+            links (DancingLinks): the matrix, or None if the clues contradict each other
+        """
+        links = DancingLinks(board.n)
+        for index, (x, y) in enumerate(board.layout.cells):
+            cell = board.get_board_item(x, y)
+            if type(cell) == int and not links.select(index * board.size + cell - 1):
+                return None
+        return links
+
+
+if __name__ == "__main__":
+    import time
+    print("Solving...")
+    start_time = time.time()
+    solved_board = DLXSolver.solve()
+    end_time = time.time()
+    print("Solved sudoku:")
+    print(solved_board)
+    print("Completed in {}s".format(round(end_time - start_time, 3)))
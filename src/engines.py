@@ -0,0 +1,83 @@
+import time
+from bit_board import BitBoard
+from backtrack_solver import BacktrackSolver
+from constraint_solver import ConstraintSolver
+from constraint_backtrack_solver import ConstraintBacktrackSolver
+from deadlines import EngineTimeout, get_deadline, set_deadline
+from dlx_solver import DLXSolver
+from solver_session import SessionSolver
+from stochastic_solver import StochasticSolver
+
+# Engines are a solver class and the options to pass to its solve_board
+ENGINES = {
+    "backtrack": (BacktrackSolver, {}),
+    "backtrack_mrv": (BacktrackSolver, {"ordering": "mrv", "forward_checking": True}),
+    "constraint": (ConstraintSolver, {}),
+    "constraint_backtrack": (ConstraintBacktrackSolver, {}),
+    "constraint_backtrack_mrv": (ConstraintBacktrackSolver, {"ordering": "mrv", "forward_checking": True}),
+    "dlx": (DLXSolver, {}),
+    "session": (SessionSolver, {}),
+    "stochastic": (StochasticSolver, {"seed": 0}),
+}
+
+
+def register_engine(name, solver, **options):
+    """ Make a new engine available to the benchmark and portfolio under name.
+    Parameters:
+        name (string): name to pick the engine by
+        solver (type): solver class, its solve_board is called with the board and options
+        options: keyword arguments for solve_board
+    """
+    ENGINES[name] = (solver, options)
+
+
+def run_engine(engine, board, timeout=None, stats=None):
+    """ Solve the already loaded board in place with an engine.
+    The searches (and the longer set up, such as building a big exact cover matrix) look at the timeout every
+    thousand or so steps (see deadlines.py), so it works in any thread and never interrupts cleanup.
+    Parameters:
+        engine (string): key of the engine in ENGINES
+        board (Board): sudoku to solve, with its candidates filled in
+        timeout (float): seconds to give up after, None for no limit
+        stats (SolveStats): stats to fill in, None for no stats
+    Returns:
+        sudoku (Board): the board, solved if the engine could
+    Raises:
+        EngineTimeout: if the engine ran out of time, the board is left part way solved
+    """
+    solver, options = ENGINES[engine]
+    deadline = None if timeout is None else time.monotonic() + timeout
+    outer_deadline = get_deadline()  # An engine run inside another's solve keeps to the sooner deadline
+    if outer_deadline is not None and (deadline is None or outer_deadline < deadline):
+        deadline = outer_deadline
+    set_deadline(deadline)
+    try:
+        if stats is None:
+            return solver.solve_board(board, **options)
+        return solver.solve_board(board, stats=stats, **options)
+    finally:
+        set_deadline(outer_deadline)
+
+
+def verify(puzzle, solution):
+    """ Is solution a correct solution of puzzle?
+    It's checked on a fresh board, so it doesn't trust anything the solver did.
+    Parameters:
+        puzzle (string): the puzzle
+        solution (string): the solution to check
+    Returns:
+        correct (bool): whether the solution is full, valid and keeps the puzzle's clues
+    """
+    board = BitBoard()
+    try:
+        board.load_string(solution)
+    except ValueError:
+        return False
+    puzzle_board = BitBoard()
+    puzzle_board.load_string(puzzle)
+    size = board.size
+    if puzzle_board.size != size or not board.is_solved():
+        return False
+    return all(not puzzle_board.contains_value(x, y) or
+               puzzle_board.get_board_item(x, y) == board.get_board_item(x, y)
+               for y in range(size) for x in range(size))
@@ -0,0 +1,210 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+from solver import Solver
+from backtrack_solver import BacktrackSolver
+from propagator import Propagator
+from search_engine import SearchEngine
+
+# Difficulty bands, easiest first. Each band but the last is the rules it takes to solve a puzzle in it
+# (see propagator.RULES), the last band is for puzzles the rules can't finish, which need search.
+BANDS = (
+    ("easy", ("naked_singles", "hidden_singles")),
+    ("medium", ("naked_singles", "hidden_singles", "naked_pairs", "hidden_pairs", "pointing", "claiming")),
+    ("hard", ("naked_singles", "hidden_singles", "naked_pairs", "hidden_pairs", "pointing", "claiming",
+              "naked_triples", "hidden_triples", "naked_quads", "hidden_quads")),
+    ("expert", None),
+)
+BAND_NAMES = tuple(name for name, rules in BANDS)
+
+
+def random_grid(rng=random):
+    """ Make a random full grid.
+    The three sections on the diagonal don't share any rows or columns, so they're filled with random
+    permutations and the rest of the grid is found by search. The digits are then relabelled and the
+    rows and columns shuffled within their bands and stacks, so the search order doesn't show.
+    Parameters:
+        rng (Random): random number generator to use
+    Returns:
+        solution (string): the grid, 81 characters row by row
+    """
+    grid = ["."] * 81
+    for section in range(3):
+        digits = rng.sample("123456789", 9)
+        for offset, digit in enumerate(digits):
+            grid[section * 30 + offset % 3 + offset // 3 * 9] = digit
+    board = Solver.get_board_from_string("".join(grid))
+    BacktrackSolver.search(board, "mrv", True)
+    grid = board.to_string()
+
+    labels = dict(zip("123456789", rng.sample("123456789", 9)))
+    rows = [band * 3 + row for band in rng.sample(range(3), 3) for row in rng.sample(range(3), 3)]
+    columns = [stack * 3 + column for stack in rng.sample(range(3), 3) for column in rng.sample(range(3), 3)]
+    if rng.random() < 0.5:
+        return "".join(labels[grid[x * 9 + y]] for y in rows for x in columns)
+    return "".join(labels[grid[y * 9 + x]] for y in rows for x in columns)
+
+
+def is_unique(puzzle):
+    """ Does the puzzle have exactly one solution?
+    Parameters:
+        puzzle (string): 81 characters, row by row, "." or "0" for blanks
+    Returns:
+        unique (bool): whether it has one solution
+    """
+    return BacktrackSolver.has_unique_solution(Solver.get_board_from_string(puzzle))
+
+
+def remove_clues(solution, rng=random, min_clues=17, symmetric=False):
+    """ Take clues out of a full grid, in a random order, as long as the puzzle stays unique.
+    Every clue is tried once, so the result is minimal unless min_clues stopped it first.
+    Parameters:
+        solution (string): full grid, 81 characters row by row
+        rng (Random): random number generator to use
+        min_clues (int): stop once the puzzle is down to this many clues
+        symmetric (bool): remove clues in pairs, rotationally symmetric about the centre
+    Returns:
+        puzzle (string): the puzzle, "." for blanks
+    """
+    puzzle = list(solution)
+    clues = 81
+    cells = list(range(81))
+    rng.shuffle(cells)
+    for cell in cells:
+        removing = {cell, 80 - cell} if symmetric else {cell}
+        if puzzle[cell] == "." or clues - len(removing) < min_clues:
+            continue
+        kept = [(index, puzzle[index]) for index in removing]
+        for index in removing:
+            puzzle[index] = "."
+        if is_unique("".join(puzzle)):
+            clues -= len(removing)
+        else:
+            for index, digit in kept:
+                puzzle[index] = digit
+    return "".join(puzzle)
+
+
+def grade(puzzle):
+    """ Grade how hard a puzzle is.
+    The puzzle is propagated with the rules of each band in turn, and falls in the first band whose
+    rules solve it. Puzzles none of the rules solve are graded by how many search nodes they then take.
+    Parameters:
+        puzzle (string): 81 characters, row by row, "." or "0" for blanks
+    Returns:
+        band (string): the difficulty band, one of BAND_NAMES
+        nodes (int): search nodes needed after propagating with every rule, 0 if no search was needed
+    """
+    for name, rules in BANDS:
+        board = Solver.get_board_from_string(puzzle)
+        if rules is None:
+            break
+        propagator = Propagator(board, rules)
+        propagator.propagate()
+        if 0 not in propagator.values:
+            return name, 0
+    propagator.write_to(board)
+    engine = SearchEngine(board, "mrv", True)
+    engine.search()
+    return BANDS[-1][0], engine.nodes
+
+
+def generate(rng=random, min_clues=17, symmetric=False):
+    """ Make a random puzzle with a unique solution and grade it.
+    Parameters:
+        rng (Random): random number generator to use
+        min_clues (int): fewest clues to leave
+        symmetric (bool): whether the clues should be rotationally symmetric
+    Returns:
+        puzzle (string): the puzzle, "." for blanks
+        band (string): its difficulty band
+        nodes (int): search nodes it needed, see grade
+    """
+    puzzle = remove_clues(random_grid(rng), rng, min_clues, symmetric)
+    band, nodes = grade(puzzle)
+    return puzzle, band, nodes
+
+
+def _generate_seeded(seed):
+    """ Generate one puzzle in a worker process, from its own seed. """
+    return generate(random.Random(seed))
+
+
+def generate_bands(counts, workers=None, seed=None):
+    """ Generate puzzles until there are enough in each difficulty band.
+    Puzzles are generated at random and kept if their band still needs more,
+    so bands that random puzzles rarely fall in (expert especially) take the longest to fill.
+    Parameters:
+        counts (dict): number of puzzles wanted, by band name
+        workers (int): number of worker processes, defaults to the number of cpus
+        seed (int): seed to make the puzzles reproducible, None for a random one
+    Returns:
+        puzzles (dict): lists of puzzle strings, by band name
+    """
+    for name in counts:
+        if name not in BAND_NAMES:
+            raise ValueError("Unknown band {}, expected one of {}".format(name, ", ".join(BAND_NAMES)))
+    puzzles = {name: [] for name in counts}
+    missing = sum(counts.values())
+    if missing <= 0:
+        return puzzles
+    seeds = _seeds(random.Random(seed))
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        results = map(_generate_seeded, seeds)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        # In the order of their seeds (not the order they finish in), so a seed always gives the same puzzles
+        results = pool.imap(_generate_seeded, seeds, chunksize=4)
+    try:
+        for puzzle, band, nodes in results:
+            if band in puzzles and len(puzzles[band]) < counts[band]:
+                puzzles[band].append(puzzle)
+                missing -= 1
+                if missing <= 0:
+                    break
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return puzzles
+
+
+def _seeds(rng):
+    """ Endless stream of seeds for the workers. """
+    while True:
+        yield rng.getrandbits(64)
+
+
+def main(argv=None):
+    """ Generate puzzles and write each band to its own file, one puzzle per line. """
+    parser = argparse.ArgumentParser(description="Generate sudokus with unique solutions, graded by difficulty.")
+    parser.add_argument("counts", nargs="+", metavar="BAND=COUNT",
+                        help="how many puzzles to make in a band, bands are {}".format(", ".join(BAND_NAMES)))
+    parser.add_argument("-o", "--output", default=".", help="directory to write <band>.txt files to")
+    parser.add_argument("-w", "--workers", type=int, default=0,
+                        help="number of worker processes (default 0, one per cpu)")
+    parser.add_argument("--seed", type=int, help="seed to make the puzzles reproducible")
+    args = parser.parse_args(argv)
+
+    counts = {}
+    for item in args.counts:
+        name, _, count = item.partition("=")
+        if name not in BAND_NAMES or not count.isdigit():
+            parser.error("expected BAND=COUNT with a band from {}, got {}".format(", ".join(BAND_NAMES), item))
+        counts[name] = int(count)
+
+    puzzles = generate_bands(counts, args.workers or None, args.seed)
+    os.makedirs(args.output, exist_ok=True)
+    for name, band_puzzles in puzzles.items():
+        with open(os.path.join(args.output, name + ".txt"), "a") as file:
+            for puzzle in band_puzzles:
+                file.write(puzzle + "\n")
+        print("{}: {} puzzles".format(name, len(band_puzzles)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from bit_board import BitBoard
+from solver import Solver
+from units import format_puzzle, get_layout, parse_puzzle
+
+# A packed corpus is a header then fixed width records, one board each:
+# - header: MAGIC, format version, n (section width), bits per cell, flags, then padding to 16 bytes
+# - record: with HAS_IDS an 8 byte little endian id, then the cells row by row, bits per cell each (0 for a
+#   blank), packed high bits first and padded out to a whole byte
+# There's no count of records, it's worked out from the file's size, so a writer can keep appending to a file
+# while it's being read (the reader just won't see the new records).
+MAGIC = b"SDKP"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBB8x")
+HAS_IDS = 1
+RECORD_ID = struct.Struct("<Q")
+
+# 9x9 boards (4 bits per cell) are packed and unpacked through hex strings, each hex digit is a cell
+_VALUE_TO_HEX = bytes(b"0123456789abcdef"[value] if value < 16 else 0 for value in range(256))
+_HEX_TO_VALUE = bytes(b"0123456789abcdef".find(char) % 16 for char in range(256))
+
+
+def cell_bits(n=3):
+    """ Get the number of bits each cell takes in a record, enough for the values 0 to n * n.
+    Parameters:
+        n (int): width of a section in cells
+    Returns:
+        bits (int): bits per cell, 4 for a 9x9 board
+    """
+    return (n * n).bit_length()
+
+
+def record_size(n=3, ids=False):
+    """ Get the size of a record of a packed corpus.
+    Parameters:
+        n (int): width of a section in cells
+        ids (bool): whether the records start with an id
+    Returns:
+        size (int): bytes per record, 41 for a 9x9 board without ids
+    """
+    return (n ** 4 * cell_bits(n) + 7) // 8 + (RECORD_ID.size if ids else 0)
+
+
+def pack_values(values, n=3):
+    """ Pack the cells of a board into a record (without an id).
+    Parameters:
+        values (bytes or list): the value of every cell row by row, 0 for blanks
+        n (int): width of a section in cells
+    Returns:
+        record (bytes): the packed cells
+    """
+    values = bytes(values)
+    cells = n ** 4
+    if len(values) != cells:
+        raise ValueError("A {0}x{0} board has {1} cells, not {2}".format(n * n, cells, len(values)))
+    if values and max(values) > n * n:
+        raise ValueError("A {0}x{0} board can't have a {1} in it".format(n * n, max(values)))
+    bits = cell_bits(n)
+    if bits == 4:
+        digits = values.translate(_VALUE_TO_HEX).decode("ascii")
+        return bytes.fromhex(digits + "0" if cells % 2 else digits)
+    number = 0
+    for value in values:
+        number = number << bits | value
+    size = (cells * bits + 7) // 8
+    return (number << (size * 8 - cells * bits)).to_bytes(size, "big")
+
+
+def unpack_values(record, n=3):
+    """ Unpack the cells of a board from a record (without its id).
+    Parameters:
+        record (bytes): the packed cells
+        n (int): width of a section in cells
+    Returns:
+        values (bytes): the value of every cell row by row, 0 for blanks
+    Raises:
+        ValueError: if a cell holds a value too big for the board
+    """
+    cells = n ** 4
+    bits = cell_bits(n)
+    if bits == 4:
+        values = record.hex()[:cells].encode("ascii").translate(_HEX_TO_VALUE)
+    else:
+        number = int.from_bytes(record, "big") >> (len(record) * 8 - cells * bits)
+        mask = (1 << bits) - 1
+        values = bytes(number >> (bits * (cells - 1 - index)) & mask for index in range(cells))
+    if max(values) > n * n:
+        raise ValueError("Record has a {} in it, too big for a {}x{} board".format(max(values), n * n, n * n))
+    return values
+
+
+def is_packed(filename):
+    """ Is the file at filename a packed corpus? """
+    with open(filename, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+class PackedCorpus:
+    """ Reads a packed corpus (see MAGIC) through a memory map.
+    Nothing is read up front, the records are only unpacked when asked for, by index or a slice at a time,
+    and straight into a BitBoard, without going through a string.
+    Use as "with PackedCorpus(filename) as corpus: board = corpus[12345]".
+    """
+
+    def __init__(self, filename):
+        """ Open the corpus at filename.
+        Parameters:
+            filename (string): file the corpus is saved in
+        Raises:
+            ValueError: if the file isn't a packed corpus
+        """
+        self.filename = filename
+        with open(filename, "rb") as file:
+            header = file.read(HEADER.size)
+            if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+                raise ValueError("{} isn't a packed corpus".format(filename))
+            magic, version, self.n, bits, flags = HEADER.unpack(header)
+            if version != VERSION:
+                raise ValueError("{} is a version {} packed corpus, expected {}".format(filename, version, VERSION))
+            get_layout(self.n)  # Check the size is one the solvers handle
+            if bits != cell_bits(self.n):
+                raise ValueError("{} has {} bits per cell, expected {}".format(filename, bits, cell_bits(self.n)))
+            self.ids = bool(flags & HAS_IDS)
+            self.record_size = record_size(self.n, self.ids)
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = (len(self._map) - HEADER.size) // self.record_size  # A partly written last record is ignored
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+        return False
+
+    def close(self):
+        """ Unmap the file. """
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        """ Get a board, or a list of them for a slice (see board). """
+        if isinstance(index, slice):
+            return [self.board(i) for i in range(*index.indices(self._count))]
+        return self.board(index)
+
+    def __iter__(self):
+        return self.boards()
+
+    def _cells(self, index):
+        """ Get the packed cells of record index. """
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("Record {} is out of range, the corpus has {}".format(index, self._count))
+        start = HEADER.size + index * self.record_size
+        if self.ids:
+            start += RECORD_ID.size
+        return self._map[start:HEADER.size + (index + 1) * self.record_size]
+
+    def values(self, index):
+        """ Get the value of every cell of a record.
+        Parameters:
+            index (int): number of the record
+        Returns:
+            values (bytes): the value of every cell row by row, 0 for blanks
+        """
+        return unpack_values(self._cells(index), self.n)
+
+    def board(self, index, candidates=True):
+        """ Get a record as a board ready to solve.
+        Parameters:
+            index (int): number of the record
+            candidates (bool): whether to fill in the candidates of the blanks (see Solver.fill_candidates)
+        Returns:
+            board (BitBoard): the board
+        """
+        board = BitBoard(self.n)
+        board.load_values(self.values(index), self.n)
+        if candidates:
+            Solver.fill_candidates(board)
+        return board
+
+    def puzzle(self, index):
+        """ Get a record as a puzzle string (see Board.to_string).
+        Parameters:
+            index (int): number of the record
+        Returns:
+            puzzle (string): the board as a string
+        """
+        if self.n == 3:
+            return self._cells(index).hex()[:81].replace("0", ".")
+        return format_puzzle(self.values(index), self.n * self.n)
+
+    def record_id(self, index):
+        """ Get the id stored with a record, or the record's number if the corpus has no ids. """
+        if not self.ids:
+            return index if index >= 0 else index + self._count
+        self._cells(index)  # Check the index
+        return RECORD_ID.unpack_from(self._map, HEADER.size + (index % self._count) * self.record_size)[0]
+
+    def boards(self, start=0, stop=None, candidates=True):
+        """ Lazily get the boards of a run of records (see board).
+        Parameters:
+            start (int): number of the first record
+            stop (int): number of the record after the last, None for the end of the corpus
+            candidates (bool): whether to fill in the candidates of the blanks
+        Returns:
+            boards (generator): the boards
+        """
+        stop = self._count if stop is None else min(stop, self._count)
+        for index in range(start, stop):
+            yield self.board(index, candidates)
+
+    def puzzles(self, start=0, stop=None):
+        """ Lazily get the puzzle strings of a run of records (see puzzle).
+        Parameters:
+            start (int): number of the first record
+            stop (int): number of the record after the last, None for the end of the corpus
+        Returns:
+            puzzles (generator): the puzzle strings
+        """
+        stop = self._count if stop is None else min(stop, self._count)
+        for index in range(start, stop):
+            yield self.puzzle(index)
+
+
+class PackedCorpusWriter:
+    """ Appends boards (puzzles or their solutions) to a packed corpus (see MAGIC).
+    Appending to an existing corpus carries on after its last whole record. The corpus is only readable up
+    to the last record flushed, so close (or flush) the writer before reading what it wrote.
+    Use as "with PackedCorpusWriter(filename) as writer: writer.append(board)".
+    """
+
+    def __init__(self, filename, n=None, ids=False):
+        """ Open the corpus at filename to append to, creating it if there isn't one.
+        Parameters:
+            filename (string): file to write the corpus to
+            n (int): width of a section in cells, None to take it from the corpus, or the first board appended
+            ids (bool): whether to store an id with every record (ignored if the corpus already exists)
+        Raises:
+            ValueError: if the file isn't a packed corpus, or is one of boards of another size
+        """
+        self.filename = filename
+        self.n = n
+        self.ids = ids
+        self.count = 0
+        if n is not None:
+            get_layout(n)  # Check the size is one the solvers handle
+        # Everything is checked before the file is opened, so a corpus that can't be appended to is left alone
+        existing = os.path.exists(filename) and os.path.getsize(filename) > 0
+        if existing:
+            with PackedCorpus(filename) as corpus:
+                if n is not None and corpus.n != n:
+                    raise ValueError("{} holds {}x{} boards, not {}x{}".format(filename, corpus.n ** 2, corpus.n ** 2,
+                                                                               n * n, n * n))
+                self.n, self.ids, self.count = corpus.n, corpus.ids, len(corpus)
+                end = HEADER.size + self.count * corpus.record_size
+        self._file = open(filename, "a+b")
+        if existing:
+            self._file.truncate(end)  # Drop a partly written record
+        elif n is not None:
+            self._write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+        return False
+
+    def _write_header(self):
+        """ Start the corpus with its header, once n is known. """
+        get_layout(self.n)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.n, cell_bits(self.n), HAS_IDS if self.ids else 0))
+
+    def append_values(self, values, n=3, record_id=None):
+        """ Append a board as the value of every cell.
+        Parameters:
+            values (bytes or list): the value of every cell row by row, 0 for blanks
+            n (int): width of the board's sections
+            record_id (int): id to store with the record, None for its number (ignored if the corpus has no ids)
+        Raises:
+            ValueError: if the board isn't the size of the corpus's boards
+        """
+        if self.n is None:
+            self.n = n
+            self._write_header()
+        elif n != self.n:
+            raise ValueError("{} holds {}x{} boards, not {}x{}".format(self.filename, self.n ** 2, self.n ** 2,
+                                                                       n * n, n * n))
+        record = pack_values(values, n)
+        if self.ids:
+            record = RECORD_ID.pack(self.count if record_id is None else record_id) + record
+        self._file.write(record)
+        self.count += 1
+
+    def append(self, board, record_id=None):
+        """ Append a board (Board or BitBoard), only its values are kept.
+        Parameters:
+            board (Board): the board
+            record_id (int): id to store with the record, None for its number (ignored if the corpus has no ids)
+        """
+        self.append_values(board.get_values(), board.n, record_id)
+
+    def append_string(self, puzzle, record_id=None):
+        """ Append a puzzle string, in any format Board.load_string takes.
+        Parameters:
+            puzzle (string): the puzzle
+            record_id (int): id to store with the record, None for its number (ignored if the corpus has no ids)
+        """
+        n, values = parse_puzzle(puzzle)
+        self.append_values(values, n, record_id)
+
+    def flush(self):
+        """ Write the records appended so far out to the file. """
+        self._file.flush()
+
+    def close(self):
+        """ Write out the records and close the file. """
+        self._file.close()
+
+
+def main(argv=None):
+    """ Pack a text file of puzzles into a packed corpus, or unpack one back into text. """
+    parser = argparse.ArgumentParser(description="Convert a file of puzzles, one per line, to a packed corpus, "
+                                                 "or a packed corpus back to text.")
+    parser.add_argument("input", help="file to convert, text is packed and a packed corpus unpacked")
+    parser.add_argument("output", help="file to write, - for stdout when unpacking (packing appends to it)")
+    parser.add_argument("--ids", action="store_true", help="store each puzzle's line number with it when packing")
+    args = parser.parse_args(argv)
+
+    if is_packed(args.input):
+        output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+        try:
+            with PackedCorpus(args.input) as corpus:
+                for puzzle in corpus.puzzles():
+                    output_file.write(puzzle + "\n")
+        finally:
+            if output_file is not sys.stdout:
+                output_file.close()
+        return
+
+    with open(args.input, "r") as input_file, PackedCorpusWriter(args.output, ids=args.ids) as writer:
+        for line_number, line in enumerate(input_file, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):  # The lines batch.read_puzzles skips
+                writer.append_string(line, line_number)
+    print("Wrote {} boards to {}".format(writer.count, args.output), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
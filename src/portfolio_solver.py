@@ -0,0 +1,303 @@
+import json
+import multiprocessing
+import queue
+import time
+from solver import Solver
+from engines import ENGINES, EngineTimeout, run_engine, verify
+from stats import phase
+
+# Engines raced by default, each is good on puzzles the others are slow on
+PORTFOLIO = ("backtrack", "constraint_backtrack_mrv", "dlx")
+# Where engines can't race (see race) they're tried one at a time, those rarely slow first
+CHEAPEST_FIRST = ("dlx", "session", "constraint_backtrack_mrv", "backtrack_mrv", "constraint_backtrack",
+                  "constraint", "stochastic", "backtrack")
+# Seconds each engine is first given when tried one at a time, doubled every round none of them solves it
+FIRST_ROUND_TIMEOUT = 0.1
+
+
+def puzzle_features(board):
+    """ Get the cheap features of a puzzle the portfolio picks an engine by.
+    Parameters:
+        board (Board): sudoku, with its candidates filled in
+    Returns:
+        features (tuple): (n, clues, candidate density), the density is the mean number of candidates of the
+            blank cells over the number of digits, 0 to 1
+    """
+    clues = 0
+    candidates = 0
+    for x, y in board.layout.cells:
+        cell = board.get_board_item(x, y)
+        if type(cell) == int:
+            clues += 1
+        elif cell:
+            candidates += len(cell)
+    blanks = board.layout.cell_count - clues
+    return board.n, clues, candidates / blanks / board.size if blanks else 0.0
+
+
+class PortfolioModel:
+    """ Learns which engine usually wins on which kind of puzzle.
+    Puzzles are put in buckets by their features (see puzzle_features), and in every bucket each engine has a
+    count of wins (races won, or puzzles solved when tried first) and misses (races lost, whether beaten, wrong
+    or out of time, and times it was tried first and ran out of time). An engine is only picked for a bucket once
+    it has been seen there min_samples times, and of those the one winning the most of the time is picked, if it
+    wins at least min_rate of them.
+    """
+
+    def __init__(self, min_samples=3, min_rate=0.5):
+        """ Make a model that hasn't learnt anything.
+        Parameters:
+            min_samples (int): wins and misses an engine needs in a bucket before it's picked for it
+            min_rate (float): fraction of those it must have won
+        """
+        self.min_samples = min_samples
+        self.min_rate = min_rate
+        self.buckets = {}  # buckets[bucket][engine] is [wins, misses]
+
+    @staticmethod
+    def bucket(features):
+        """ Get the name of the bucket a puzzle with features goes in.
+        Clues and density are both cut into twentieths, so 9x9 buckets are about 4 clues wide.
+        Parameters:
+            features (tuple): from puzzle_features
+        Returns:
+            bucket (string): the bucket
+        """
+        n, clues, density = features
+        cell_count = n ** 4
+        return "{}:{}:{}".format(n, min(clues * 20 // cell_count, 19), min(int(density * 20), 19))
+
+    def record(self, features, engine, won=True):
+        """ Record how an engine did on a puzzle.
+        Parameters:
+            features (tuple): features of the puzzle, from puzzle_features
+            engine (string): key of the engine in ENGINES
+            won (bool): whether it won (or solved the puzzle in time), False if it lost or ran out of time
+        """
+        counts = self.buckets.setdefault(PortfolioModel.bucket(features), {}).setdefault(engine, [0, 0])
+        counts[0 if won else 1] += 1
+
+    def record_race(self, features, winner, losers):
+        """ Record how every engine in a race did on a puzzle.
+        Parameters:
+            features (tuple): features of the puzzle, from puzzle_features
+            winner (string): key of the engine that won, None if none of them solved it in time
+            losers (tuple): keys of the engines that were beaten, got it wrong or ran out of time
+        """
+        if winner is not None:
+            self.record(features, winner)
+        for engine in losers:
+            self.record(features, engine, False)
+
+    def best(self, features):
+        """ Get the engine that usually wins on puzzles like this one.
+        Parameters:
+            features (tuple): features of the puzzle, from puzzle_features
+        Returns:
+            engine (string): key of the engine in ENGINES, None if no engine has been seen to win enough
+        """
+        best_engine, best_rate = None, self.min_rate
+        for engine, (wins, misses) in self.buckets.get(PortfolioModel.bucket(features), {}).items():
+            seen = wins + misses
+            if seen >= self.min_samples and wins / seen >= best_rate and engine in ENGINES:
+                best_engine, best_rate = engine, wins / seen
+        return best_engine
+
+    def save(self, filename):
+        """ Save what the model has learnt as JSON. """
+        with open(filename, "w") as file:
+            json.dump(self.buckets, file, indent=1, sort_keys=True)
+
+    def load(self, filename):
+        """ Load what a model learnt from a file written by save, adding it to what this one has learnt. """
+        with open(filename, "r") as file:
+            for bucket, engines in json.load(file).items():
+                for engine, (wins, misses) in engines.items():
+                    counts = self.buckets.setdefault(bucket, {}).setdefault(engine, [0, 0])
+                    counts[0] += wins
+                    counts[1] += misses
+
+
+# The model used when a solve isn't given one, it learns across every solve in the process
+MODEL = PortfolioModel()
+
+
+def _race_engine(engine, puzzle, results):
+    """ Solve the puzzle with one engine in a race process and put (engine, solution, seconds) on results.
+    The solution is None if the engine failed. """
+    start = time.perf_counter()
+    try:
+        solution = run_engine(engine, Solver.get_board_from_string(puzzle)).to_string()
+    except Exception:
+        solution = None
+    results.put((engine, solution, time.perf_counter() - start))
+
+
+def race(puzzle, engines=PORTFOLIO, timeout=None):
+    """ Solve the puzzle with every engine at once, one process each, and take the first correct solution.
+    The other processes are stopped as soon as there's a winner (or the time runs out).
+    A daemon process (a multiprocessing.Pool worker) can't start processes, so there the engines are
+    tried one after another instead (see _take_turns), which isn't a race so there's nothing to learn from.
+    Parameters:
+        puzzle (string): puzzle to solve
+        engines (tuple): keys of the engines in ENGINES
+        timeout (float): seconds to give up after, None for no limit
+    Returns:
+        engine (string): the engine that won, None if none of them solved the puzzle
+        solution (string): its solution, None if none of them solved the puzzle
+        seconds (float): how long the winning engine took to solve it, not counting starting its process
+        losers (tuple): the engines that were beaten, got it wrong or ran out of time,
+            None in a daemon process where there was no race
+    """
+    if multiprocessing.current_process().daemon:
+        engine, solution, seconds = _take_turns(puzzle, engines, timeout)
+        return engine, solution, seconds, None
+
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_race_engine, args=(engine, puzzle, results), daemon=True)
+                 for engine in engines]
+    for process in processes:
+        process.start()
+    try:
+        for _ in processes:
+            remaining = None if deadline is None else max(deadline - time.perf_counter(), 0)
+            try:
+                engine, solution, seconds = results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if solution is not None and verify(puzzle, solution):
+                return engine, solution, seconds, tuple(other for other in engines if other != engine)
+        return None, None, None, tuple(engines)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        results.close()
+
+
+def _take_turns(puzzle, engines, timeout=None):
+    """ Solve the puzzle with one engine at a time, for where they can't race.
+    The engines go cheapest first (see CHEAPEST_FIRST), in rounds: each gets FIRST_ROUND_TIMEOUT seconds in the
+    first round and twice as long as the round before in every other, so an engine that's slow on the puzzle
+    can't hold up the others for long, even without a timeout.
+    Parameters:
+        puzzle (string): puzzle to solve
+        engines (tuple): keys of the engines in ENGINES
+        timeout (float): seconds to give up after, None for no limit
+    Returns:
+        engine (string): the engine that solved it, None if none of them did
+        solution (string): its solution, None if none of them solved it
+        seconds (float): how long that engine took to solve it
+    """
+    rank = {engine: index for index, engine in enumerate(CHEAPEST_FIRST)}
+    engines = sorted(engines, key=lambda engine: rank.get(engine, len(rank)))
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    round_timeout = FIRST_ROUND_TIMEOUT
+    while engines:
+        failed = []
+        for engine in engines:
+            engine_timeout = round_timeout
+            if deadline is not None:
+                engine_timeout = min(engine_timeout, deadline - time.perf_counter())
+                if engine_timeout <= 0:
+                    return None, None, None
+            start = time.perf_counter()
+            try:
+                solution = run_engine(engine, Solver.get_board_from_string(puzzle), engine_timeout).to_string()
+            except EngineTimeout:
+                continue
+            if verify(puzzle, solution):
+                return engine, solution, time.perf_counter() - start
+            failed.append(engine)  # Finished without solving it, more time won't help
+        engines = [engine for engine in engines if engine not in failed]
+        round_timeout *= 2
+    return None, None, None
+
+
+class PortfolioSolver(Solver):
+    """ Solve the sudoku with whichever of several engines is quickest on it.
+    The engine the model (see PortfolioModel) expects to win on puzzles like this one is tried first, in this
+    process with a short time limit. If there isn't one, or it runs out of time, every engine races in its own
+    process and the first correct solution wins, and the model learns from the winner and the losers. """
+
+    @staticmethod
+    def solve(filename="game.txt", show_solving=False, stats=None, **options):
+        """ Solve the sudoku at filename and return it.
+        Parameters:
+            filename (string): filename that sudoku is saved in
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            stats (SolveStats): stats to fill in, None for no stats
+            options: engines, model and time limits, see PortfolioSolver.solve_board
+        Returns:
+            sudoku (Board): The solved sudoku, unchanged if no engine solved it
+        """
+        board = PortfolioSolver.get_board(filename, stats=stats)
+        return PortfolioSolver.solve_board(board, show_solving, stats=stats, **options)
+
+    @staticmethod
+    def solve_board(board, show_solving=False, stats=None, engines=PORTFOLIO, model=None, inline_timeout=0.05,
+                    timeout=None):
+        """ Solve the already loaded sudoku in place and return it.
+        Parameters:
+            board (Board): sudoku to solve, with its candidates filled in
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            stats (SolveStats): stats to time the solve in, None for no stats
+            engines (tuple): keys of the engines in ENGINES to race
+            model (PortfolioModel): model to pick the engine to try first by and to learn from,
+                None for the one shared by every solve (MODEL)
+            inline_timeout (float): seconds to give the engine tried first before racing them all
+            timeout (float): seconds to give the race, None for no limit
+        Returns:
+            sudoku (Board): The solved sudoku, unchanged if no engine solved it
+        """
+        model = MODEL if model is None else model
+        with phase(stats, "search", board):
+            puzzle = board.to_string()
+            features = puzzle_features(board)
+            engine = model.best(features)
+            solution = None
+            if engine is not None:
+                solution = PortfolioSolver.try_engine(engine, board, puzzle, inline_timeout)
+                model.record(features, engine, solution is not None)
+            raced = solution is None
+            if raced:
+                engine, solution, seconds, losers = race(puzzle, engines, timeout)
+                if losers is not None:
+                    model.record_race(features, engine, losers)
+            if solution is not None:
+                board.load_string(solution)
+        if show_solving:
+            if solution is None:
+                print("No engine solved it")
+            else:
+                print("Solved by {} ({})".format(engine, "won the race" if raced else "tried first"))
+            print(board, end="\n" + "=" * 21 + "\n")
+        return board
+
+    @staticmethod
+    def try_engine(engine, board, puzzle, timeout):
+        """ Solve a copy of the board with one engine in this process.
+        Parameters:
+            engine (string): key of the engine in ENGINES
+            board (Board): sudoku to solve, with its candidates filled in, it isn't changed
+            puzzle (string): the board as a string, to check the solution against
+            timeout (float): seconds to give up after
+        Returns:
+            solution (string): the solution, None if it ran out of time or got it wrong
+        """
+        try:
+            solution = run_engine(engine, board.get_copy(), timeout).to_string()
+        except EngineTimeout:
+            return None
+        return solution if verify(puzzle, solution) else None
+
+
+if __name__ == "__main__":
+    print("Solving...")
+    start_time = time.time()
+    solved_board = PortfolioSolver.solve(show_solving=True)
+    end_time = time.time()
+    print("Completed in {}s".format(round(end_time - start_time, 3)))
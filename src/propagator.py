@@ -0,0 +1,412 @@
+from collections import deque
+from itertools import combinations
+from solve_trace import Step
+
+
+class Propagator:
+    """ Constraint propagation over a compact copy of a board.
+    Values are kept in a flat bytearray and candidates as masks (see BitBoard).
+
+    Whenever a cell's candidates change, the row, column and section containing it are put on a work queue.
+    Propagating pops units off the queue and applies each rule to them (in the order given)
+    until the queue is empty, so only the units touched by the last change are ever looked at again.
+    The rules are looked up by name in RULES, and find the units and peers in the propagator's copy
+    of the board's layout (see units.Layout), so they work for any board size.
+    """
+
+    tracing = False  # Whether propagate applies the rules through _apply_rule even without stats
+
+    def __init__(self, board, rules=None, stats=None):
+        """ Copy the board into the propagator.
+        Parameters:
+            board (Board): sudoku to propagate, with its candidates filled in
+            rules (tuple): names of the rules to apply, in order, from RULES (defaults to DEFAULT_RULES)
+            stats (SolveStats): stats to count each rule's eliminations in, None for no stats
+        """
+        if rules is None:
+            rules = DEFAULT_RULES
+        for rule in rules:
+            if rule not in RULES:
+                raise ValueError("Unknown rule {}, expected one of {}".format(rule, ", ".join(RULES)))
+        self._rules = [RULES[rule] for rule in rules]
+        self._named_rules = list(zip(self._rules, rules))
+        self.stats = stats
+        self.eliminations = 0  # Candidates removed since loading the board
+        layout = board.layout
+        self.cells = layout.cells
+        self.units = layout.units
+        self.cell_units = layout.cell_units
+        self.peers = layout.peers
+        self.intersections = layout.intersections
+        self.mask_digits = layout.mask_digits
+        self.all_digits = layout.all_digits
+        self.line_count = layout.size * 2  # Units below this are rows and columns, the rest are sections
+        self.values = bytearray(layout.cell_count)
+        self.candidates = [0, ] * layout.cell_count
+        self.queue = deque()
+        self.queued = bytearray(layout.unit_count)
+        self._all_queued = b"\x01" * layout.unit_count
+        self._used = [0, ] * layout.unit_count  # Scratch for load_values
+        self.load(board)
+
+    def load(self, board):
+        """ Copy a board into the propagator, dropping whatever it was propagating before.
+        Everything is reset in the buffers the propagator already has, so it can be reused for board after
+        board of the same size (see solver_session.SolverSession).
+        Parameters:
+            board (Board): sudoku to propagate, with its candidates filled in, the same size as the last
+        """
+        values = self.values
+        candidates = self.candidates
+        for index, (x, y) in enumerate(self.cells):
+            if board.contains_value(x, y):
+                values[index] = board.get_board_item(x, y)
+                candidates[index] = 0
+            else:
+                values[index] = 0
+                candidates[index] = board.get_candidate_mask(x, y)
+        self._reset(board.is_valid())
+
+    def load_values(self, values):
+        """ Load a board into the propagator from its values, like load.
+        Each blank's candidates are every digit its row, column and section don't use (see Solver.fill_candidates).
+        Parameters:
+            values (bytes): the value of every cell row by row, 0 for blanks
+        """
+        self.values[:] = values
+        used = self._used
+        for unit in range(len(used)):
+            used[unit] = 0
+        repeats = False
+        for index, value in enumerate(self.values):
+            if value:
+                bit = 1 << (value - 1)
+                for unit in self.cell_units[index]:
+                    if used[unit] & bit:
+                        repeats = True
+                    used[unit] |= bit
+        candidates = self.candidates
+        all_digits = self.all_digits
+        for index, (row, column, section) in enumerate(self.cell_units):
+            candidates[index] = 0 if values[index] else all_digits & ~(used[row] | used[column] | used[section])
+        self._reset(not repeats)
+
+    def _reset(self, consistent):
+        """ Queue every unit to be looked at and clear the counts of the last propagation. """
+        self.eliminations = 0
+        self.queue.clear()
+        self.queue.extend(range(len(self.queued)))
+        self.queued[:] = self._all_queued
+        self.changed = False
+        self.consistent = consistent
+
+    def propagate(self):
+        """ Apply the rules until nothing more changes.
+        With stats (or tracing, see TracingPropagator) the rules are applied through _apply_rule,
+        without them they are called directly, so plain propagation pays nothing for either.
+        Returns:
+            consistent (bool): False if a contradiction was found (a cell or unit ran out of candidates)
+        """
+        queue = self.queue
+        queued = self.queued
+        hooked = self.stats is not None or self.tracing
+        rules = self._named_rules if hooked else self._rules
+        apply_rule = self._apply_rule
+        while self.consistent and queue:
+            unit = queue.popleft()
+            queued[unit] = 0
+            for rule in rules:
+                if not (apply_rule(rule, unit) if hooked else rule(self, unit)):
+                    self.consistent = False
+                    break
+        return self.consistent
+
+    def _apply_rule(self, named_rule, unit):
+        """ Apply a rule to a unit for propagate, counting the candidates it removes into the stats.
+        Parameters:
+            named_rule (tuple): the rule and its name
+            unit (int): number of the unit to apply it to
+        Returns:
+            consistent (bool): False if the rule found a contradiction
+        """
+        rule, name = named_rule
+        if self.stats is None:
+            return rule(self, unit)
+        before = self.eliminations
+        consistent = rule(self, unit)
+        if self.eliminations != before:
+            eliminations = self.stats.eliminations
+            eliminations[name] = eliminations.get(name, 0) + self.eliminations - before
+        return consistent
+
+    def _enqueue(self, index):
+        """ Put the units containing the cell on the work queue. """
+        queued = self.queued
+        for unit in self.cell_units[index]:
+            if not queued[unit]:
+                queued[unit] = 1
+                self.queue.append(unit)
+
+    def assign(self, index, digit):
+        """ Set the cell to digit and remove digit from the candidates of its peers.
+        Returns:
+            consistent (bool): False if a peer ran out of candidates
+        """
+        self.values[index] = digit
+        self.candidates[index] = 0
+        self.changed = True
+        self._enqueue(index)
+        for peer in self.peers[index]:
+            if not self.eliminate(peer, digit):
+                return False
+        return True
+
+    def eliminate(self, index, digit):
+        """ Remove digit from the candidates of the cell.
+        Returns:
+            consistent (bool): False if the cell ran out of candidates
+        """
+        mask = self.candidates[index]
+        bit = 1 << (digit - 1)
+        if not mask & bit:
+            return True
+        mask &= ~bit
+        self.candidates[index] = mask
+        self.changed = True
+        self.eliminations += 1
+        self._enqueue(index)
+        return mask != 0
+
+    def restrict(self, index, allowed):
+        """ Remove every candidate of the cell that isn't in the allowed mask.
+        Returns:
+            consistent (bool): False if the cell ran out of candidates
+        """
+        for digit in self.mask_digits[self.candidates[index] & ~allowed]:
+            if not self.eliminate(index, digit):
+                return False
+        return True
+
+    def write_to(self, board):
+        """ Copy the values and candidates found by propagating onto board.
+        Parameters:
+            board (Board): board the propagator was created from
+        """
+        for index, (x, y) in enumerate(self.cells):
+            value = self.values[index]
+            if value:
+                if not board.contains_value(x, y):
+                    board.set_board_item(value, x, y)
+            else:
+                board.set_board_item(list(self.mask_digits[self.candidates[index]]), x, y)
+
+
+class TracingPropagator(Propagator):
+    """ A Propagator that records every digit it places and every candidate it removes as a solve_trace.Step,
+    in steps, with the name of the rule that did it. Kept apart from Propagator so untraced propagation
+    doesn't pay for it. """
+
+    tracing = True
+
+    def __init__(self, board, rules=None, stats=None, depth=0):
+        """ Copy the board into the propagator.
+        Parameters:
+            board (Board): sudoku to propagate, with its candidates filled in
+            rules (tuple): names of the rules to apply, in order, from RULES (defaults to DEFAULT_RULES)
+            stats (SolveStats): stats to count each rule's eliminations in, None for no stats
+            depth (int): search depth to put in the steps
+        """
+        Propagator.__init__(self, board, rules, stats)
+        self.depth = depth
+        self.rule = None  # Name of the rule being applied
+        self.steps = []
+
+    def _apply_rule(self, named_rule, unit):
+        """ Apply a rule to a unit for propagate, noting its name for the steps it records. """
+        self.rule = named_rule[1]
+        return Propagator._apply_rule(self, named_rule, unit)
+
+    def assign(self, index, digit):
+        self.steps.append(Step("place", index, digit, self.rule, self.depth))
+        return Propagator.assign(self, index, digit)
+
+    def eliminate(self, index, digit):
+        if self.candidates[index] >> (digit - 1) & 1:
+            self.steps.append(Step("eliminate", index, digit, self.rule, self.depth))
+        return Propagator.eliminate(self, index, digit)
+
+
+# Rules are called with the propagator and the number of a unit (an index into propagator.units),
+# and return False if they find a contradiction.
+
+def naked_singles(propagator, unit):
+    """ Set every cell in the unit that has only one candidate to it. """
+    values = propagator.values
+    candidates = propagator.candidates
+    mask_digits = propagator.mask_digits
+    for index in propagator.units[unit]:
+        if not values[index]:
+            digits = mask_digits[candidates[index]]
+            if len(digits) == 1:
+                if not propagator.assign(index, digits[0]):
+                    return False
+            elif not digits:
+                return False
+    return True
+
+
+def hidden_singles(propagator, unit):
+    """ If a digit can only go in one cell of the unit, set that cell to it. """
+    values = propagator.values
+    candidates = propagator.candidates
+    cells = propagator.units[unit]
+    placed = once = twice = 0
+    for index in cells:
+        if values[index]:
+            placed |= 1 << (values[index] - 1)
+        else:
+            mask = candidates[index]
+            twice |= once & mask
+            once |= mask
+    if (placed | once) != propagator.all_digits:
+        return False  # A digit has nowhere to go
+    singles = once & ~twice & ~placed
+    if singles:
+        for index in cells:
+            if candidates[index] & singles:
+                for digit in propagator.mask_digits[candidates[index] & singles]:
+                    if not values[index] and not propagator.assign(index, digit):
+                        return False
+    return True
+
+
+def _naked_subsets(propagator, unit, size):
+    """ If size cells in the unit only have size candidates between them,
+    no other cell in the unit can have any of them. """
+    candidates = propagator.candidates
+    cells = [index for index in propagator.units[unit] if not propagator.values[index]]
+    if len(cells) <= size:
+        return True
+    mask_digits = propagator.mask_digits
+    options = [index for index in cells if 2 <= len(mask_digits[candidates[index]]) <= size]
+    for subset in combinations(options, size):
+        union = 0
+        for index in subset:
+            union |= candidates[index]
+        if len(mask_digits[union]) == size:
+            for index in cells:
+                if index not in subset and candidates[index] & union:
+                    if not propagator.restrict(index, ~union):
+                        return False
+    return True
+
+
+def _hidden_subsets(propagator, unit, size):
+    """ If size digits can only go in the same size cells of the unit,
+    those cells can't hold any other digit. """
+    candidates = propagator.candidates
+    cells = [index for index in propagator.units[unit] if not propagator.values[index]]
+    if len(cells) <= size:
+        return True
+    # Where each digit can go, as a mask of positions in cells
+    positions = {}
+    for position, index in enumerate(cells):
+        for digit in propagator.mask_digits[candidates[index]]:
+            positions[digit] = positions.get(digit, 0) | 1 << position
+    options = [digit for digit, where in positions.items() if 2 <= bin(where).count("1") <= size]
+    for subset in combinations(options, size):
+        where = 0
+        allowed = 0
+        for digit in subset:
+            where |= positions[digit]
+            allowed |= 1 << (digit - 1)
+        if bin(where).count("1") == size:
+            for position, index in enumerate(cells):
+                if where >> position & 1 and candidates[index] & ~allowed:
+                    if not propagator.restrict(index, allowed):
+                        return False
+    return True
+
+
+def naked_pairs(propagator, unit):
+    return _naked_subsets(propagator, unit, 2)
+
+
+def naked_triples(propagator, unit):
+    return _naked_subsets(propagator, unit, 3)
+
+
+def naked_quads(propagator, unit):
+    return _naked_subsets(propagator, unit, 4)
+
+
+def hidden_pairs(propagator, unit):
+    return _hidden_subsets(propagator, unit, 2)
+
+
+def hidden_triples(propagator, unit):
+    return _hidden_subsets(propagator, unit, 3)
+
+
+def hidden_quads(propagator, unit):
+    return _hidden_subsets(propagator, unit, 4)
+
+
+def _box_line(propagator, unit):
+    """ If a digit's candidates in the unit all lie where it crosses another unit,
+    the digit can't go anywhere else in the other unit. """
+    candidates = propagator.candidates
+    for shared, rest, other_rest in propagator.intersections[unit]:
+        shared_mask = 0
+        for index in shared:
+            shared_mask |= candidates[index]
+        rest_mask = 0
+        for index in rest:
+            rest_mask |= candidates[index]
+        confined = shared_mask & ~rest_mask
+        if confined:
+            for index in other_rest:
+                if candidates[index] & confined:
+                    if not propagator.restrict(index, ~confined):
+                        return False
+    return True
+
+
+def pointing(propagator, unit):
+    """ If a digit's candidates in a section all lie on one row or column,
+    the digit can't go anywhere else on that row or column. """
+    if unit < propagator.line_count:
+        return True
+    return _box_line(propagator, unit)
+
+
+def claiming(propagator, unit):
+    """ If a digit's candidates in a row or column all lie in one section,
+    the digit can't go anywhere else in that section (box-line reduction). """
+    if unit >= propagator.line_count:
+        return True
+    return _box_line(propagator, unit)
+
+
+RULES = {
+    "naked_singles": naked_singles,
+    "hidden_singles": hidden_singles,
+    "naked_pairs": naked_pairs,
+    "hidden_pairs": hidden_pairs,
+    "pointing": pointing,
+    "claiming": claiming,
+    "naked_triples": naked_triples,
+    "hidden_triples": hidden_triples,
+    "naked_quads": naked_quads,
+    "hidden_quads": hidden_quads,
+}
+DEFAULT_RULES = ("naked_singles", "hidden_singles", "naked_pairs", "pointing", "claiming")
+
+
+def register_rule(name, rule):
+    """ Make a new rule available to propagators under name.
+    Parameters:
+        name (string): name to enable the rule by
+        rule (function): called with the propagator and a unit number, returns False on a contradiction
+    """
+    RULES[name] = rule
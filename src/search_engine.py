@@ -0,0 +1,440 @@
+from deadlines import check_deadline, get_deadline
+from solve_trace import Step
+
+ORDERINGS = ("row-major", "mrv", "mrv-degree")
+DEADLINE_NODES = 1024  # Nodes searched between looks at the deadline (see deadlines.py)
+
+
+class SearchEngine:
+    """ Depth first search over a compact copy of a board.
+    Values are kept in a flat bytearray and candidates as masks (see BitBoard), and the digits used in
+    each unit are kept as masks so a digit's legality is a couple of bit operations.
+
+    The order cells are branched on is chosen by ordering:
+    - "row-major": the next blank cell, reading left to right, top to bottom
+    - "mrv": the blank cell with the fewest remaining candidates
+    - "mrv-degree": as "mrv", ties go to the cell with the most blank peers
+    The remaining candidate count (and blank peer count) of every cell is updated as digits are placed
+    and removed, so choosing a cell never has to recalculate candidates.
+
+    With forward_checking, placing a digit also removes it from the candidates of the cell's peers and
+    the branch is abandoned as soon as a peer runs out of candidates. Every candidate removed is recorded
+    on an undo trail, so backtracking restores the masks without ever copying the board.
+
+    count_solutions runs the same search but keeps going after a solution, up to a limit.
+
+    The search keeps its own stack of frames (the cell branched on and how far through its digits it is)
+    rather than recursing, so it isn't limited by the recursion limit on big boards, and it can be stopped
+    after a budget of nodes (or by pause) and carried on later with run.
+    """
+
+    def __init__(self, board, ordering="row-major", forward_checking=False):
+        """ Copy the board into the engine.
+        Parameters:
+            board (Board): sudoku to search, with its candidates filled in
+            ordering (string): one of ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+        """
+        if ordering not in ORDERINGS:
+            raise ValueError("Unknown ordering {}, expected one of {}".format(ordering, ", ".join(ORDERINGS)))
+        layout = board.layout
+        self.ordering = ordering
+        self.forward_checking = forward_checking
+        self.cells = layout.cells
+        self.cell_units = layout.cell_units
+        self.peers = layout.peers
+        self.mask_digits = layout.mask_digits
+        self.all_digits = layout.all_digits
+        self.trail = []  # Pairs of (cell, old candidate mask), flattened
+        self.values = bytearray(layout.cell_count)
+        self.candidates = [0, ] * layout.cell_count
+        self.used = [0, ] * layout.unit_count
+        self.counts = bytearray(layout.cell_count)  # How many of each cell's candidates are still legal
+        self.degrees = bytearray(layout.cell_count)  # How many blank peers each cell has
+        # Blank cells that haven't been branched on are open_cells[:open_count]. They are kept in reverse
+        # row-major order, so the next row-major cell is always the last one.
+        self.open_cells = [0, ] * layout.cell_count
+        # The search stack (see _allocate_stack and run)
+        self.stack_cells = self.stack_positions = self.stack_digits = self.stack_next = self.stack_marks = None
+        self.trace = None  # List to add a solve_trace.Step to for every digit placed or taken back, None for none
+        self.load(board)
+
+    def load(self, board):
+        """ Copy a board into the engine, dropping whatever it was searching before.
+        Everything is reset in the buffers the engine already has, so an engine can be reused for board after
+        board of the same size without allocating anything new (see solver_session.SolverSession).
+        Parameters:
+            board (Board): sudoku to search, with its candidates filled in, the same size as the last
+        """
+        values = self.values
+        candidates = self.candidates
+        for index, (x, y) in enumerate(self.cells):
+            if board.contains_value(x, y):
+                values[index] = board.get_board_item(x, y)
+                candidates[index] = 0
+            else:
+                values[index] = 0
+                candidates[index] = board.get_candidate_mask(x, y)
+        self._reset(board.is_valid())
+
+    def load_values(self, values, candidates=None):
+        """ Load a board into the engine from its values, like load.
+        Parameters:
+            values (bytes): the value of every cell row by row, 0 for blanks
+            candidates (list): the candidate mask of every cell (0 for cells with values),
+                None for every digit a cell's row, column and section don't use (see Solver.fill_candidates)
+        """
+        self.values[:] = values
+        if candidates is not None:
+            self.candidates[:] = candidates
+        self._reset(None, candidates is None)
+
+    def _reset(self, valid=None, fill=False):
+        """ Work out the used digits, counts and open cells of newly loaded values, and clear the search.
+        Parameters:
+            valid (bool): whether the board is valid, None to check the values for repeated digits
+            fill (bool): whether to set the candidates of the blanks to every digit they can take
+        """
+        self.nodes = 0
+        self.backtracks = 0  # Branches that ran out of digits
+        self.max_depth = 0  # Most cells filled in by the search at once
+        self.limit = 1  # Stop once this many solutions are found
+        self.solutions = 0
+        self.solution = None  # Values of the first solution found
+        self.depth = 0  # Frames on the stack
+        self.descending = True  # Whether the next step branches on a new cell, rather than trying another digit
+        self.finished = False
+        self.pause_requested = False
+        del self.trail[:]
+
+        values = self.values
+        candidates = self.candidates
+        cell_units = self.cell_units
+        used = self.used
+        for unit in range(len(used)):
+            used[unit] = 0
+        repeats = False
+        for index, value in enumerate(values):
+            if value:
+                bit = 1 << (value - 1)
+                for unit in cell_units[index]:
+                    if used[unit] & bit:
+                        repeats = True
+                    used[unit] |= bit
+        self.valid = not repeats if valid is None else valid
+
+        open_cells = self.open_cells
+        open_count = 0
+        all_digits = self.all_digits
+        mask_digits = self.mask_digits
+        peers = self.peers
+        for index in range(len(values) - 1, -1, -1):
+            if values[index]:
+                continue
+            open_cells[open_count] = index
+            open_count += 1
+            if fill:
+                candidates[index] = all_digits & ~self._used_mask(index)
+            elif self.forward_checking:
+                # Candidates only ever hold legal digits when forward checking
+                candidates[index] &= ~self._used_mask(index)
+            self.counts[index] = len(mask_digits[candidates[index] & ~self._used_mask(index)])
+            self.degrees[index] = sum(1 for peer in peers[index] if not values[peer])
+        self.open_count = open_count
+
+    def _used_mask(self, index):
+        """ Get the mask of all digits used in the row, column and section of the cell. """
+        row, column, section = self.cell_units[index]
+        used = self.used
+        return used[row] | used[column] | used[section]
+
+    def search(self):
+        """ Search for a solution.
+        Returns:
+            solved (bool): whether a solution was found, if so it is in values
+        """
+        return self.count_solutions(1) == 1
+
+    def count_solutions(self, limit=2):
+        """ Count the solutions, stopping as soon as limit of them are found.
+        A limit of 2 tells whether the solution is unique without searching for every solution.
+        Parameters:
+            limit (int): most solutions to look for
+        Returns:
+            count (int): number of solutions found, at most limit
+        """
+        self.limit = limit
+        if get_deadline() is None:
+            self.run()
+            return self.solutions
+        while not self.run(DEADLINE_NODES) and not self.pause_requested:
+            check_deadline()
+        return self.solutions
+
+    def pause(self):
+        """ Ask a running search to stop before its next node. It can be carried on with run. """
+        self.pause_requested = True
+
+    def run(self, node_budget=None):
+        """ Search until limit solutions are found, the search space runs out, node_budget more nodes have
+        been searched or pause is called. A search stopped early is left exactly where it was, so calling run
+        again carries on from there (so a long search can be time sliced, or dropped to cancel it).
+        Parameters:
+            node_budget (int): most nodes to search before stopping, None for no limit
+        Returns:
+            finished (bool): whether the search is over, False if it was stopped early
+        """
+        if not self.valid:
+            self.finished = True
+        if self.finished:
+            return True
+        self.pause_requested = False
+        stop_at = -1 if node_budget is None else self.nodes + node_budget
+        self._allocate_stack()
+        stack_cells = self.stack_cells
+        stack_positions = self.stack_positions
+        stack_digits = self.stack_digits
+        stack_next = self.stack_next
+        stack_marks = self.stack_marks
+        open_cells = self.open_cells
+        values = self.values
+        candidates = self.candidates
+        mask_digits = self.mask_digits
+        trail = self.trail
+        forward_checking = self.forward_checking
+        trace = self.trace
+        choose, used_mask = self._choose, self._used_mask
+        assign, unassign = self._assign, self._unassign
+        assign_forward, unassign_forward = self._assign_forward, self._unassign_forward
+        # Kept in locals while searching, and saved back whenever the search stops
+        depth, descending, open_count, nodes = self.depth, self.descending, self.open_count, self.nodes
+        finished = True
+
+        while True:
+            if descending:
+                if open_count == 0:
+                    self.solutions += 1
+                    if self.solution is None:
+                        self.solution = bytes(values)
+                    if self.solutions >= self.limit:
+                        break
+                    descending = False
+                    continue
+                if nodes == stop_at or self.pause_requested:
+                    finished = False
+                    break
+
+                # Branch on the next cell, pushing a frame for it
+                nodes += 1
+                if depth > self.max_depth:
+                    self.max_depth = depth
+                self.open_count = open_count
+                position = choose()
+                index = open_cells[position]
+                open_count -= 1
+                open_cells[position], open_cells[open_count] = open_cells[open_count], index
+                stack_cells[depth] = index
+                stack_positions[depth] = position
+                if forward_checking:
+                    stack_digits[depth] = mask_digits[candidates[index]]
+                else:
+                    stack_digits[depth] = mask_digits[candidates[index] & ~used_mask(index)]
+                stack_next[depth] = 0
+                stack_marks[depth] = len(trail)
+                depth += 1
+
+            # Try the next digit of the frame on top of the stack
+            if depth == 0:
+                break
+            top = depth - 1
+            index = stack_cells[top]
+            digits = stack_digits[top]
+            next_digit = stack_next[top]
+            mark = stack_marks[top]
+            digit = values[index]
+            if digit:
+                if forward_checking:
+                    unassign_forward(index, digit, mark)
+                else:
+                    unassign(index, digit)
+                if trace is not None:
+                    trace.append(Step("undo", index, digit, "backtrack", top))
+            descending = False
+            if not forward_checking:
+                if next_digit < len(digits):
+                    assign(index, digits[next_digit])
+                    stack_next[top] = next_digit + 1
+                    descending = True
+            else:
+                while next_digit < len(digits):
+                    digit = digits[next_digit]
+                    next_digit += 1
+                    if assign_forward(index, digit):
+                        descending = True
+                        break
+                    unassign_forward(index, digit, mark)
+                stack_next[top] = next_digit
+            if descending:
+                if trace is not None:
+                    trace.append(Step("place", index, values[index], "branch", top))
+            else:
+                # Dead end, pop the frame and put the cell back where it was
+                self.backtracks += 1
+                position = stack_positions[top]
+                open_cells[open_count], open_cells[position] = open_cells[position], index
+                open_count += 1
+                stack_digits[top] = None
+                depth = top
+
+        self.depth, self.descending, self.open_count, self.nodes = depth, descending, open_count, nodes
+        self.finished = finished
+        return finished
+
+    def _allocate_stack(self):
+        """ Make the search stack, one frame per cell so it never has to grow, whatever board is loaded.
+        Frame i is the cell branched on at depth i, its position in open_cells when it was chosen, the digits
+        to try there, how many of them have been tried and the length of the trail before the first was placed.
+        """
+        if self.stack_cells is None:
+            frames = len(self.cells)
+            self.stack_cells = [0, ] * frames
+            self.stack_positions = [0, ] * frames
+            self.stack_digits = [None, ] * frames
+            self.stack_next = [0, ] * frames
+            self.stack_marks = [0, ] * frames
+
+    def _choose(self):
+        """ Choose the open cell to branch on next.
+        Returns:
+            position (int): position of the cell in open_cells
+        """
+        last = self.open_count - 1
+        if self.ordering == "row-major":
+            return last
+
+        open_cells = self.open_cells
+        counts = self.counts
+        best_position = last
+        best_count = counts[open_cells[last]]
+        if self.ordering == "mrv":
+            for position in range(last):
+                count = counts[open_cells[position]]
+                if count < best_count:
+                    best_position, best_count = position, count
+                    if count == 0:
+                        break
+        else:
+            degrees = self.degrees
+            best_degree = degrees[open_cells[last]]
+            for position in range(last):
+                index = open_cells[position]
+                count = counts[index]
+                if count < best_count or (count == best_count and degrees[index] > best_degree):
+                    best_position, best_count, best_degree = position, count, degrees[index]
+                    if count == 0:
+                        break
+        return best_position
+
+    def _assign(self, index, digit):
+        """ Place digit at the cell, updating the counts of its peers. """
+        values = self.values
+        candidates = self.candidates
+        counts = self.counts
+        degrees = self.degrees
+        bit = 1 << (digit - 1)
+        for peer in self.peers[index]:
+            if not values[peer]:
+                degrees[peer] -= 1
+                if candidates[peer] & bit and not self._used_mask(peer) & bit:
+                    counts[peer] -= 1
+        row, column, section = self.cell_units[index]
+        used = self.used
+        used[row] |= bit
+        used[column] |= bit
+        used[section] |= bit
+        values[index] = digit
+
+    def _unassign(self, index, digit):
+        """ Remove digit from the cell, the reverse of _assign. """
+        values = self.values
+        candidates = self.candidates
+        counts = self.counts
+        degrees = self.degrees
+        bit = 1 << (digit - 1)
+        values[index] = 0
+        row, column, section = self.cell_units[index]
+        used = self.used
+        used[row] &= ~bit
+        used[column] &= ~bit
+        used[section] &= ~bit
+        for peer in self.peers[index]:
+            if not values[peer]:
+                degrees[peer] += 1
+                if candidates[peer] & bit and not self._used_mask(peer) & bit:
+                    counts[peer] += 1
+
+    def _assign_forward(self, index, digit):
+        """ Place digit at the cell and remove it from the candidates of its peers, recording them on the trail.
+        Returns:
+            consistent (bool): False if a peer was left without any candidates
+        """
+        values = self.values
+        candidates = self.candidates
+        counts = self.counts
+        degrees = self.degrees
+        trail = self.trail
+        bit = 1 << (digit - 1)
+        consistent = True
+        for peer in self.peers[index]:
+            if not values[peer]:
+                degrees[peer] -= 1
+                mask = candidates[peer]
+                if mask & bit:
+                    trail.append(peer)
+                    trail.append(mask)
+                    candidates[peer] = mask & ~bit
+                    counts[peer] -= 1
+                    if mask == bit:
+                        consistent = False
+        row, column, section = self.cell_units[index]
+        used = self.used
+        used[row] |= bit
+        used[column] |= bit
+        used[section] |= bit
+        values[index] = digit
+        return consistent
+
+    def _unassign_forward(self, index, digit, mark):
+        """ Remove digit from the cell and undo the trail back to mark, the reverse of _assign_forward. """
+        values = self.values
+        candidates = self.candidates
+        counts = self.counts
+        degrees = self.degrees
+        trail = self.trail
+        bit = 1 << (digit - 1)
+        values[index] = 0
+        row, column, section = self.cell_units[index]
+        used = self.used
+        used[row] &= ~bit
+        used[column] &= ~bit
+        used[section] &= ~bit
+        while len(trail) > mark:
+            mask = trail.pop()
+            peer = trail.pop()
+            candidates[peer] = mask
+            counts[peer] += 1
+        for peer in self.peers[index]:
+            if not values[peer]:
+                degrees[peer] += 1
+
+    def write_to(self, board):
+        """ Copy the first solution found by the search onto board.
+        Parameters:
+            board (Board): board the engine was created from
+        """
+        if self.solution is None:
+            return
+        for index, (x, y) in enumerate(self.cells):
+            value = self.solution[index]
+            if value and not board.contains_value(x, y):
+                board.set_board_item(value, x, y)
@@ -0,0 +1,339 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from solver import Solver
+from engines import ENGINES, EngineTimeout, run_engine
+
+
+class DeadlineExceeded(Exception):
+    """ Raised when a puzzle isn't solved before its deadline. """
+    pass
+
+
+class ServiceBusy(Exception):
+    """ Raised when the service's queue is full and the caller asked not to wait for room. """
+    pass
+
+
+def _solve_batch(engine, requests):
+    """ Solve a batch of puzzles in a worker process.
+    Each puzzle's search is stopped (see engines.run_engine) once its deadline passes, and puzzles already past
+    their deadline aren't started.
+    Parameters:
+        engine (string): key of the engine in ENGINES
+        requests (list): (puzzle, deadline) pairs, the deadlines in time.time() seconds or None for no deadline
+    Returns:
+        results (list): (outcome, solution) pairs in the same order, outcome is "solved", "unsolved" (the
+            solution is the board as far as the engine got), "deadline" or "error" (the solution is the message)
+    """
+    results = []
+    for puzzle, deadline in requests:
+        remaining = None if deadline is None else deadline - time.time()
+        if remaining is not None and remaining <= 0:
+            results.append(("deadline", None))
+            continue
+        try:
+            board = run_engine(engine, Solver.get_board_from_string(puzzle), remaining)
+        except EngineTimeout:
+            results.append(("deadline", None))
+        except ValueError as error:
+            results.append(("error", str(error)))
+        else:
+            results.append(("solved" if board.is_solved() else "unsolved", board.to_string()))
+    return results
+
+
+class SolveService:
+    """ Solves puzzle strings for asyncio code, on a pool of worker processes.
+    Requests go into a bounded queue. A batcher takes them off it, gathering every request that arrives within
+    batch_window seconds of the first (up to batch_size of them) into one batch for a worker, so a burst of
+    small puzzles costs one round trip to a worker rather than one each. Only a couple of batches per worker are
+    sent at once, so when the workers fall behind the queue fills up and callers wait for room (or are turned
+    away with ServiceBusy), rather than work piling up without limit.
+
+    Every request can have a deadline. A search still running at its deadline is stopped in the worker, and the
+    caller gets DeadlineExceeded.
+
+    Use as "async with SolveService() as service: solution = await service.solve(puzzle, timeout=0.5)".
+    """
+
+    def __init__(self, engine="constraint_backtrack_mrv", workers=None, max_queue=1024, batch_size=64,
+                 batch_window=0.002, timeout=None):
+        """ Set up the service, start it with start (or async with).
+        Parameters:
+            engine (string): key of the engine in engines.ENGINES to solve with
+            workers (int): number of worker processes, defaults to the number of cpus
+            max_queue (int): most requests waiting to be batched
+            batch_size (int): most puzzles in a batch
+            batch_window (float): seconds to wait for more requests after the first of a batch
+            timeout (float): seconds a request has by default, None for no deadline
+        """
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine {}, expected one of {}".format(engine, ", ".join(sorted(ENGINES))))
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.requests = 0
+        self.batches = 0
+        self.deadlines_missed = 0
+        self.rejected = 0
+        self._queue = None
+        self._executor = None
+        self._batcher = None
+        self._in_flight = None  # Limits the batches sent to the workers at once
+        self._pending = set()
+
+    async def start(self):
+        """ Start the worker processes and the batcher. """
+        self._queue = asyncio.Queue(self.max_queue)
+        self._in_flight = asyncio.Semaphore(self.workers * 2)
+        # Workers forked from this process would inherit its open connections (keeping them open after they're
+        # closed here), so where it can they're started from a fork server instead
+        context = None
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+        self._executor = ProcessPoolExecutor(self.workers, context)
+        self._batcher = asyncio.get_running_loop().create_task(self._batch_requests())
+
+    async def close(self):
+        """ Stop taking requests, let the batches already sent finish and stop the workers.
+        Requests still queued fail with DeadlineExceeded. """
+        if self._batcher is None:
+            return
+        # wait_for can drop a cancel that comes as the queue hands the batcher a request, so it's cancelled
+        # until it stops
+        while not self._batcher.done():
+            self._batcher.cancel()
+            await asyncio.wait({self._batcher}, timeout=0.1)
+        self._batcher = None
+        while not self._queue.empty():
+            future = self._queue.get_nowait()[2]
+            if not future.done():
+                future.set_exception(DeadlineExceeded("The service was closed"))
+        if self._pending:
+            await asyncio.wait(self._pending)
+        # Stopping the workers waits for them to exit, so it's done off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self._executor = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exception):
+        await self.close()
+        return False
+
+    async def solve(self, puzzle, timeout=None, wait=True):
+        """ Solve a puzzle.
+        Parameters:
+            puzzle (string): the puzzle, in any format Board.load_string takes
+            timeout (float): seconds to give it (waiting for room in the queue included),
+                None for the service's default
+            wait (bool): whether to wait for room when the queue is full, rather than raising ServiceBusy
+        Returns:
+            solution (string): the solved puzzle, as far as the engine got if it can't be solved
+        Raises:
+            DeadlineExceeded: if it wasn't solved in time
+            ServiceBusy: if the queue is full and wait is False
+            ValueError: if the puzzle can't be read
+        """
+        if self._batcher is None:
+            raise RuntimeError("The service hasn't been started")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.time() + timeout
+        future = asyncio.get_running_loop().create_future()
+        request = (puzzle, deadline, future)
+        self.requests += 1
+        try:
+            if not wait:
+                try:
+                    self._queue.put_nowait(request)
+                except asyncio.QueueFull:
+                    self.rejected += 1
+                    raise ServiceBusy("{} requests are already waiting".format(self.max_queue))
+            else:
+                await asyncio.wait_for(self._queue.put(request), timeout)
+            # The worker stops the search at the deadline, this is for a batch stuck behind a slow one.
+            # Timing out cancels the future, so the request is dropped if it hasn't gone to a worker yet.
+            outcome, solution = await asyncio.wait_for(future, None if timeout is None else deadline - time.time())
+        except asyncio.TimeoutError:
+            outcome = "deadline"
+        if outcome == "deadline":
+            self.deadlines_missed += 1
+            raise DeadlineExceeded("Not solved within {}s".format(timeout))
+        if outcome == "error":
+            raise ValueError(solution)
+        return solution
+
+    async def _batch_requests(self):
+        """ Take requests off the queue in batches and send them to the workers, forever. """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                flush_at = loop.time() + self.batch_window
+                while len(batch) < self.batch_size:
+                    remaining = flush_at - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                # Don't send the worker requests that have already timed out
+                batch = [request for request in batch if not request[2].done()]
+                if not batch:
+                    continue
+                await self._in_flight.acquire()
+            except asyncio.CancelledError:
+                # Closed while gathering or waiting to send a batch, its requests are failed like those still queued
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(DeadlineExceeded("The service was closed"))
+                raise
+            self.batches += 1
+            task = loop.create_task(self._run_batch(batch))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _run_batch(self, batch):
+        """ Solve a batch in a worker and hand each request its result. """
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _solve_batch, self.engine, [(puzzle, deadline) for puzzle, deadline, _ in batch])
+        except Exception as error:
+            results = [("error", "The worker failed: {}".format(error))] * len(batch)
+        finally:
+            self._in_flight.release()
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def split_timeout(line):
+    """ Split a request line into its puzzle and timeout.
+    The last word is only a timeout if what comes before it is a whole puzzle: one word (the single character
+    format) or n ** 4 numbers (the multi character format), so the last cell of a multi character puzzle is
+    never mistaken for a timeout.
+    Parameters:
+        line (string): the puzzle, optionally followed by a space and a timeout in seconds
+    Returns:
+        puzzle (string): the puzzle
+        timeout (float): the timeout, None if there isn't one
+    """
+    parts = line.split()
+    if len(parts) > 1:
+        cells = len(" ".join(parts[:-1]).replace(",", " ").split())
+        if cells == 1 or (round(cells ** 0.25) ** 4 == cells and cells >= 16):
+            try:
+                return " ".join(parts[:-1]), float(parts[-1])
+            except ValueError:
+                pass
+    return " ".join(parts), None
+
+
+async def handle_connection(service, reader, writer):
+    """ Answer the puzzles sent on a connection, in the order they were sent.
+    Each line is a puzzle, optionally followed by a space and a timeout in seconds. Each answer is a line holding
+    the solution, or "ERROR" and the reason ("ERROR deadline", "ERROR busy" or "ERROR" and the puzzle's problem).
+    Requests are solved concurrently, so a client can send many lines without waiting for the answers.
+    Parameters:
+        service (SolveService): service to solve the puzzles with
+        reader (StreamReader): connection to read puzzles from
+        writer (StreamWriter): connection to write answers to
+    """
+    answers = asyncio.Queue()
+
+    async def answer(puzzle, timeout):
+        try:
+            return await service.solve(puzzle, timeout, wait=False)
+        except DeadlineExceeded:
+            return "ERROR deadline"
+        except ServiceBusy:
+            return "ERROR busy"
+        except ValueError as error:
+            return "ERROR " + str(error)
+
+    async def write_answers():
+        while True:
+            task = await answers.get()
+            if task is None:
+                break
+            # Errors can quote the request, and a request can hold anything
+            writer.write((await task + "\n").encode("ascii", "replace"))
+            await writer.drain()
+
+    writing = asyncio.get_running_loop().create_task(write_answers())
+    try:
+        async for line in reader:
+            puzzle, timeout = split_timeout(line.decode("ascii", "replace"))
+            if not puzzle:
+                continue
+            await answers.put(asyncio.get_running_loop().create_task(answer(puzzle, timeout)))
+        await answers.put(None)
+        await writing
+    finally:
+        writing.cancel()
+        writer.close()
+        await writer.wait_closed()
+
+
+async def serve(service, host="127.0.0.1", port=8765, path=None):
+    """ Run a socket front end to the service until cancelled.
+    Parameters:
+        service (SolveService): started service to solve the puzzles with
+        host (string): address to listen on
+        port (int): TCP port to listen on
+        path (string): path of a Unix socket to listen on instead of TCP, None for TCP
+    """
+    def on_connection(reader, writer):
+        return handle_connection(service, reader, writer)
+
+    if path is not None:
+        server = await asyncio.start_unix_server(on_connection, path)
+    else:
+        server = await asyncio.start_server(on_connection, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    """ Run the solving service behind a TCP or Unix socket. """
+    parser = argparse.ArgumentParser(description="Solve sudokus sent over a socket, one puzzle per line "
+                                                 "(optionally followed by a timeout in seconds).")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("-p", "--port", type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket at PATH instead of TCP")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default="constraint_backtrack_mrv",
+                        help="engine to solve with")
+    parser.add_argument("-w", "--workers", type=int, default=0, help="number of worker processes, 0 for one per cpu")
+    parser.add_argument("-t", "--timeout", type=float, help="seconds each puzzle has by default (default no limit)")
+    parser.add_argument("-q", "--queue", type=int, default=1024, help="most requests waiting before new ones are "
+                                                                      "turned away")
+    parser.add_argument("-b", "--batch-size", type=int, default=64, help="most puzzles sent to a worker at once")
+    parser.add_argument("--batch-window", type=float, default=0.002,
+                        help="seconds to wait for more requests to batch with the first")
+    args = parser.parse_args(argv)
+
+    async def run():
+        async with SolveService(args.engine, args.workers or None, args.queue, args.batch_size, args.batch_window,
+                                args.timeout) as service:
+            print("Listening on {}".format(args.unix or "{}:{}".format(args.host, args.port)), file=sys.stderr)
+            await serve(service, args.host, args.port, args.unix)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
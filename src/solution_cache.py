@@ -0,0 +1,267 @@
+import itertools
+import os
+from collections import OrderedDict
+from solver import Solver
+from constraint_backtrack_solver import ConstraintBacktrackSolver
+
+
+# Most orders of the rows (or columns) tried per orientation, see _line_orders
+MAX_LINE_ORDERS = 32
+
+
+def canonical_form(puzzle):
+    """ Put the puzzle in a normal form under the sudoku symmetries.
+    The grid is tried both ways up (transposed or not), which with reordering its rows and columns covers all
+    8 rotations and reflections. Its bands and stacks and the rows and columns within them are sorted by keys
+    that don't change under any of the symmetries (see _line_keys), and the digits are relabelled in order of
+    first appearance. Lines or bands whose keys tie are tried in every order, and the smallest result of all
+    of them is the canonical form, so it doesn't depend on the order the puzzle came in.
+
+    Puzzles with the same canonical form are always equivalent. Equivalent puzzles get the same canonical form
+    unless they're so symmetric that more than MAX_LINE_ORDERS orders of their lines tie, then only the first
+    of those (in the puzzle's own order) are tried. Only 9x9 puzzles are handled.
+    Parameters:
+        puzzle (string): 81 characters, row by row, "." or "0" for blanks
+    Returns:
+        canonical (string): the canonical form of the puzzle
+        transform (tuple): (cells, digits), canonical[i] is digits[puzzle[cells[i]]]
+    """
+    if len(puzzle) != 81:
+        raise ValueError("A puzzle string must be 81 characters long, not {}".format(len(puzzle)))
+    puzzle = puzzle.replace("0", ".")
+    best = None
+    for transposed in (False, True):
+        if transposed:
+            grid = "".join(puzzle[x * 9 + y] for y in range(9) for x in range(9))
+        else:
+            grid = puzzle
+        row_keys, column_keys = _line_keys(grid)
+        column_orders = _line_orders(column_keys)
+        for rows in _line_orders(row_keys):
+            for columns in column_orders:
+                if transposed:
+                    cells = [x * 9 + y for y in rows for x in columns]
+                else:
+                    cells = [y * 9 + x for y in rows for x in columns]
+                digits = {".": "."}
+                for cell in cells:
+                    char = puzzle[cell]
+                    if char not in digits:
+                        digits[char] = str(len(digits))
+                canonical = "".join(digits[puzzle[cell]] for cell in cells)
+                if best is None or canonical < best[0]:
+                    for char in "123456789":
+                        if char not in digits:
+                            digits[char] = str(len(digits))
+                    best = (canonical, (cells, digits))
+    best[1][1]["0"] = "."
+    return best
+
+
+def signature(puzzle):
+    """ Get a summary of the puzzle that the symmetries don't change, far quicker to work out than its
+    canonical form. Puzzles with different signatures are never equivalent, so a puzzle whose signature
+    isn't in the cache can't be in it.
+    Parameters:
+        puzzle (string): 81 characters, row by row, "." or "0" for blanks
+    Returns:
+        signature (tuple): the sorted clue counts of the rows and of the columns (whichever of the two is
+            smaller first, as the grid can be transposed), then the sorted number of uses of each digit
+    """
+    puzzle = puzzle.replace("0", ".")
+    rows = tuple(sorted(puzzle.count(".", y * 9, y * 9 + 9) for y in range(9)))
+    columns = tuple(sorted(puzzle[x::9].count(".") for x in range(9)))
+    return min(rows, columns), max(rows, columns), tuple(sorted(puzzle.count(char) for char in "123456789"))
+
+
+def _line_keys(grid):
+    """ Get a key for every row and column of the grid that the symmetries don't change.
+    A row's key is its number of clues, then for each clue the number of clues in its column and how many
+    times its digit is used in the whole grid, sorted (and the same for columns the other way round).
+    Parameters:
+        grid (string): 81 characters, row by row, "." for blanks
+    Returns:
+        row_keys (list): key of each row
+        column_keys (list): key of each column
+    """
+    uses = {char: grid.count(char) for char in set(grid)}
+    row_counts = [9 - grid[y * 9:y * 9 + 9].count(".") for y in range(9)]
+    column_counts = [9 - grid[x::9].count(".") for x in range(9)]
+    row_keys = [(row_counts[y], sorted((column_counts[x], uses[grid[y * 9 + x]])
+                                       for x in range(9) if grid[y * 9 + x] != "."))
+                for y in range(9)]
+    column_keys = [(column_counts[x], sorted((row_counts[y], uses[grid[y * 9 + x]])
+                                             for y in range(9) if grid[y * 9 + x] != "."))
+                   for x in range(9)]
+    return row_keys, column_keys
+
+
+def _line_orders(keys):
+    """ Get the orders to try the 9 lines (rows or columns) in, keeping them in their bands (or stacks).
+    Bands are sorted by the keys of their lines and lines within a band by their keys. Every order that
+    only differs in the order of bands or lines with equal keys is returned, up to MAX_LINE_ORDERS of them.
+    Parameters:
+        keys (list): key of each line
+    Returns:
+        orders (list): lists of the line numbers in the orders to try
+    """
+    band_keys = [sorted(keys[band * 3:band * 3 + 3]) for band in range(3)]
+    line_orders = [_tied_orders(range(band * 3, band * 3 + 3), keys) for band in range(3)]
+    orders = []
+    for bands in _tied_orders(range(3), band_keys):
+        for lines in itertools.product(*(line_orders[band] for band in bands)):
+            orders.append([line for band_lines in lines for line in band_lines])
+            if len(orders) >= MAX_LINE_ORDERS:
+                return orders
+    return orders
+
+
+def _tied_orders(items, keys):
+    """ Get every order of the items sorted by their keys, differing only in the order of items with equal keys.
+    Parameters:
+        items (iterable): the items (indices into keys)
+        keys (list): key of each item
+    Returns:
+        orders (list): the orders, as lists of the items
+    """
+    items = sorted(items, key=lambda item: keys[item])
+    groups = [list(group) for _, group in itertools.groupby(items, key=lambda item: keys[item])]
+    return [[item for group in choice for item in group]
+            for choice in itertools.product(*(itertools.permutations(group) for group in groups))]
+
+
+class SolutionCache:
+    """ Least recently used cache of solutions, in front of a solver.
+    Puzzles are stored by their canonical form, so a puzzle that is a rotation, reflection, relabelling or
+    band/stack shuffle of one already solved can be answered by mapping the cached solution back.
+    Working out a canonical form takes a while, so a lookup first tries the puzzle exactly as it was cached
+    (or last looked up), then rules out most misses by the puzzle's signature (see signature), and only then
+    works out the canonical form.
+
+    With a filename, every new solution is also appended to that file and the file is read back in
+    when the cache is created, so the cache survives restarts.
+    """
+
+    def __init__(self, size=100000, filename=None):
+        """ Create the cache.
+        Parameters:
+            size (int): most solutions to keep in memory
+            filename (string): file to keep the cache in, None to keep it in memory only
+        """
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._exact = OrderedDict()  # Solutions of the last puzzles cached or looked up, as they were given
+        self._signatures = {}  # How many entries have each signature
+        self._filename = filename
+        self._file = None
+        if filename is not None:
+            if os.path.exists(filename):
+                with open(filename, "r") as file:
+                    for line in file:
+                        parts = line.split()
+                        if len(parts) == 2:
+                            self._store(parts[0], parts[1])
+            self._file = open(filename, "a")
+
+    def _store(self, canonical, solution):
+        """ Put a canonical puzzle and solution in the map, dropping the least recently used if it's full. """
+        if canonical not in self._entries:
+            key = signature(canonical)
+            self._signatures[key] = self._signatures.get(key, 0) + 1
+        self._entries[canonical] = solution
+        self._entries.move_to_end(canonical)
+        if len(self._entries) > self.size:
+            key = signature(self._entries.popitem(last=False)[0])
+            self._signatures[key] -= 1
+            if not self._signatures[key]:
+                del self._signatures[key]
+
+    def _remember(self, puzzle, solution):
+        """ Keep the solution of the puzzle as it was given, so looking it up again is a single dict lookup. """
+        self._exact[puzzle] = solution
+        self._exact.move_to_end(puzzle)
+        if len(self._exact) > self.size:
+            self._exact.popitem(last=False)
+
+    def get(self, puzzle):
+        """ Look the puzzle up.
+        Parameters:
+            puzzle (string): 81 characters, row by row, "." or "0" for blanks
+        Returns:
+            solution (string): the cached solution for this puzzle, None if there isn't one
+        """
+        puzzle = puzzle.replace("0", ".")
+        solution = self._exact.get(puzzle)
+        if solution is not None:
+            self.hits += 1
+            self._exact.move_to_end(puzzle)
+            return solution
+        if signature(puzzle) not in self._signatures:
+            self.misses += 1
+            return None
+        canonical, (cells, digits) = canonical_form(puzzle)
+        solution = self._entries.get(canonical)
+        if solution is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(canonical)
+        labels = {label: char for char, label in digits.items()}
+        original = [".", ] * 81
+        for index, cell in enumerate(cells):
+            original[cell] = labels[solution[index]]
+        solution = "".join(original)
+        self._remember(puzzle, solution)
+        return solution
+
+    def put(self, puzzle, solution):
+        """ Cache the solution of the puzzle.
+        Parameters:
+            puzzle (string): 81 characters, row by row, "." or "0" for blanks
+            solution (string): its solution
+        """
+        canonical, (cells, digits) = canonical_form(puzzle)
+        canonical_solution = "".join(digits[solution[cell]] for cell in cells)
+        self._store(canonical, canonical_solution)
+        self._remember(puzzle.replace("0", "."), solution)
+        if self._file is not None:
+            self._file.write(canonical + " " + canonical_solution + "\n")
+
+    def solve(self, puzzle, solver=ConstraintBacktrackSolver):
+        """ Solve the puzzle, from the cache if possible. Only complete 9x9 solutions are cached,
+        puzzles of other sizes are always solved.
+        Parameters:
+            puzzle (string): the cells row by row, "." or "0" for blanks (see Board.load_string)
+            solver (type): solver class to use on a miss
+        Returns:
+            solution (string): the solved puzzle, as a string in the same layout
+        """
+        if len(puzzle) != 81:
+            return solver.solve_board(Solver.get_board_from_string(puzzle)).to_string()
+        solution = self.get(puzzle)
+        if solution is None:
+            solution = solver.solve_board(Solver.get_board_from_string(puzzle)).to_string()
+            if "." not in solution:
+                self.put(puzzle, solution)
+        return solution
+
+    def compact(self):
+        """ Rewrite the cache file with just the entries currently in memory. """
+        if self._file is None:
+            return
+        self._file.close()
+        with open(self._filename, "w") as file:
+            for canonical, solution in self._entries.items():
+                file.write(canonical + " " + solution + "\n")
+        self._file = open(self._filename, "a")
+
+    def close(self):
+        """ Flush and close the cache file. """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,149 @@
+import sys
+import time
+from collections import namedtuple
+from units import SYMBOLS, get_layout
+
+# A step of a solve:
+# - kind: "place" (value put in cell), "eliminate" (value removed from the candidates of cell),
+#   "undo" (value taken back out of cell by backtracking), or last of all "solved" or "unsolved"
+# - cell: index of the cell (x + y * size), None for the last step
+# - value: the digit
+# - rule: the propagation rule that made the step (see propagator.RULES), "branch" for a guess made by search
+#   and "backtrack" for an undo
+# - depth: how many guesses the search had made when the step was taken, 0 for propagation before searching
+Step = namedtuple("Step", "kind cell value rule depth")
+KINDS = ("place", "eliminate", "undo", "solved", "unsolved")
+
+
+def finished(board, depth=0):
+    """ Get the last step of a solve of board, "solved" or "unsolved". """
+    return Step("solved" if board.is_solved() else "unsolved", None, None, None, depth)
+
+
+def sampled(steps, every=1, interval=None, kinds=None):
+    """ Thin out a stream of steps, for showing progress or sending it somewhere slow.
+    The last step ("solved" or "unsolved") is always kept. To draw the board from sampled steps, feed a
+    GridRenderer every step and only render it at the samples (as show does), or the drawing will be missing
+    the steps that were dropped.
+    Parameters:
+        steps (iterable): the steps
+        every (int): keep one step in this many
+        interval (float): keep at most one step per this many seconds, None for no limit
+        kinds (tuple): kinds of step to keep (see KINDS), None for all of them
+    Returns:
+        steps (generator): the steps kept
+    """
+    count = 0
+    next_time = 0.0
+    for step in steps:
+        if step.cell is None:
+            yield step
+            continue
+        if kinds is not None and step.kind not in kinds:
+            continue
+        count += 1
+        if count < every:
+            continue
+        if interval is not None:
+            now = time.perf_counter()
+            if now < next_time:
+                continue
+            next_time = now + interval
+        count = 0
+        yield step
+
+
+class GridRenderer:
+    """ Draws the values of a board as text, laid out like Board.__str__ with "." for blanks.
+    The picture is kept in a bytearray made once, with the position of every cell in it worked out up front,
+    so applying a step changes a byte or two and rendering is one decode, however many steps there are.
+    """
+
+    def __init__(self, n=3):
+        """ Make the picture of an empty board.
+        Parameters:
+            n (int): width of a section in cells
+        """
+        layout = get_layout(n)
+        size = layout.size
+        self.width = 1 if size <= len(SYMBOLS) else len(str(size))
+        if self.width == 1:
+            self.symbols = [b"."] + [char.encode("ascii") for char in SYMBOLS[:size]]
+        else:
+            self.symbols = [b".".rjust(self.width)] + [str(d).rjust(self.width).encode("ascii")
+                                                       for d in range(1, size + 1)]
+        self.offsets = [0, ] * layout.cell_count  # Where each cell is drawn in the buffer
+        self.line_width = size * self.width + size - 1 + (n - 1) * 2
+        buffer = bytearray()
+        for y in range(size):
+            if y and y % n == 0:
+                buffer += b"-" * self.line_width + b"\n"
+            for x in range(size):
+                self.offsets[x + y * size] = len(buffer)
+                buffer += self.symbols[0]
+                if x != size - 1:
+                    buffer += b" | " if x % n == n - 1 else b" "
+            buffer += b"\n"
+        self.buffer = buffer[:-1]
+
+    def load(self, board):
+        """ Draw every value of board.
+        Parameters:
+            board (Board): board to draw, of the size the renderer was made for
+        """
+        for index, (x, y) in enumerate(board.layout.cells):
+            item = board.get_board_item(x, y)
+            self.set(index, item if type(item) == int else 0)
+
+    def set(self, cell, value):
+        """ Draw value in a cell, 0 for a blank. """
+        offset = self.offsets[cell]
+        self.buffer[offset:offset + self.width] = self.symbols[value]
+
+    def apply(self, step):
+        """ Update the picture with a step. """
+        if step.kind == "place":
+            self.set(step.cell, step.value)
+        elif step.kind == "undo":
+            self.set(step.cell, 0)
+
+    def render(self):
+        """ Get the picture.
+        Returns:
+            picture (string): the board, a line per row
+        """
+        return self.buffer.decode("ascii")
+
+
+def show(steps, board, every=1, interval=None, file=None):
+    """ Print the board as a solve runs, the board before the first step and after every sampled one.
+    Parameters:
+        steps (iterable): the steps of the solve
+        board (Board): board being solved, as it was before the first step
+        every (int): print after one "place" or "undo" step in this many
+        interval (float): print at most once per this many seconds, None for no limit
+        file (file): file to print to, None for stdout
+    """
+    file = sys.stdout if file is None else file
+    renderer = GridRenderer(board.n)
+    renderer.load(board)
+    rule = "=" * renderer.line_width
+    print(renderer.render(), end="\n" + rule + "\n", file=file)
+    count = 0
+    next_time = 0.0
+    for step in steps:
+        renderer.apply(step)
+        if step.kind != "place" and step.kind != "undo":
+            continue
+        count += 1
+        if count < every:
+            continue
+        if interval is not None:
+            now = time.perf_counter()
+            if now < next_time:
+                continue
+            next_time = now + interval
+        count = 0
+        print(renderer.render(), end="\n" + rule + "\n", file=file)
+    if count:
+        print(renderer.render(), end="\n" + rule + "\n", file=file)  # The end, if it wasn't a sample
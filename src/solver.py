@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from board import Board
+from bit_board import BitBoard
+from stats import phase
 
 
 class Solver(ABC):
@@ -10,38 +11,102 @@ class Solver(ABC):
 
     @staticmethod
     @abstractmethod
-    def solve(filename="game.txt", show_solving=False):
+    def solve(filename="game.txt", show_solving=False, stats=None):
         """ Solve the sudoku at filename and return it.
         Parameters:
             filename (string): filename that sudoku is saved in
             show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            stats (SolveStats): stats to fill in, None for no stats
         Returns:
             sudoku (Board): The solved sudoku (or None if not possible)
         """
         pass
 
     @staticmethod
-    def get_board(filename):
+    @abstractmethod
+    def solve_board(board, show_solving=False, stats=None):
+        """ Solve the already loaded sudoku in place and return it.
+        Parameters:
+            board (Board): sudoku to solve, with its candidates filled in
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            sudoku (Board): The solved sudoku
+        """
+        pass
+
+    @staticmethod
+    def get_board_from_string(puzzle, board_class=BitBoard, stats=None):
+        """ Load the puzzle string, fill in initial candidates and return it
+        Parameters:
+            puzzle (string): the cells row by row, "." or "0" for blanks (see Board.load_string)
+            board_class (type): board representation to load into (Board or BitBoard)
+            stats (SolveStats): stats to time the loading into, None for no stats
+        Returns:
+            board (Board): the sudoku
+        """
+        with phase(stats, "load"):
+            board = board_class()
+            board.load_string(puzzle)
+        with phase(stats, "candidates"):
+            Solver.fill_candidates(board)
+        return board
+
+    @staticmethod
+    def get_board(filename, board_class=BitBoard, stats=None):
         """ Load the board at filename, fill in initial candidates and return it
+        Parameters:
+            filename (string): filename that sudoku is saved in
+            board_class (type): board representation to load into (Board or BitBoard)
+            stats (SolveStats): stats to time the loading into, None for no stats
         Returns:
             board (Board): sudoku at filename
         """
-        board = Board()
-        board.load_board(filename)
-        Solver.fill_candidates(board)
+        with phase(stats, "load"):
+            board = board_class()
+            board.load_board(filename)
+        with phase(stats, "candidates"):
+            Solver.fill_candidates(board)
         return board
 
     @staticmethod
     def fill_candidates(board):
         """ Fill in all blanks in board with of possible candidates.
         A cell is counted as blank if it does not contain an integer.
+        Takes a single pass, each blank's candidates are the digits its row, column and section don't use.
         Parameters:
             board (Board): sudoku to fill in
         """
-        blanks = Solver.get_blanks(board)
-        for x, y in blanks:
-            candidates = Solver.get_candidates(board, x, y)
-            board.set_board_item(candidates, x, y)
+        if isinstance(board, BitBoard):
+            board.fill_candidates()  # Works on the masks directly
+            return
+        layout = board.layout
+        mask_digits = layout.mask_digits
+        all_digits = layout.all_digits
+        for x, y in layout.cells:
+            if not board.contains_value(x, y):
+                board.set_board_item(list(mask_digits[all_digits & ~board.get_used_mask(x, y)]), x, y)
+
+    @staticmethod
+    def place(board, number, x, y):
+        """ Set the cell at (x, y) to number and remove number from the candidates of its peers.
+        Only the cells sharing a row, column or section with (x, y) (20 on a 9x9 board) are visited.
+        Parameters:
+            board (Board): sudoku to place number on
+            number (int): number to place
+            x (int): x ordinate
+            y (int): y ordinate
+        Returns:
+            changed (list): indices of the peers that lost number as a candidate
+        """
+        board.set_board_item(number, x, y)
+        cells = board.layout.cells
+        changed = []
+        for peer in board.layout.peers[x + y * board.size]:
+            peer_x, peer_y = cells[peer]
+            if board.remove_candidate(number, peer_x, peer_y):
+                changed.append(peer)
+        return changed
 
     @staticmethod
     def get_blanks(board):
@@ -53,8 +118,8 @@ class Solver(ABC):
             blanks (list): list of x, y pairs corresponding to all blanks in the board.
         """
         blanks = []  # an array of x, y pairs
-        for y in range(9):
-            for x in range(9):
+        for y in range(board.size):
+            for x in range(board.size):
                 number = board.get_board_item(x, y)
                 if type(number) != int:
                     blanks.append((x, y))
@@ -70,13 +135,7 @@ class Solver(ABC):
         Returns:
             candidates (list): list (of ints) of candidates for cell at (x, y)
         """
-        candidates = []
-        for candidate in range(1, 10):
-            board.set_board_item(candidate, x, y)
-            if board.is_valid():
-                candidates.append(candidate)
-        board.set_board_item(None, x, y)  # Change board back to original state
-        return candidates
+        return [candidate for candidate in range(1, board.size + 1) if board.can_place(candidate, x, y)]
 
     @staticmethod
     def add_confirmed_candidates(board):
@@ -88,12 +147,12 @@ class Solver(ABC):
             change (bool): Whether any change was made.
         """
         change = False
-        for x in range(9):
-            for y in range(9):
+        for x in range(board.size):
+            for y in range(board.size):
                 cell = board.get_board_item(x, y)
                 if type(cell) == list:
                     if len(cell) == 1:
-                        board.set_board_item(cell[0], x, y)
+                        Solver.place(board, cell[0], x, y)
                         change = True
         return change
 
@@ -0,0 +1,161 @@
+import threading
+import time
+from solver import Solver
+from bit_board import BitBoard
+from propagator import Propagator
+from search_engine import SearchEngine
+from stats import phase
+from units import format_puzzle, parse_puzzle
+
+
+class SolverSession:
+    """ Solves puzzle after puzzle of one size, reusing the same buffers for every one.
+    A session owns a Propagator and a SearchEngine (with the search stack, candidate masks and undo trail),
+    made once and reset in place for each puzzle, rather than the boards, lists and engines a solve_board
+    call makes and throws away. That keeps a long running worker from churning the garbage collector.
+
+    A session holds the state of the puzzle it's solving, so it must only be used by one thread at a time.
+    Sessions share nothing that changes (only the layouts in units.py, which are never changed after they're
+    made), so any number of threads can solve at once with a session each, see thread_session.
+    """
+
+    def __init__(self, n=3, ordering="mrv", forward_checking=True, rules=None):
+        """ Make the session's buffers.
+        Parameters:
+            n (int): width of a section in cells, of the puzzles to solve
+            ordering (string): which cell to branch on next, one of search_engine.ORDERINGS
+            forward_checking (bool): whether to prune peers' candidates as digits are placed
+            rules (tuple): names of the rules to propagate with before searching, from propagator.RULES
+                (defaults to propagator.DEFAULT_RULES), () to only search
+        """
+        board = BitBoard(n)
+        self.n = n
+        self.size = board.size
+        self.cell_count = board.layout.cell_count
+        self.propagator = None if rules == () else Propagator(board, rules)
+        self.engine = SearchEngine(board, ordering, forward_checking)
+        self.puzzles = 0  # Puzzles solved by the session
+
+    def solve_values(self, values, stats=None):
+        """ Solve a puzzle given as the value of every cell.
+        Parameters:
+            values (bytes): the value of every cell row by row, 0 for blanks, n ** 4 of them
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            solution (bytes): the value of every cell of the solution, None if the puzzle has no solution
+        """
+        if len(values) != self.cell_count:
+            raise ValueError("The session solves puzzles of {} cells, not {}".format(self.cell_count, len(values)))
+        if max(values) > self.size:
+            raise ValueError("A {0}x{0} puzzle can't have a {1} in it".format(self.size, max(values)))
+        self.puzzles += 1
+        engine = self.engine
+        propagator = self.propagator
+        if propagator is None:
+            with phase(stats, "search"):
+                engine.load_values(values)
+                engine.search()
+        else:
+            with phase(stats, "propagation"):
+                propagator.stats = stats
+                propagator.load_values(values)
+                consistent = propagator.propagate()
+            if not consistent:
+                return None
+            if 0 not in propagator.values:
+                return bytes(propagator.values)
+            with phase(stats, "search"):
+                engine.load_values(propagator.values, propagator.candidates)
+                engine.search()
+        if stats is not None:
+            stats.add_search(engine.nodes, engine.backtracks, engine.max_depth)
+        return engine.solution
+
+    def solve(self, puzzle, stats=None):
+        """ Solve a puzzle string.
+        Parameters:
+            puzzle (string): the puzzle, in any format Board.load_string takes
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            solution (string): the solution (see Board.to_string), None if the puzzle has no solution
+        """
+        with phase(stats, "load"):
+            n, values = parse_puzzle(puzzle)
+        if n != self.n:
+            raise ValueError("The session solves {0}x{0} puzzles, not {1}x{1}".format(self.size, n * n))
+        solution = self.solve_values(bytes(values), stats)
+        return None if solution is None else format_puzzle(solution, self.size)
+
+    def solve_board(self, board, stats=None):
+        """ Solve a loaded board in place, only its values are looked at (not its candidates).
+        Parameters:
+            board (Board): sudoku to solve, the size of the session's puzzles
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            sudoku (Board): the board, unchanged if it has no solution
+        """
+        solution = self.solve_values(board.get_values(), stats)
+        if solution is not None:
+            board.load_values(solution, board.n)
+        return board
+
+
+_thread_sessions = threading.local()
+
+
+def thread_session(n=3):
+    """ Get the calling thread's session for puzzles of n by n sections, made the first time it's asked for.
+    Parameters:
+        n (int): width of a section in cells
+    Returns:
+        session (SolverSession): the session, with the default options
+    """
+    sessions = getattr(_thread_sessions, "sessions", None)
+    if sessions is None:
+        sessions = _thread_sessions.sessions = {}
+    session = sessions.get(n)
+    if session is None:
+        session = sessions[n] = SolverSession(n)
+    return session
+
+
+class SessionSolver(Solver):
+    """ Solve the sudoku with propagation then a search with MRV and forward checking, like
+    ConstraintBacktrackSolver, on the calling thread's SolverSession (see thread_session), so solving many
+    puzzles reuses the same buffers. """
+
+    @staticmethod
+    def solve(filename="game.txt", show_solving=False, stats=None):
+        """ Solve the sudoku at filename and return it.
+        Parameters:
+            filename (string): filename that sudoku is saved in
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            sudoku (Board): The solved sudoku, unchanged if there is no solution
+        """
+        board = SessionSolver.get_board(filename, stats=stats)
+        return SessionSolver.solve_board(board, show_solving, stats)
+
+    @staticmethod
+    def solve_board(board, show_solving=False, stats=None):
+        """ Solve the already loaded sudoku in place and return it.
+        Parameters:
+            board (Board): sudoku to solve
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            stats (SolveStats): stats to fill in, None for no stats
+        Returns:
+            sudoku (Board): The solved sudoku, unchanged if there is no solution
+        """
+        thread_session(board.n).solve_board(board, stats)
+        if show_solving:
+            print(board, end="\n" + "=" * 21 + "\n")
+        return board
+
+
+if __name__ == "__main__":
+    print("Solving...")
+    start_time = time.time()
+    solved_board = SessionSolver.solve(show_solving=True)
+    end_time = time.time()
+    print("Completed in {}s".format(round(end_time - start_time, 3)))
@@ -0,0 +1,133 @@
+import json
+import time
+
+PHASES = ("load", "candidates", "propagation", "search")
+
+
+class SolveStats:
+    """ Counters and timers filled in by the solvers when one is passed to them (stats=...).
+    Without one the solvers only keep a few plain integer counters they'd have anyway, so it costs next to
+    nothing to leave off, and little more than a dictionary update per rule application to turn on.
+
+    Stats from many puzzles can be added together with merge, for totals over a batch.
+    """
+
+    def __init__(self):
+        self.puzzles = 1
+        self.nodes = 0  # Cells branched on by a search (moves tried, for the stochastic solver)
+        self.backtracks = 0  # Branches that ran out of digits
+        self.max_depth = 0  # Most cells filled in by search at once
+        self.restarts = 0
+        self.eliminations = {}  # Candidates removed, by the name of the propagation rule that removed them
+        self.is_valid_calls = 0
+        self.timers = {}  # Seconds spent, by phase (see PHASES)
+
+    def add_search(self, nodes, backtracks, max_depth):
+        """ Record a finished search.
+        Parameters:
+            nodes (int): cells branched on
+            backtracks (int): branches that ran out of digits
+            max_depth (int): most cells filled in by the search at once
+        """
+        self.nodes += nodes
+        self.backtracks += backtracks
+        self.max_depth = max(self.max_depth, max_depth)
+
+    def merge(self, other):
+        """ Add the stats of other (another puzzle, or batch of them) to these.
+        Parameters:
+            other (SolveStats): stats to add
+        """
+        self.puzzles += other.puzzles
+        self.add_search(other.nodes, other.backtracks, other.max_depth)
+        self.restarts += other.restarts
+        self.is_valid_calls += other.is_valid_calls
+        for rule, count in other.eliminations.items():
+            self.eliminations[rule] = self.eliminations.get(rule, 0) + count
+        for name, seconds in other.timers.items():
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    @staticmethod
+    def aggregate(stats):
+        """ Add up the stats of many puzzles.
+        Parameters:
+            stats (iterable): SolveStats to add up
+        Returns:
+            total (SolveStats): the totals
+        """
+        total = SolveStats()
+        total.puzzles = 0
+        for puzzle_stats in stats:
+            total.merge(puzzle_stats)
+        return total
+
+    def to_dict(self):
+        """ Get the stats as a dictionary, ready for JSON. """
+        return {
+            "puzzles": self.puzzles,
+            "nodes": self.nodes,
+            "backtracks": self.backtracks,
+            "max_depth": self.max_depth,
+            "restarts": self.restarts,
+            "eliminations": dict(self.eliminations),
+            "is_valid_calls": self.is_valid_calls,
+            "timers": {name: round(seconds, 6) for name, seconds in self.timers.items()},
+        }
+
+    def to_json(self):
+        """ Get the stats as a line of JSON. """
+        return json.dumps(self.to_dict(), sort_keys=True)
+
+
+class _Phase:
+    """ Times a phase of solving into stats, and has the board count its is_valid calls into them during it.
+    The board counts them itself (see Board.is_valid) while its stats attribute is set, which is only for the
+    length of the phase, so boards don't keep a count when there are no stats. """
+
+    def __init__(self, stats, name, board):
+        self.stats = stats
+        self.name = name
+        self.board = board
+
+    def __enter__(self):
+        board = self.board
+        # Only the outermost phase on a board counts, the board already counts the calls of the phases inside it
+        self.counting = board is not None and board.stats is None
+        if self.counting:
+            board.stats = self.stats
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        timers = self.stats.timers
+        timers[self.name] = timers.get(self.name, 0.0) + time.perf_counter() - self.start
+        if self.counting:
+            self.board.stats = None
+        return False
+
+
+class _NoPhase:
+    """ Stands in for a _Phase when there are no stats to fill in. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(stats, name, board=None):
+    """ Time a phase of solving, use as "with phase(stats, "search", board):".
+    Parameters:
+        stats (SolveStats): stats to record into, None to record nothing
+        name (string): name of the phase, one of PHASES
+        board (Board): board whose is_valid calls to count, None not to count them
+    Returns:
+        timer (context manager): the timer
+    """
+    if stats is None:
+        return _NO_PHASE
+    return _Phase(stats, name, board)
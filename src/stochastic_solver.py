@@ -1,18 +1,254 @@
-from board import Board
+import math
+import random
+import time
+from deadlines import check_deadline
+from solver import Solver
+from constraint_solver import ConstraintSolver
+from stats import phase
 
 
-class StochasticSolver:
-    """ Solve the sudoku at "game.txt" by Stochastic searching. """
+# Cooling schedules give the temperature as a fraction of the starting temperature,
+# from how far through the current run (0 to 1) the annealing is.
+SCHEDULES = {
+    "geometric": lambda progress: 0.001 ** progress,
+    "linear": lambda progress: max(1.0 - progress, 0.001),
+    "logarithmic": lambda progress: 1.0 / (1.0 + 99.0 * math.log1p(progress * (math.e - 1))),
+}
+RESTART_POLICIES = ("random", "best")
 
-    def __init__(self, filename="game.txt", show_solving=False):
-        """ Load up the board, solve it. """
-        self.board = Board()
-        self.board.load_board(filename)
 
-        # print(self.board)
-        # print("=" * 21)
-        # print(self.board)
-        print("NOT IMPLIMENTED YET")
+class Annealer:
+    """ Simulated annealing over complete (but possibly conflicting) fillings of a board.
+    Every section is filled with a permutation of the digits it is missing, so sections are always valid
+    and the score is the number of repeated digits in the rows and columns. A move swaps two blank cells of a
+    section, and only the two rows and two columns they're in are rescored (the digit counts of every row and
+    column are kept up to date), so a move costs the same however big the board is.
+
+    Moves that make the score worse are accepted with probability exp(-delta / temperature), with the
+    temperature lowered over each run by the cooling schedule. A run ends when the score hits 0, or after
+    restart_after moves without a new best score, and the next run starts from a fresh random filling
+    or from the best filling so far, as the restart policy says.
+    """
+
+    def __init__(self, board, rng=random):
+        """ Copy the board into the annealer and fill every section at random.
+        Parameters:
+            board (Board): sudoku to solve
+            rng (Random): random number generator to use
+        """
+        layout = board.layout
+        self.rng = rng
+        self.cells = layout.cells
+        self.sections = layout.sections
+        self.size = layout.size
+        self.stride = layout.size + 1
+        self.values = bytearray(layout.cell_count)
+        self.fixed = bytearray(layout.cell_count)
+        self.valid = board.is_valid()
+        for index, (x, y) in enumerate(self.cells):
+            cell = board.get_board_item(x, y)
+            if type(cell) == int:
+                self.values[index] = cell
+                self.fixed[index] = 1
+        # Blank cells of each section, only sections with two or more can be swapped in
+        self.free = [[index for index in section if not self.fixed[index]] for section in self.sections]
+        self.movable = [cells for cells in self.free if len(cells) > 1]
+        # row_counts[y * (size + 1) + digit] is how many times digit is in row y
+        self.row_counts = [0, ] * (self.size * self.stride)
+        self.column_counts = [0, ] * (self.size * self.stride)
+        self.score = 0
+        self.best_score = None
+        self.best_values = None
+        self.iterations = 0
+        self.restarts = 0
+        self.randomize()
+
+    def randomize(self):
+        """ Fill the blank cells of every section with a random permutation of its missing digits. """
+        values = self.values
+        for section, cells in zip(self.sections, self.free):
+            missing = set(range(1, self.size + 1)) - set(values[index] for index in section if self.fixed[index])
+            digits = list(missing)
+            self.rng.shuffle(digits)
+            for index, digit in zip(cells, digits):
+                values[index] = digit
+        self._rescore()
+
+    def _rescore(self):
+        """ Recount every row and column from scratch, only needed when the whole filling changes. """
+        stride = self.stride
+        row_counts = self.row_counts = [0, ] * (self.size * stride)
+        column_counts = self.column_counts = [0, ] * (self.size * stride)
+        for index, (x, y) in enumerate(self.cells):
+            row_counts[y * stride + self.values[index]] += 1
+            column_counts[x * stride + self.values[index]] += 1
+        self.score = sum(count - 1 for count in row_counts + column_counts if count > 1)
+        self._note_best()
+
+    def _note_best(self):
+        """ Keep a copy of the filling if it's the best so far. """
+        if self.best_score is None or self.score < self.best_score:
+            self.best_score = self.score
+            self.best_values = bytes(self.values)
+            return True
+        return False
+
+    def _swap(self, first, second):
+        """ Swap the digits of two cells, updating the counts.
+        Returns:
+            delta (int): the change in score
+        """
+        values, row_counts, column_counts = self.values, self.row_counts, self.column_counts
+        size, stride = self.size, self.stride
+        a, b = values[first], values[second]
+        delta = 0
+        for index, old, new in ((first, a, b), (second, b, a)):
+            row = index // size * stride
+            column = index % size * stride
+            # Taking a repeated digit out of a line lowers the score, putting one in that's there raises it
+            row_counts[row + old] -= 1
+            column_counts[column + old] -= 1
+            delta -= (row_counts[row + old] > 0) + (column_counts[column + old] > 0)
+            delta += (row_counts[row + new] > 0) + (column_counts[column + new] > 0)
+            row_counts[row + new] += 1
+            column_counts[column + new] += 1
+        values[first], values[second] = b, a
+        self.score += delta
+        return delta
+
+    def starting_temperature(self, samples=200):
+        """ Pick a starting temperature, the standard deviation of the score change over some random moves.
+        Returns:
+            temperature (float): the temperature, at least 0.1
+        """
+        if not self.movable:
+            return 1.0
+        deltas = []
+        for _ in range(samples):
+            first, second = self.rng.sample(self.rng.choice(self.movable), 2)
+            deltas.append(self._swap(first, second))
+            self._swap(first, second)
+        mean = sum(deltas) / len(deltas)
+        return max(math.sqrt(sum((delta - mean) ** 2 for delta in deltas) / len(deltas)), 0.1)
+
+    def anneal(self, max_iterations=2000000, time_limit=None, schedule="geometric", temperature=None,
+               run_length=50000, restart_after=20000, max_restarts=None, restart_policy="random"):
+        """ Anneal until the score is 0 or a budget runs out.
+        Parameters:
+            max_iterations (int): most moves to try over all runs
+            time_limit (float): most seconds to spend, None for no limit
+            schedule (string): cooling schedule, one of SCHEDULES
+            temperature (float): starting temperature of each run, None to pick one (see starting_temperature)
+            run_length (int): moves over which the temperature is cooled in a run
+            restart_after (int): moves without a new best score before restarting
+            max_restarts (int): most restarts, None for no limit
+            restart_policy (string): what to restart from, one of RESTART_POLICIES
+        Returns:
+            solved (bool): whether a filling with no conflicts was found, the best filling is in best_values
+        """
+        if schedule not in SCHEDULES:
+            raise ValueError("Unknown schedule {}, expected one of {}".format(schedule, ", ".join(SCHEDULES)))
+        if restart_policy not in RESTART_POLICIES:
+            raise ValueError("Unknown restart policy {}, expected one of {}".format(
+                restart_policy, ", ".join(RESTART_POLICIES)))
+        if not self.valid:
+            return False
+        cooling = SCHEDULES[schedule]
+        deadline = None if time_limit is None else time.perf_counter() + time_limit
+        start_temperature = temperature or self.starting_temperature()
+        rng_random, choice, sample, exp = self.rng.random, self.rng.choice, self.rng.sample, math.exp
+        movable = self.movable
+
+        step = 0  # Moves into the current run
+        stalled = 0  # Moves since the last new best
+        while self.score and movable and self.iterations < max_iterations:
+            if stalled >= restart_after:
+                if max_restarts is not None and self.restarts >= max_restarts:
+                    break
+                self.restarts += 1
+                if restart_policy == "best":
+                    self.values[:] = self.best_values
+                    self._rescore()
+                else:
+                    self.randomize()
+                step = stalled = 0
+            if not self.iterations & 1023:
+                check_deadline()
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+
+            current = start_temperature * cooling(min(step / run_length, 1.0))
+            first, second = sample(choice(movable), 2)
+            delta = self._swap(first, second)
+            if delta > 0 and rng_random() >= exp(-delta / current):
+                self._swap(first, second)  # Rejected, swap back
+            self.iterations += 1
+            step += 1
+            if self.score < self.best_score:
+                self._note_best()
+                stalled = 0
+            else:
+                stalled += 1
+        return self.best_score == 0
+
+    def write_to(self, board):
+        """ Copy the best filling found onto board.
+        Parameters:
+            board (Board): board the annealer was created from
+        """
+        for index, (x, y) in enumerate(self.cells):
+            if not self.fixed[index]:
+                board.set_board_item(self.best_values[index], x, y)
+
+
+class StochasticSolver(Solver):
+    """ Solve the sudoku by stochastic search (simulated annealing, see Annealer).
+    It can't prove a puzzle has no solution, but it can always be stopped early with the best filling so far. """
+
+    @staticmethod
+    def solve(filename="game.txt", show_solving=False, stats=None, **options):
+        """ Solve the sudoku at filename and return it.
+        Parameters:
+            filename (string): filename that sudoku is saved in
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            stats (SolveStats): stats to fill in, None for no stats
+            options: budgets and schedule, see StochasticSolver.solve_board
+        Returns:
+            sudoku (Board): The solved sudoku, or the best filling found if it wasn't solved
+        """
+        board = StochasticSolver.get_board(filename, stats=stats)
+        return StochasticSolver.solve_board(board, show_solving, stats=stats, **options)
+
+    @staticmethod
+    def solve_board(board, show_solving=False, stats=None, propagate=True, seed=None, **options):
+        """ Solve the already loaded sudoku in place and return it.
+        Parameters:
+            board (Board): sudoku to solve, with its candidates filled in
+            show_solving (bool): Whether to show the solving of the sudoku (when possible)
+            stats (SolveStats): stats to fill in (moves tried count as nodes), None for no stats
+            propagate (bool): fill in what constraint propagation can first, so there's less to search
+            seed (int): seed for the random number generator, None for a random one
+            options: passed on to Annealer.anneal (max_iterations, time_limit, schedule, temperature,
+                run_length, restart_after, max_restarts, restart_policy)
+        Returns:
+            sudoku (Board): The solved sudoku, or the best filling found if it wasn't solved
+                (check with is_solved), unchanged if the clues already conflict
+        """
+        if propagate:
+            ConstraintSolver.propagate(board, stats=stats)
+        with phase(stats, "search", board):
+            annealer = Annealer(board, random.Random(seed))
+            solved = annealer.anneal(**options)
+            if annealer.valid:
+                annealer.write_to(board)
+        if stats is not None:
+            stats.nodes += annealer.iterations
+            stats.restarts += annealer.restarts
+        if show_solving:
+            print("{} after {} moves and {} restarts, {} conflicts left".format(
+                "Solved" if solved else "Stopped", annealer.iterations, annealer.restarts, annealer.best_score))
+            print(board, end="\n" + "=" * 21 + "\n")
+        return board
 
     @staticmethod
     def first_blank(board):
@@ -22,13 +258,18 @@ class StochasticSolver:
         Returns:
             position (tuple): (x, y) of first blank. If board is not blank, None is return
         """
-        for y in range(9):
-            for x in range(9):
+        for y in range(board.size):
+            for x in range(board.size):
                 number = board.get_board_item(x, y)
-                if number is None:
+                if type(number) != int:
                     return x, y
         return None
 
 
 if __name__ == "__main__":
-    StochasticSolver(show_solving=True)
+    import time
+    print("Solving...")
+    start_time = time.time()
+    solved_board = StochasticSolver.solve(show_solving=True)
+    end_time = time.time()
+    print("Completed in {}s".format(round(end_time - start_time, 3)))
@@ -0,0 +1,145 @@
+# Precomputed index tables for boards of n by n sections (n * n digits, 9x9 for the usual n = 3).
+# Cells are numbered x + y * size, units are numbered rows 0 to size - 1, then the columns and then the sections
+# (rows 0 to 8, columns 9 to 17 and sections 18 to 26 on a 9x9 board, the same numbering the ConstraintTracker uses).
+
+# Digit d is written as SYMBOLS[d - 1] in single character puzzle strings
+SYMBOLS = "123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+class _MaskDigits:
+    """ Stands in for a MASK_DIGITS table on boards with too many digits to tabulate every mask. """
+
+    def __getitem__(self, mask):
+        digits = []
+        while mask:
+            low = mask & -mask
+            digits.append(low.bit_length())
+            mask ^= low
+        return tuple(digits)
+
+
+class Layout:
+    """ The index tables for one board size. Get them with get_layout rather than making them. """
+
+    def __init__(self, n):
+        """ Work out the tables.
+        Parameters:
+            n (int): width (and height) of a section in cells
+        """
+        size = n * n
+        self.n = n
+        self.size = size  # Width of the board and number of digits
+        self.cell_count = size * size
+        self.unit_count = size * 3
+
+        # cells[index] is the (x, y) position of the cell
+        self.cells = tuple((index % size, index // size) for index in range(self.cell_count))
+        self.rows = tuple(tuple(x + y * size for x in range(size)) for y in range(size))
+        self.columns = tuple(tuple(x + y * size for y in range(size)) for x in range(size))
+        self.sections = tuple(tuple(section_x * n + x + (section_y * n + y) * size for y in range(n) for x in range(n))
+                              for section_y in range(n) for section_x in range(n))
+        self.units = self.rows + self.columns + self.sections
+
+        # cell_units[index] is the (row, column, section) unit numbers of the cell
+        self.cell_units = tuple((y, size + x, size * 2 + x // n + y // n * n) for x, y in self.cells)
+
+        # peers[index] is the other cells sharing a row, column or section with the cell
+        self.peers = tuple(tuple(sorted(set(cell for unit in self.cell_units[index] for cell in self.units[unit]) -
+                                        {index}))
+                           for index in range(self.cell_count))
+
+        # intersections[unit] holds, for every unit crossing unit in n cells (a section and a row or column),
+        # a tuple of (shared cells, the rest of unit, the rest of the crossing unit)
+        unit_sets = [set(unit) for unit in self.units]
+        lines = size * 2
+        self.intersections = tuple(
+            tuple((tuple(c for c in self.units[unit] if c in unit_sets[other]),
+                   tuple(c for c in self.units[unit] if c not in unit_sets[other]),
+                   tuple(c for c in self.units[other] if c not in unit_sets[unit]))
+                  for other in range(self.unit_count)
+                  if (unit < lines) != (other < lines) and len(unit_sets[unit] & unit_sets[other]) == n)
+            for unit in range(self.unit_count))
+
+        # mask_digits[mask] is the tuple of digits whose bits are set in mask (bit d - 1 represents d),
+        # a table up to 16 digits and worked out on the fly past that
+        if size <= 16:
+            self.mask_digits = tuple(tuple(d for d in range(1, size + 1) if mask >> (d - 1) & 1)
+                                     for mask in range(1 << size))
+        else:
+            self.mask_digits = _MaskDigits()
+        self.all_digits = (1 << size) - 1
+
+
+LAYOUTS = {}
+
+
+def get_layout(n=3):
+    """ Get the index tables for a board of n by n sections, they're only worked out once per size.
+    Parameters:
+        n (int): width (and height) of a section in cells
+    Returns:
+        layout (Layout): the tables
+    """
+    layout = LAYOUTS.get(n)
+    if layout is None:
+        if not 2 <= n <= 6:
+            raise ValueError("Sections must be 2 to 6 cells wide, not {}".format(n))
+        layout = LAYOUTS[n] = Layout(n)
+    return layout
+
+
+def parse_puzzle(puzzle):
+    """ Read a puzzle in either of the text formats.
+    Single character format: one character per cell, row by row, digits past 9 as letters (see SYMBOLS).
+    Multi character format: the cells' numbers separated by whitespace or commas.
+    Blanks are "." or "0" in both.
+    Parameters:
+        puzzle (string): the puzzle
+    Returns:
+        n (int): width of the puzzle's sections, worked out from its number of cells
+        values (list): the value of every cell, 0 for blanks
+    Raises:
+        ValueError: if a cell isn't a digit or a blank, a value is outside 1 to n * n,
+            or the number of cells isn't n ** 4
+    """
+    tokens = puzzle.replace(",", " ").split()
+    try:
+        if len(tokens) > 1:
+            values = [0 if token == "." else int(token) for token in tokens]
+        else:
+            values = [0 if char in ".0" else SYMBOLS.index(char.upper()) + 1 for char in puzzle.strip()]
+    except ValueError:
+        raise ValueError("Puzzle has a cell that isn't a digit or a blank: {}".format(puzzle))
+    n = round(len(values) ** 0.25)
+    if n ** 4 != len(values) or n < 2:
+        raise ValueError("A puzzle must have n ** 4 cells (81 for 9x9, 256 for 16x16), not {}".format(len(values)))
+    lowest, highest = min(values), max(values)
+    if lowest < 0 or highest > n * n:
+        raise ValueError("A {0}x{0} puzzle can't have a {1} in it".format(n * n, lowest if lowest < 0 else highest))
+    return n, values
+
+
+def format_puzzle(values, size):
+    """ Write a puzzle out in the single character format if it fits, or the multi character format if not.
+    Parameters:
+        values (iterable): the value of every cell, 0 for blanks
+        size (int): width of the board
+    Returns:
+        puzzle (string): the puzzle, "." for blanks
+    """
+    if size <= len(SYMBOLS):
+        return "".join(SYMBOLS[value - 1] if value else "." for value in values)
+    return " ".join(str(value) if value else "." for value in values)
+
+
+LAYOUT = get_layout(3)
+CELLS = LAYOUT.cells
+ROWS = LAYOUT.rows
+COLUMNS = LAYOUT.columns
+SECTIONS = LAYOUT.sections
+UNITS = LAYOUT.units
+CELL_UNITS = LAYOUT.cell_units
+PEERS = LAYOUT.peers
+INTERSECTIONS = LAYOUT.intersections
+MASK_DIGITS = LAYOUT.mask_digits
+ALL_DIGITS = LAYOUT.all_digits
@@ -0,0 +1,153 @@
+import numpy as np
+from solver import Solver
+from constraint_backtrack_solver import ConstraintBacktrackSolver
+
+# Needs numpy, which nothing else in the project does, so only import this module when it's wanted.
+
+DIGIT_BITS = np.array([0] + [1 << (d - 1) for d in range(1, 10)], dtype=np.uint16)  # DIGIT_BITS[digit]
+POPCOUNT = np.array([bin(mask).count("1") for mask in range(512)], dtype=np.uint8)
+# SINGLE_DIGIT[mask] is the digit of a single bit mask, 0 for any other mask
+SINGLE_DIGIT = np.array([mask.bit_length() if POPCOUNT[mask] == 1 else 0 for mask in range(512)], dtype=np.uint8)
+SHIFTS = np.arange(9, dtype=np.uint16)
+ALL_DIGITS = 0b111111111
+
+
+def load_grids(puzzles):
+    """ Load puzzle strings into a (K, 9, 9) array of digits, 0 for blanks.
+    Parameters:
+        puzzles (list): K puzzle strings, 81 characters, "." or "0" for blanks
+    Returns:
+        grids (ndarray): the puzzles as grids of uint8, indexed [puzzle, y, x]
+    Raises:
+        ValueError: if a puzzle isn't 81 characters long, or has a cell that isn't a digit or a blank
+    """
+    for puzzle in puzzles:
+        if len(puzzle) != 81:
+            raise ValueError("A puzzle string must be 81 characters long, not {}".format(len(puzzle)))
+    raw = np.frombuffer("".join(puzzles).replace(".", "0").encode("ascii", "replace"), dtype=np.uint8)
+    digits = raw - np.uint8(ord("0"))  # Characters below "0" wrap around, so anything but a digit is past 9
+    invalid = np.flatnonzero(digits > 9)
+    if invalid.size:
+        raise ValueError("Puzzle has a cell that isn't a digit or a blank: {}".format(puzzles[invalid[0] // 81]))
+    return digits.reshape(len(puzzles), 9, 9)
+
+
+def to_strings(grids):
+    """ Convert a (K, 9, 9) array of digits back into puzzle strings ("." for blanks). """
+    characters = np.where(grids == 0, ord("."), grids + ord("0")).astype(np.uint8)
+    raw = characters.tobytes().decode("ascii")
+    return [raw[start:start + 81] for start in range(0, len(raw), 81)]
+
+
+def _section_reduce(values, function):
+    """ Reduce (K, 9, 9, ...) values over each 3x3 section and spread the result back over its cells. """
+    shape = values.shape
+    sections = values.reshape((shape[0], 3, 3, 3, 3) + shape[3:])  # [puzzle, section y, y, section x, x, ...]
+    reduced = function(function(sections, axis=4), axis=2)  # [puzzle, section y, section x, ...]
+    return np.repeat(np.repeat(reduced, 3, axis=1), 3, axis=2)
+
+
+def candidate_masks(grids):
+    """ Work out the candidates of every cell of every puzzle at once.
+    Parameters:
+        grids (ndarray): (K, 9, 9) digits, 0 for blanks
+    Returns:
+        masks (ndarray): (K, 9, 9) uint16 candidate masks (bit d - 1 set when d is a candidate), 0 for filled cells
+    """
+    bits = DIGIT_BITS[grids]
+    used = (np.bitwise_or.reduce(bits, axis=2)[:, :, None] |
+            np.bitwise_or.reduce(bits, axis=1)[:, None, :] |
+            _section_reduce(bits, np.bitwise_or.reduce))
+    return np.where(grids == 0, ALL_DIGITS & ~used, 0).astype(np.uint16)
+
+
+def find_invalid(grids):
+    """ Which puzzles repeat a digit in a row, column or section?
+    Parameters:
+        grids (ndarray): (K, 9, 9) digits, 0 for blanks
+    Returns:
+        invalid (ndarray): (K, ) bool
+    """
+    one_hot = grids[..., None] == np.arange(1, 10, dtype=np.uint8)  # [puzzle, y, x, digit]
+    return ((one_hot.sum(axis=2) > 1).any(axis=(1, 2)) |
+            (one_hot.sum(axis=1) > 1).any(axis=(1, 2)) |
+            (_section_reduce(one_hot.astype(np.uint8), np.sum) > 1).any(axis=(1, 2, 3)))
+
+
+def propagate_singles(grids):
+    """ Fill in naked and hidden singles across the whole batch until no puzzle changes.
+    Parameters:
+        grids (ndarray): (K, 9, 9) digits, 0 for blanks
+    Returns:
+        grids (ndarray): the puzzles with the singles filled in (a new array)
+        solved (ndarray): (K, ) bool, puzzles that are now full and valid
+        dead (ndarray): (K, ) bool, puzzles found to have no solution
+    """
+    grids = grids.copy()
+    dead = find_invalid(grids)
+    active = np.flatnonzero(~dead)  # Puzzles that changed last round, only they can change again
+    while active.size:
+        current = grids[active]
+        blank = current == 0
+        masks = candidate_masks(current)
+        stuck = (blank & (masks == 0)).any(axis=(1, 2))
+
+        naked = SINGLE_DIGIT[masks]
+
+        # A digit is a hidden single where it is the only place left for it in a unit
+        planes = ((masks[..., None] >> SHIFTS) & 1).astype(np.uint8)  # [puzzle, y, x, digit]
+        hidden_planes = planes.astype(bool) & (
+            (planes.sum(axis=2) == 1)[:, :, None, :] |
+            (planes.sum(axis=1) == 1)[:, None, :, :] |
+            (_section_reduce(planes, np.sum) == 1))
+        hidden_count = hidden_planes.sum(axis=3)
+        hidden = np.where(hidden_count == 1, hidden_planes.argmax(axis=3) + 1, 0).astype(np.uint8)
+
+        # Two different digits forced into the same cell means there's no solution
+        stuck |= (hidden_count > 1).any(axis=(1, 2))
+        stuck |= ((naked != 0) & (hidden != 0) & (naked != hidden)).any(axis=(1, 2))
+        dead[active[stuck]] = True
+
+        found = np.where(naked != 0, naked, hidden)
+        changed = ~stuck & found.any(axis=(1, 2))
+        active = active[changed]
+        current = np.where(blank, found, current)[changed].astype(np.uint8)
+        grids[active] = current
+        invalid = find_invalid(current)
+        dead[active[invalid]] = True
+        active = active[~invalid]
+
+    solved = ~dead & (grids != 0).all(axis=(1, 2))
+    return grids, solved, dead
+
+
+def solve_vectorized(puzzles, solver=ConstraintBacktrackSolver, batch_size=4096):
+    """ Lazily solve every puzzle in puzzles, propagating singles over batch_size puzzles at a time.
+    Only the puzzles singles don't solve are handed to solver, one at a time.
+    Parameters:
+        puzzles (iterable): puzzle strings
+        solver (type): solver class for the puzzles left unsolved
+        batch_size (int): number of puzzles to propagate at once
+    Returns:
+        solutions (generator): the solution strings, in the same order as the puzzles
+    """
+    batch = []
+    for puzzle in puzzles:
+        batch.append(puzzle)
+        if len(batch) == batch_size:
+            yield from _solve_batch(batch, solver)
+            batch = []
+    if batch:
+        yield from _solve_batch(batch, solver)
+
+
+def _solve_batch(puzzles, solver):
+    """ Solve one batch of puzzles, see solve_vectorized. """
+    grids, solved, dead = propagate_singles(load_grids(puzzles))
+    for puzzle, partial, is_solved, is_dead in zip(puzzles, to_strings(grids), solved, dead):
+        if is_solved:
+            yield partial
+        else:
+            # Search from the singles found, unless they ran into a contradiction
+            board = Solver.get_board_from_string(puzzle if is_dead else partial)
+            yield solver.solve_board(board).to_string()
@@ -0,0 +1,19 @@
+import os
+import sys
+
+# The modules in src import each other by name, as they do when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from bit_board import BitBoard  # noqa: E402
+from solver import Solver  # noqa: E402
+
+
+def load_board(puzzle, board_class=BitBoard):
+    """ Load a puzzle string into a board with its candidates filled in, ready for any of the solvers.
+    Parameters:
+        puzzle (string): the cells row by row, "." or "0" for blanks
+        board_class (type): board representation to load into (Board or BitBoard)
+    Returns:
+        board (Board): the sudoku
+    """
+    return Solver.get_board_from_string(puzzle, board_class)
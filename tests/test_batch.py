@@ -0,0 +1,83 @@
+import io
+import pytest
+from batch import SOLVERS, main, read_puzzles, solve_batch, solve_parallel
+from benchmark import load_corpus
+from engines import verify
+from solution_cache import SolutionCache
+
+PUZZLES = load_corpus("easy")[:6] + load_corpus("hard")[:4]
+EASY = [load_corpus("easy")[index] for index in (1, 9, 11)]  # Plain backtracking takes seconds over most others
+
+
+def test_read_puzzles():
+    file = io.StringIO("# A comment\n\n" + PUZZLES[0] + "\n  " + PUZZLES[1] + "  \n")
+    assert list(read_puzzles(file)) == PUZZLES[:2]
+
+
+@pytest.mark.parametrize("solver", sorted(set(SOLVERS) - {"constraint"}))
+def test_solve_batch(solver):
+    puzzles = EASY if solver == "backtrack" else PUZZLES
+    solutions = list(solve_batch(puzzles, SOLVERS[solver]))
+    assert len(solutions) == len(puzzles)
+    assert all(verify(puzzle, solution) for puzzle, solution in zip(puzzles, solutions))
+
+
+def test_solve_batch_is_lazy():
+    def puzzles():
+        yield PUZZLES[0]
+        raise AssertionError("Read past the first puzzle")
+
+    assert verify(PUZZLES[0], next(solve_batch(puzzles())))
+
+
+def test_solve_batch_records_stats_and_caches():
+    cache = SolutionCache(100)
+    stats = []
+    first = list(solve_batch(PUZZLES, cache=cache, record_stats=stats.append))
+    assert len(stats) == len(PUZZLES) and all(puzzle_stats.nodes >= 0 for puzzle_stats in stats)
+    assert cache.misses == len(PUZZLES)
+    again = list(solve_batch(PUZZLES, cache=cache, record_stats=stats.append))
+    assert again == first
+    assert cache.hits == len(PUZZLES) and len(stats) == len(PUZZLES)  # Cache hits aren't solved
+
+
+def test_unsolvable_puzzles_come_back_unsolved():
+    cache = SolutionCache(100)
+    solution, = solve_batch(["11" + "." * 79], cache=cache)
+    assert "." in solution
+    assert cache.get("11" + "." * 79) is None
+
+
+def test_main(tmp_path, capsys):
+    puzzles = tmp_path / "puzzles.txt"
+    puzzles.write_text("\n".join(PUZZLES) + "\n")
+    solutions = tmp_path / "solutions.txt"
+    stats = tmp_path / "stats.jsonl"
+    main([str(puzzles), "-o", str(solutions), "-s", "dlx", "--stats", str(stats)])
+    lines = solutions.read_text().splitlines()
+    assert all(verify(puzzle, solution) for puzzle, solution in zip(PUZZLES, lines)) and len(lines) == len(PUZZLES)
+    assert len(stats.read_text().splitlines()) == len(PUZZLES)
+    assert "Solved {} puzzles".format(len(PUZZLES)) in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("with_cache", [False, True])
+def test_solve_parallel_matches_solve_batch(with_cache):
+    puzzles = PUZZLES * 3 + ["11" + "." * 79]
+    cache = SolutionCache(100) if with_cache else None
+    stats = []
+    solutions = list(solve_parallel(iter(puzzles), workers=2, chunk_size=4, min_parallel=8, cache=cache,
+                                    record_stats=stats.append))
+    assert solutions == list(solve_batch(puzzles))
+    # Every puzzle not answered from the cache is solved, repeats only hit once their first solution is back
+    assert len(stats) == len(puzzles) - (cache.hits if with_cache else 0)
+    if with_cache:
+        assert cache.hits > 0
+
+
+def test_solve_parallel_few_puzzles_stay_in_process(monkeypatch):
+    def pool(*args):
+        raise AssertionError("No pool for so few puzzles")
+
+    monkeypatch.setattr("multiprocessing.Pool", pool)
+    solutions = list(solve_parallel(PUZZLES, workers=2, min_parallel=len(PUZZLES) + 1))
+    assert solutions == list(solve_batch(PUZZLES))
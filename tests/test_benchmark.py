@@ -0,0 +1,43 @@
+from benchmark import compare, percentile, run_benchmark
+
+
+def _result(median, p95, samples, solved=20):
+    return {"solved": solved, "median": median, "p95": p95, "samples": samples}
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.99) == 7
+    assert percentile([], 0.5) is None
+
+
+def test_median_regression():
+    regressions = compare({"dlx/hard": _result(0.0012, 0.002, 20)}, {"dlx/hard": _result(0.001, 0.002, 20)})
+    assert len(regressions) == 1 and "median" in regressions[0]
+    assert compare({"dlx/hard": _result(0.00105, 0.002, 20)}, {"dlx/hard": _result(0.001, 0.002, 20)}) == []
+
+
+def test_p95_needs_enough_samples():
+    baseline = {"dlx/hard": _result(0.001, 0.002, 20)}
+    results = {"dlx/hard": _result(0.001, 0.004, 20)}
+    assert compare(results, baseline) == []
+    assert compare(results, baseline, min_samples=20) != []
+    # Baselines saved without samples count one per solved puzzle
+    baseline = {"dlx/hard": {"solved": 60, "median": 0.001, "p95": 0.002}}
+    results = {"dlx/hard": _result(0.001, 0.004, 60, 60)}
+    assert len(compare(results, baseline)) == 1
+
+
+def test_fewer_solved():
+    regressions = compare({"dlx/hard": _result(0.001, 0.002, 19, 19)}, {"dlx/hard": _result(0.001, 0.002, 20)})
+    assert regressions == ["dlx/hard: solved 19 puzzles, down from 20"]
+
+
+def test_repeats():
+    results = run_benchmark(["dlx"], ["pathological"], repeat=3)["dlx/pathological"]
+    assert results["solved"] == results["puzzles"] == 4
+    assert results["runs"] == 3 and results["samples"] == 12
+    assert results["median"] <= results["p95"] <= results["max"]
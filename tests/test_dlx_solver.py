@@ -0,0 +1,46 @@
+import sys
+import pytest
+from benchmark import load_corpus
+from bit_board import BitBoard
+from conftest import load_board
+from dlx_solver import DancingLinks, DLXSolver
+from engines import verify
+from solver import Solver
+
+PUZZLES = load_corpus("hard")[:5] + load_corpus("17clue")[:3] + load_corpus("pathological")
+
+
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_solves(puzzle):
+    board = DLXSolver.solve_board(load_board(puzzle))
+    assert verify(puzzle, board.to_string())
+    assert DLXSolver.count_solutions(load_board(puzzle)) == 1
+
+
+def test_no_solution():
+    board = DLXSolver.solve_board(load_board("11" + "." * 79))
+    assert "." in board.to_string()
+    assert DLXSolver.count_solutions(load_board("11" + "." * 79)) == 0
+
+
+@pytest.mark.parametrize("n", [4, 5])
+def test_big_boards_dont_recurse(n):
+    board = BitBoard(n)
+    board.set_board_item(1, 0, 0)
+    board.set_board_item(n * n, n * n - 1, n * n - 1)
+    Solver.fill_candidates(board)
+    puzzle = board.to_string()
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200)  # The search goes a level deeper for every blank
+    try:
+        solved = DLXSolver.solve_board(board)
+    finally:
+        sys.setrecursionlimit(limit)
+    assert solved.is_solved() and verify(puzzle, solved.to_string())
+
+
+def test_search_leaves_the_matrix_as_it_found_it():
+    links = DancingLinks(2)
+    before = (links.left[:], links.right[:], links.up[:], links.down[:], links.sizes[:])
+    assert links.count_solutions(1000) == 288
+    assert (links.left, links.right, links.up, links.down, links.sizes) == before
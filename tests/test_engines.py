@@ -0,0 +1,129 @@
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from benchmark import load_corpus
+from conftest import load_board
+from deadlines import get_deadline, set_deadline
+from engines import EngineTimeout, run_engine, verify
+from portfolio_solver import PortfolioModel, _take_turns, race
+
+# No solution, but it takes a long search to find that out
+IMPOSSIBLE = ".....5.8....6.1.43..........1.5........1.6...3.......553.....61........4........."
+SEARCHES = ("backtrack", "backtrack_mrv", "constraint_backtrack", "constraint_backtrack_mrv", "session",
+            "stochastic")
+
+
+def _solve_timed(engine, puzzle, timeout):
+    """ Run the engine, returning how long it took and the exception it raised, if any. """
+    start = time.monotonic()
+    try:
+        run_engine(engine, load_board(puzzle), timeout)
+    except EngineTimeout as error:
+        return time.monotonic() - start, error
+    return time.monotonic() - start, None
+
+
+@pytest.mark.parametrize("engine", SEARCHES)
+def test_timeout_in_a_worker_thread(engine):
+    with ThreadPoolExecutor(1) as executor:
+        seconds, error = executor.submit(_solve_timed, engine, IMPOSSIBLE, 0.2).result(10)
+    assert isinstance(error, EngineTimeout)
+    assert seconds < 1.5
+
+
+@pytest.mark.parametrize("engine", SEARCHES)
+def test_timeout_in_the_main_thread(engine):
+    seconds, error = _solve_timed(engine, IMPOSSIBLE, 0.2)
+    assert isinstance(error, EngineTimeout)
+    assert seconds < 1.5
+    assert get_deadline() is None
+
+
+def test_threads_keep_their_own_deadlines():
+    puzzle = load_corpus("hard")[0]
+    with ThreadPoolExecutor(2) as executor:
+        timed_out = executor.submit(_solve_timed, "backtrack", IMPOSSIBLE, 0.3)
+        solved = executor.submit(run_engine, "constraint_backtrack_mrv", load_board(puzzle), 30)
+        assert verify(puzzle, solved.result(10).to_string())
+        assert isinstance(timed_out.result(10)[1], EngineTimeout)
+
+
+def test_inner_engine_keeps_to_the_outer_deadline():
+    results = []
+
+    def solve():
+        set_deadline(time.monotonic() + 0.2)
+        results.append(_solve_timed("backtrack", IMPOSSIBLE, 30))
+        results.append(get_deadline())
+
+    thread = threading.Thread(target=solve)
+    thread.start()
+    thread.join(10)
+    (seconds, error), deadline = results
+    assert isinstance(error, EngineTimeout) and seconds < 1.5
+    assert deadline is not None  # The outer deadline is put back
+
+
+def test_portfolio_model_learns_from_losses():
+    model = PortfolioModel(min_samples=3, min_rate=0.5)
+    features = (3, 25, 0.4)
+    for _ in range(3):
+        model.record_race(features, "dlx", ("backtrack", "constraint_backtrack_mrv"))
+    assert model.best(features) == "dlx"
+    # dlx keeps losing, so it's no longer picked
+    for _ in range(4):
+        model.record_race(features, "constraint_backtrack_mrv", ("dlx", "backtrack"))
+    assert model.best(features) == "constraint_backtrack_mrv"
+    model.record_race(features, None, ("dlx", "backtrack", "constraint_backtrack_mrv"))
+    counts = model.buckets[PortfolioModel.bucket(features)]
+    assert counts == {"dlx": [3, 5], "backtrack": [0, 8], "constraint_backtrack_mrv": [4, 4]}
+
+
+def test_portfolio_model_saves_and_loads(tmp_path):
+    model = PortfolioModel()
+    model.record_race((3, 25, 0.4), "dlx", ("backtrack",))
+    filename = str(tmp_path / "model.json")
+    model.save(filename)
+    loaded = PortfolioModel()
+    loaded.load(filename)
+    loaded.load(filename)
+    assert loaded.buckets == {PortfolioModel.bucket((3, 25, 0.4)): {"dlx": [2, 0], "backtrack": [0, 2]}}
+
+
+def _race_in_worker(puzzle):
+    return race(puzzle)
+
+
+def test_race_in_a_pool_worker_takes_turns():
+    puzzle = load_corpus("pathological")[0]
+    with multiprocessing.Pool(1) as pool:
+        engine, solution, seconds, losers = pool.apply(_race_in_worker, (puzzle,))
+    assert verify(puzzle, solution)
+    assert engine == "dlx" and losers is None  # Not a race, so nothing for the model to learn
+
+
+def test_taking_turns_gives_slow_engines_rounds():
+    puzzle = load_corpus("pathological")[0]
+    start = time.monotonic()
+    engine, solution, seconds = _take_turns(puzzle, ("backtrack", "constraint_backtrack"))
+    assert engine == "constraint_backtrack" and verify(puzzle, solution)
+    assert time.monotonic() - start < 1.0
+    assert _take_turns(IMPOSSIBLE, ("backtrack",), 0.3) == (None, None, None)
+
+
+@pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="needs interval timers")
+def test_leaves_the_callers_timer_alone():
+    fired = []
+    previous = signal.signal(signal.SIGALRM, lambda signum, frame: fired.append(signum))
+    signal.setitimer(signal.ITIMER_REAL, 5)
+    try:
+        with pytest.raises(EngineTimeout):
+            run_engine("backtrack", load_board(IMPOSSIBLE), 0.1)
+        assert 4 < signal.getitimer(signal.ITIMER_REAL)[0] <= 5
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+    assert fired == []
@@ -0,0 +1,61 @@
+import random
+import pytest
+import generator
+from benchmark import load_corpus
+from dlx_solver import DLXSolver
+from engines import verify
+from generator import BAND_NAMES, generate, generate_bands, grade, is_unique, random_grid
+from solver import Solver
+
+
+def test_random_grid_is_a_solution():
+    rng = random.Random(1)
+    grids = [random_grid(rng) for _ in range(3)]
+    for grid in grids:
+        assert "." not in grid and Solver.get_board_from_string(grid).is_solved()
+    assert len(set(grids)) == 3
+
+
+@pytest.mark.parametrize("symmetric", [False, True])
+def test_generated_puzzles_are_unique_and_graded(symmetric):
+    puzzle, band, nodes = generate(random.Random(2), min_clues=20, symmetric=symmetric)
+    assert is_unique(puzzle)
+    assert 81 - puzzle.count(".") >= 20
+    assert (band, nodes) == grade(puzzle)
+    solution = DLXSolver.solve_board(Solver.get_board_from_string(puzzle)).to_string()
+    assert verify(puzzle, solution)
+    if symmetric:
+        assert all((puzzle[cell] == ".") == (puzzle[80 - cell] == ".") for cell in range(81))
+
+
+def test_grade():
+    assert {grade(puzzle)[0] for puzzle in load_corpus("easy")[:5]} == {"easy"}
+    band, nodes = grade(load_corpus("hard")[0])
+    assert band == "expert" and nodes > 0
+    assert not is_unique("." * 81)
+
+
+def test_bands_are_filled_and_reproducible():
+    counts = {"easy": 2, "medium": 1}
+    puzzles = generate_bands(counts, 1, seed=7)
+    assert {band: len(found) for band, found in puzzles.items()} == counts
+    for band, found in puzzles.items():
+        assert all(grade(puzzle)[0] == band and is_unique(puzzle) for puzzle in found)
+    assert generate_bands(counts, 1, seed=7) == puzzles
+    # Worker processes finish in any order, but the puzzles are taken in the order of their seeds
+    assert generate_bands(counts, 2, seed=7) == puzzles
+
+
+def test_nothing_wanted(monkeypatch):
+    def generate_seeded(seed):
+        raise AssertionError("Nothing should be generated")
+
+    monkeypatch.setattr(generator, "_generate_seeded", generate_seeded)
+    assert generate_bands({"easy": 0}, 1) == {"easy": []}
+    assert generate_bands({}, 1) == {}
+
+
+def test_unknown_band():
+    with pytest.raises(ValueError):
+        generate_bands({"impossible": 1}, 1)
+    assert BAND_NAMES == ("easy", "medium", "hard", "expert")
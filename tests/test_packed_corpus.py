@@ -0,0 +1,108 @@
+import random
+import pytest
+from benchmark import load_corpus
+from packed_corpus import (HEADER, PackedCorpus, PackedCorpusWriter, is_packed, pack_values, record_size,
+                           unpack_values)
+from units import parse_puzzle
+
+PUZZLES = load_corpus("easy")[:6] + load_corpus("hard")[:6]
+
+
+@pytest.mark.parametrize("n", [2, 3, 4, 5, 6])
+def test_pack_round_trips(n):
+    rng = random.Random(n)
+    for _ in range(20):
+        values = bytes(rng.randint(0, n * n) for _ in range(n ** 4))
+        record = pack_values(values, n)
+        assert len(record) == record_size(n)
+        assert unpack_values(record, n) == values
+
+
+def test_pack_rejects_bad_boards():
+    with pytest.raises(ValueError):
+        pack_values(bytes(80), 3)
+    with pytest.raises(ValueError):
+        pack_values(bytes([10]) + bytes(80), 3)
+    with pytest.raises(ValueError):
+        unpack_values(b"\xf0" + bytes(40), 3)
+
+
+def _write(filename, puzzles, ids=False):
+    with PackedCorpusWriter(filename, ids=ids) as writer:
+        for index, puzzle in enumerate(puzzles):
+            writer.append_string(puzzle, index * 10 if ids else None)
+
+
+def test_reads_back_what_was_written(tmp_path):
+    filename = str(tmp_path / "corpus.sdkp")
+    _write(filename, PUZZLES)
+    assert is_packed(filename)
+    with PackedCorpus(filename) as corpus:
+        assert len(corpus) == len(PUZZLES)
+        assert list(corpus.puzzles()) == [puzzle.replace("0", ".") for puzzle in PUZZLES]
+        for index, puzzle in enumerate(PUZZLES):
+            assert corpus.values(index) == bytes(parse_puzzle(puzzle)[1])
+            assert corpus.board(index).to_string() == corpus.puzzle(index)
+            assert corpus.record_id(index) == index
+
+
+def test_slicing(tmp_path):
+    filename = str(tmp_path / "corpus.sdkp")
+    _write(filename, PUZZLES)
+    with PackedCorpus(filename) as corpus:
+        assert corpus[-1].to_string() == corpus.puzzle(len(PUZZLES) - 1)
+        assert [board.to_string() for board in corpus[2:8:3]] == [corpus.puzzle(2), corpus.puzzle(5)]
+        assert [board.to_string() for board in corpus[-3:]] == list(corpus.puzzles(len(PUZZLES) - 3))
+        assert corpus[100:] == []
+        assert list(corpus.puzzles(3, 5)) == [corpus.puzzle(3), corpus.puzzle(4)]
+        assert [board.to_string() for board in corpus.boards(10, 100)] == list(corpus.puzzles(10))
+        with pytest.raises(IndexError):
+            corpus.board(len(PUZZLES))
+
+
+def test_ids(tmp_path):
+    filename = str(tmp_path / "corpus.sdkp")
+    _write(filename, PUZZLES, ids=True)
+    with PackedCorpus(filename) as corpus:
+        assert corpus.ids
+        assert [corpus.record_id(index) for index in range(len(corpus))] == [index * 10 for index in range(12)]
+        assert corpus.record_id(-1) == 110
+        assert list(corpus.puzzles()) == [puzzle.replace("0", ".") for puzzle in PUZZLES]
+
+
+def test_appending_and_partial_records(tmp_path):
+    filename = str(tmp_path / "corpus.sdkp")
+    _write(filename, PUZZLES[:5])
+    with open(filename, "ab") as file:
+        file.write(b"\x12\x34")  # A record cut short
+    with PackedCorpus(filename) as corpus:
+        assert len(corpus) == 5
+    _write(filename, PUZZLES[5:])
+    with PackedCorpus(filename) as corpus:
+        assert list(corpus.puzzles()) == [puzzle.replace("0", ".") for puzzle in PUZZLES]
+
+
+def test_other_sizes(tmp_path):
+    filename = str(tmp_path / "corpus.sdkp")
+    values = bytes(random.Random(4).randint(0, 16) for _ in range(256))
+    with PackedCorpusWriter(filename, 4) as writer:
+        writer.append_values(values, 4)
+    with PackedCorpus(filename) as corpus:
+        assert corpus.n == 4 and corpus.values(0) == values
+
+
+def test_writer_leaves_other_files_alone(tmp_path):
+    filename = str(tmp_path / "corpus.sdkp")
+    _write(filename, PUZZLES[:2])
+    with open(filename, "rb") as file:
+        before = file.read()
+    with pytest.raises(ValueError):
+        PackedCorpusWriter(filename, 4)
+    text = tmp_path / "puzzles.txt"
+    text.write_text("\n".join(PUZZLES))
+    with pytest.raises(ValueError):
+        PackedCorpusWriter(str(text))
+    with open(filename, "rb") as file:
+        assert file.read() == before
+    assert text.read_text() == "\n".join(PUZZLES)
+    assert len(before) == HEADER.size + 2 * record_size(3)
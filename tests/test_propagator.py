@@ -0,0 +1,66 @@
+import pytest
+from benchmark import load_corpus
+from conftest import load_board
+from dlx_solver import DLXSolver
+from propagator import DEFAULT_RULES, RULES, Propagator, TracingPropagator
+from stats import SolveStats
+
+PUZZLES = load_corpus("easy")[:5] + load_corpus("hard")[:5] + load_corpus("17clue")[:3]
+
+
+SOLUTIONS = {puzzle: DLXSolver.solve_board(load_board(puzzle)).get_values() for puzzle in PUZZLES}
+
+
+def _check_keeps_solution(puzzle, rules):
+    propagator = Propagator(load_board(puzzle), rules)
+    assert propagator.propagate()
+    for index, digit in enumerate(SOLUTIONS[puzzle]):
+        if propagator.values[index]:
+            assert propagator.values[index] == digit
+        else:
+            assert propagator.candidates[index] & 1 << (digit - 1)
+
+
+@pytest.mark.parametrize("rule", sorted(RULES))
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_rule_keeps_the_solution(puzzle, rule):
+    _check_keeps_solution(puzzle, (rule,))
+
+
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_every_rule_keeps_the_solution(puzzle):
+    _check_keeps_solution(puzzle, tuple(RULES))
+
+
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_load_values_matches_load(puzzle):
+    propagator = Propagator(load_board(puzzle), DEFAULT_RULES)
+    propagator.propagate()
+    reused = Propagator(load_board(PUZZLES[0]), DEFAULT_RULES)
+    reused.propagate()
+    reused.load_values(load_board(puzzle).get_values())
+    reused.propagate()
+    assert reused.values == propagator.values and reused.candidates == propagator.candidates
+
+
+def test_contradiction_is_found():
+    assert not Propagator(load_board("11" + "." * 79)).propagate()
+
+
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_stats_and_tracing_propagate_the_same(puzzle):
+    plain = Propagator(load_board(puzzle), tuple(RULES))
+    plain.propagate()
+    stats = SolveStats()
+    counted = Propagator(load_board(puzzle), tuple(RULES), stats)
+    traced = TracingPropagator(load_board(puzzle), tuple(RULES), SolveStats())
+    for propagator in (counted, traced):
+        assert propagator.propagate() == plain.consistent
+        assert propagator.values == plain.values and propagator.candidates == plain.candidates
+    assert sum(stats.eliminations.values()) == plain.eliminations
+    assert stats.eliminations == traced.stats.eliminations
+    eliminated = {}
+    for step in traced.steps:
+        if step.kind == "eliminate":
+            eliminated[step.rule] = eliminated.get(step.rule, 0) + 1
+    assert eliminated == stats.eliminations
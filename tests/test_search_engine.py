@@ -0,0 +1,223 @@
+import inspect
+import sys
+import pytest
+from backtrack_solver import BacktrackSolver
+from benchmark import load_corpus
+from conftest import load_board
+from constraint_backtrack_solver import ConstraintBacktrackSolver
+from dlx_solver import DLXSolver
+from engines import verify
+from search_engine import ORDERINGS, SearchEngine
+from stats import SolveStats
+from units import format_puzzle
+
+HARD = load_corpus("hard")[:4]
+
+
+def _puzzles():
+    """ Puzzles with no, one and many solutions, of two sizes. """
+    solution = DLXSolver.solve_board(load_board(HARD[0])).to_string()
+    puzzles = list(HARD)
+    puzzles.append(solution[:54] + "." * 27)  # The last band blank, 228 solutions
+    puzzles.append(solution[:27] + "." * 54)  # Three full rows, more solutions than the limit
+    puzzles.append(HARD[1][:40] + "." * 41)  # Some clues taken away
+    puzzles.append("11" + "." * 79)  # A repeated digit, no solutions
+    puzzles.append("." * 16)  # Empty 4x4, 288 solutions
+    puzzles.append("1..." + "." * 12)
+    return puzzles
+
+
+PUZZLES = _puzzles()
+
+
+@pytest.mark.parametrize("forward_checking", [False, True])
+@pytest.mark.parametrize("ordering", ORDERINGS)
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_count_matches_dlx(puzzle, ordering, forward_checking):
+    limit = 300
+    expected = DLXSolver.count_solutions(load_board(puzzle), limit)
+    engine = SearchEngine(load_board(puzzle), ordering, forward_checking)
+    assert engine.count_solutions(limit) == expected
+
+
+@pytest.mark.parametrize("forward_checking", [False, True])
+@pytest.mark.parametrize("ordering", ORDERINGS)
+def test_count_stops_at_limit(ordering, forward_checking):
+    engine = SearchEngine(load_board("." * 16), ordering, forward_checking)
+    assert engine.count_solutions(5) == 5
+
+
+@pytest.mark.parametrize("forward_checking", [False, True])
+@pytest.mark.parametrize("ordering", ORDERINGS)
+@pytest.mark.parametrize("puzzle", HARD)
+def test_search_finds_the_solution(puzzle, ordering, forward_checking):
+    engine = SearchEngine(load_board(puzzle), ordering, forward_checking)
+    assert engine.search()
+    board = load_board(puzzle)
+    engine.write_to(board)
+    assert board.to_string() == DLXSolver.solve_board(load_board(puzzle)).to_string()
+
+
+def test_paused_search_carries_on():
+    engine = SearchEngine(load_board(HARD[2]))
+    engine.limit = 1
+    runs = 1
+    while not engine.run(16):
+        runs += 1
+    assert runs > 1
+    board = load_board(HARD[2])
+    engine.write_to(board)
+    assert board.to_string() == DLXSolver.solve_board(load_board(HARD[2])).to_string()
+
+
+def test_unknown_ordering():
+    with pytest.raises(ValueError):
+        SearchEngine(load_board(HARD[0]), "diagonal")
+
+
+@pytest.mark.parametrize("ordering", ["mrv", "mrv-degree"])
+@pytest.mark.parametrize("puzzle", HARD)
+def test_mrv_branches_on_the_fewest_candidates(puzzle, ordering):
+    engine = SearchEngine(load_board(puzzle), ordering)
+    cells = engine.open_cells[:engine.open_count]
+    chosen = engine.open_cells[engine._choose()]
+    fewest = min(engine.counts[index] for index in cells)
+    assert engine.counts[chosen] == fewest
+    if ordering == "mrv-degree":
+        assert engine.degrees[chosen] == max(engine.degrees[index] for index in cells if engine.counts[index] == fewest)
+
+
+@pytest.mark.parametrize("puzzle", HARD)
+def test_mrv_searches_fewer_nodes(puzzle):
+    nodes = {}
+    for ordering in ORDERINGS:
+        engine = SearchEngine(load_board(puzzle), ordering)
+        assert engine.search()
+        nodes[ordering] = engine.nodes
+    assert nodes["mrv"] < nodes["row-major"] and nodes["mrv-degree"] < nodes["row-major"]
+
+
+@pytest.mark.parametrize("solver", [BacktrackSolver, ConstraintBacktrackSolver])
+@pytest.mark.parametrize("ordering", ["mrv", "mrv-degree"])
+def test_solvers_search_in_the_ordering(solver, ordering):
+    for puzzle in HARD[:2] + load_corpus("17clue")[:2]:
+        board = solver.solve_board(load_board(puzzle), ordering=ordering)
+        assert verify(puzzle, board.to_string())
+
+
+@pytest.mark.parametrize("ordering", ["mrv", "mrv-degree"])
+def test_solver_stats_count_the_search(ordering):
+    stats = SolveStats()
+    BacktrackSolver.solve_board(load_board(HARD[0]), ordering=ordering, stats=stats)
+    engine = SearchEngine(load_board(HARD[0]), ordering)
+    engine.search()
+    assert stats.nodes == engine.nodes
+
+
+@pytest.mark.parametrize("ordering", ORDERINGS)
+@pytest.mark.parametrize("puzzle", HARD)
+def test_forward_checking_searches_no_more_nodes(puzzle, ordering):
+    nodes = []
+    for forward_checking in (False, True):
+        engine = SearchEngine(load_board(puzzle), ordering, forward_checking)
+        assert engine.search()
+        nodes.append(engine.nodes)
+    assert nodes[1] <= nodes[0]
+
+
+def test_forward_checking_prunes_peers_and_undoes_it():
+    engine = SearchEngine(load_board(HARD[0]), "mrv", True)
+    before = (engine.candidates[:], bytes(engine.counts), bytes(engine.degrees), engine.used[:])
+    index = engine.open_cells[engine._choose()]
+    digit = engine.mask_digits[engine.candidates[index]][0]
+    assert engine._assign_forward(index, digit)
+    assert engine.values[index] == digit and engine.trail
+    for peer in engine.peers[index]:
+        assert not engine.candidates[peer] & 1 << (digit - 1)
+    engine._unassign_forward(index, digit, 0)
+    assert not engine.trail and not engine.values[index]
+    assert (engine.candidates, bytes(engine.counts), bytes(engine.degrees), engine.used) == before
+
+
+@pytest.mark.parametrize("ordering", ORDERINGS)
+def test_search_unwinds_the_trail(ordering):
+    engine = SearchEngine(load_board(HARD[1]), ordering, True)
+    candidates = engine.candidates[:]
+    assert engine.count_solutions(2) == 1  # Searches the whole space, so it ends back at the top
+    assert not engine.trail and engine.depth == 0
+    assert engine.candidates == candidates
+
+
+def test_forward_checking_finds_a_dead_end():
+    # Placing 1 in the top left corner leaves the cell under it without candidates
+    board = load_board("." + "." * 8 + "." + "23456789" + "." * 63)
+    engine = SearchEngine(board, "row-major", True)
+    assert not engine._assign_forward(0, 1)
+
+
+@pytest.mark.parametrize("solver", [BacktrackSolver, ConstraintBacktrackSolver])
+def test_solvers_forward_check(solver):
+    for puzzle in HARD[:2]:
+        board = solver.solve_board(load_board(puzzle), forward_checking=True)
+        assert verify(puzzle, board.to_string())
+
+
+def test_node_budget():
+    engine = SearchEngine(load_board(HARD[0]))
+    assert not engine.run(10)
+    assert engine.nodes == 10 and not engine.finished
+    assert not engine.run(5)
+    assert engine.nodes == 15
+    assert engine.run() and engine.solutions == 1
+
+
+@pytest.mark.parametrize("forward_checking", [False, True])
+@pytest.mark.parametrize("ordering", ORDERINGS)
+def test_sliced_search_matches_one_run(ordering, forward_checking):
+    puzzle = PUZZLES[4]  # 228 solutions, so the search goes up and down the stack a lot
+    whole = SearchEngine(load_board(puzzle), ordering, forward_checking)
+    whole.limit = 300
+    assert whole.run()
+    sliced = SearchEngine(load_board(puzzle), ordering, forward_checking)
+    sliced.limit = 300
+    slices = 1
+    while not sliced.run(7):
+        slices += 1
+    assert slices > 1
+    assert ((sliced.nodes, sliced.backtracks, sliced.max_depth, sliced.solutions, sliced.solution) ==
+            (whole.nodes, whole.backtracks, whole.max_depth, whole.solutions, whole.solution))
+
+
+def test_pause():
+    engine = SearchEngine(load_board(HARD[0]), "mrv")
+
+    class Pausing(list):
+        def append(self, step):
+            list.append(self, step)
+            if step.kind == "place":
+                engine.pause()
+
+    engine.trace = Pausing()
+    assert not engine.run()
+    assert engine.nodes == 1 and len(engine.trace) == 1
+    engine.trace = None
+    assert engine.run() and engine.solutions == 1
+    board = load_board(HARD[0])
+    engine.write_to(board)
+    assert board.to_string() == DLXSolver.solve_board(load_board(HARD[0])).to_string()
+
+
+def test_backtracking_does_not_recurse():
+    # 150 blank cells, each a level deeper than the last
+    n, size = 5, 25
+    values = [0, ] * 150 + [(n * (row % n) + row // n + column) % size + 1
+                            for row in range(6, size) for column in range(size)]
+    puzzle = format_puzzle(values, size)
+    board = load_board(puzzle)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(len(inspect.stack()) + 50)
+    try:
+        BacktrackSolver.solve_board(board)
+    finally:
+        sys.setrecursionlimit(limit)
+    assert verify(puzzle, board.to_string())
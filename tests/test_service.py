@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from benchmark import load_corpus
+from engines import verify
+from service import DeadlineExceeded, ServiceBusy, SolveService, handle_connection, split_timeout
+
+PUZZLES = load_corpus("easy")[:8]
+# Row-major backtracking takes far longer than the tests wait on these
+SLOW = load_corpus("pathological")
+
+
+def test_solves_puzzles():
+    async def solve_all():
+        async with SolveService(workers=1) as service:
+            return await asyncio.gather(*(service.solve(puzzle) for puzzle in PUZZLES)), service.batches
+
+    solutions, batches = asyncio.run(solve_all())
+    assert all(verify(puzzle, solution) for puzzle, solution in zip(PUZZLES, solutions))
+    assert batches < len(PUZZLES)  # Requests arriving together are batched
+
+
+def test_deadline():
+    async def solve_slow():
+        async with SolveService("backtrack", workers=1) as service:
+            with pytest.raises(DeadlineExceeded):
+                await service.solve(SLOW[0], timeout=0.3)
+            # The worker gave up on the search, so it's free for the next request
+            solution = await service.solve(PUZZLES[0], timeout=10)
+            return solution, service.deadlines_missed
+
+    solution, missed = asyncio.run(solve_slow())
+    assert verify(PUZZLES[0], solution)
+    assert missed == 1
+
+
+def test_backpressure():
+    async def overload():
+        async with SolveService("backtrack", workers=1, max_queue=1, batch_size=1, timeout=1.0) as service:
+            # Two batches go to the worker, the batcher holds a third and one waits in the queue
+            waiting = [asyncio.ensure_future(service.solve(puzzle)) for puzzle in SLOW]
+            await asyncio.sleep(0.1)
+            with pytest.raises(ServiceBusy):
+                await service.solve(PUZZLES[0], wait=False)
+            rejected = service.rejected
+            results = await asyncio.gather(*waiting, return_exceptions=True)
+        return rejected, results
+
+    rejected, results = asyncio.run(overload())
+    assert rejected == 1
+    assert all(isinstance(result, DeadlineExceeded) for result in results)
+
+
+def test_close_fails_queued_requests():
+    async def close_early():
+        service = SolveService("backtrack", workers=1, max_queue=8, batch_size=1)
+        await service.start()
+        waiting = [asyncio.ensure_future(service.solve(puzzle, timeout=1.0)) for puzzle in SLOW * 2]
+        await asyncio.sleep(0.1)
+        await service.close()
+        return await asyncio.gather(*waiting, return_exceptions=True)
+
+    results = asyncio.run(asyncio.wait_for(close_early(), 30))
+    assert all(isinstance(result, DeadlineExceeded) for result in results)
+
+
+def test_split_timeout():
+    assert split_timeout(PUZZLES[0] + " 0.5") == (PUZZLES[0], 0.5)
+    assert split_timeout(PUZZLES[0]) == (PUZZLES[0], None)
+    numbers = " ".join(char if char != "." else "0" for char in PUZZLES[0])
+    # The last cell of a multi character puzzle isn't a timeout
+    assert split_timeout(numbers) == (numbers, None)
+    assert split_timeout(numbers + " 2") == (numbers, 2.0)
+    assert split_timeout(numbers.replace(" ", ",") + " 2") == (numbers.replace(" ", ","), 2.0)
+
+
+def test_connection():
+    numbers = " ".join(char if char != "." else "0" for char in PUZZLES[1])
+
+    async def talk():
+        async with SolveService(workers=1) as service:
+            server = await asyncio.start_server(lambda reader, writer: handle_connection(service, reader, writer),
+                                                "127.0.0.1", 0)
+            async with server:
+                reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+                writer.write("café\n{}\n{} 5\n".format(numbers, PUZZLES[2]).encode("utf-8"))
+                await writer.drain()
+                writer.write_eof()
+                answers = [line.decode("ascii").strip() async for line in reader]
+                writer.close()
+                return answers
+
+    answers = asyncio.run(asyncio.wait_for(talk(), 30))
+    assert len(answers) == 3
+    assert answers[0].startswith("ERROR")
+    assert verify(PUZZLES[1], answers[1].replace(" ", "")) and verify(PUZZLES[2], answers[2])
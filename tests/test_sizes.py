@@ -0,0 +1,101 @@
+import random
+import pytest
+from batch import main
+from board import Board
+from bit_board import BitBoard
+from conftest import load_board
+from dlx_solver import DLXSolver
+from engines import ENGINES, run_engine, verify
+from solver import Solver
+from units import format_puzzle, parse_puzzle
+
+
+def _puzzle(n, blanks):
+    """ A puzzle with n by n sections, blanks cells taken out of a patterned full grid. """
+    size = n * n
+    values = [(n * (row % n) + row // n + column) % size + 1 for row in range(size) for column in range(size)]
+    for index in random.Random(n).sample(range(len(values)), blanks):
+        values[index] = 0
+    return format_puzzle(values, size)
+
+
+PUZZLES = {2: _puzzle(2, 10), 4: _puzzle(4, 120), 5: _puzzle(5, 200)}
+
+
+@pytest.mark.parametrize("n", sorted(PUZZLES))
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engines_solve_every_size(n, engine):
+    puzzle = PUZZLES[n]
+    board = run_engine(engine, load_board(puzzle), 10)
+    assert board.size == n * n
+    if engine == "constraint":
+        # Propagation alone needn't finish the puzzle, but whatever it fills in has to be right
+        solution = DLXSolver.solve_board(load_board(puzzle)).to_string()
+        assert board.is_valid()
+        assert all(cell == "." or cell == digit for cell, digit in zip(board.to_string(), solution))
+    else:
+        assert verify(puzzle, board.to_string())
+
+
+@pytest.mark.parametrize("n", sorted(PUZZLES))
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_formats_round_trip(n, board_class):
+    puzzle = PUZZLES[n]
+    board = load_board(puzzle, board_class)
+    assert board.n == n and board.to_string() == puzzle
+    assert parse_puzzle(puzzle)[0] == n
+
+
+def test_too_many_digits_for_symbols():
+    # 36x36 needs more symbols than there are, so it's written as numbers
+    puzzle = _puzzle(6, 100)
+    assert len(puzzle.split()) == 36 * 36
+    n, values = parse_puzzle(puzzle)
+    assert n == 6 and max(values) == 36 and values.count(0) == 100
+    assert format_puzzle(values, 36) == puzzle
+
+
+def test_multi_character_format():
+    values = parse_puzzle(PUZZLES[4])[1]
+    spaced = " ".join(str(value) if value else "." for value in values)
+    commas = ",".join(str(value) for value in values)
+    assert parse_puzzle(spaced) == parse_puzzle(commas) == (4, values)
+    board = Solver.get_board_from_string(spaced)
+    assert board.to_string() == PUZZLES[4]
+
+
+@pytest.mark.parametrize("puzzle", [
+    "." * 80,  # Not n ** 4 cells
+    "1",
+    "5" + "." * 15,  # Past 4 on a 4x4 board
+    "G" + "." * 80,
+    "x" + "." * 80,
+    " ".join(["-1"] + ["."] * 15),  # Negative numbers
+    " ".join(["17"] + ["0"] * 15),
+])
+def test_bad_puzzles(puzzle):
+    with pytest.raises(ValueError):
+        parse_puzzle(puzzle)
+    with pytest.raises(ValueError):
+        Solver.get_board_from_string(puzzle)
+
+
+def test_load_board_grids(tmp_path):
+    game = tmp_path / "game.txt"
+    size = 16
+    game.write_text("\n".join(PUZZLES[4][row * size:(row + 1) * size].replace(".", " ")
+                              for row in range(size)) + "\n")
+    assert Solver.get_board(str(game)).to_string() == PUZZLES[4]
+    # A small puzzle with trailing blanks left off the lines and the last lines missing
+    game.write_text("1\n  3\n")
+    board = Solver.get_board(str(game))
+    assert board.n == 2 and board.to_string() == "1.....3........."
+
+
+def test_batch_main(tmp_path, capsys):
+    puzzles = tmp_path / "puzzles.txt"
+    puzzles.write_text(PUZZLES[2] + "\n" + PUZZLES[4] + "\n")
+    solutions = tmp_path / "solutions.txt"
+    main([str(puzzles), "-o", str(solutions)])
+    first, second = solutions.read_text().splitlines()
+    assert verify(PUZZLES[2], first) and verify(PUZZLES[4], second)
@@ -0,0 +1,72 @@
+import pytest
+from benchmark import load_corpus
+from bit_board import BitBoard
+from board import Board, snapshot_n, snapshot_size
+from conftest import load_board
+
+PUZZLES = load_corpus("easy")[:3] + load_corpus("hard")[:3]
+
+
+def _same(board, other):
+    size = board.size
+    assert other.to_string() == board.to_string()
+    assert other.is_valid() == board.is_valid()
+    for x in range(size):
+        for y in range(size):
+            assert other.get_candidate_mask(x, y) == board.get_candidate_mask(x, y)
+            for digit in range(1, size + 1):
+                assert other.can_place(digit, x, y) == board.can_place(digit, x, y)
+
+
+def test_sizes():
+    assert snapshot_size(3) == 243  # A 2 byte mask and a value for each cell
+    assert [snapshot_n(bytes(snapshot_size(n))) for n in range(2, 7)] == [2, 3, 4, 5, 6]
+    with pytest.raises(ValueError):
+        snapshot_n(bytes(100))
+
+
+@pytest.mark.parametrize("kind", [Board, BitBoard])
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_restores_onto_either_kind_of_board(kind, puzzle):
+    board = load_board(puzzle, kind)
+    snapshot = board.snapshot()
+    assert len(snapshot) == snapshot_size(3)
+    for other in (Board(), BitBoard(), Board(2), BitBoard(4)):
+        other.restore(snapshot)
+        _same(board, other)
+        assert other.snapshot() == snapshot
+
+
+@pytest.mark.parametrize("kind", [Board, BitBoard])
+def test_copies_are_independent(kind):
+    board = load_board(PUZZLES[0], kind)
+    snapshot = board.snapshot()
+    copy = board.get_copy()
+    _same(board, copy)
+    copy.set_board_item(5, 2, 0)
+    copy.remove_candidate(copy.get_board_item(3, 1)[0], 3, 1)
+    assert board.snapshot() == snapshot
+
+
+@pytest.mark.parametrize("kind", [Board, BitBoard])
+def test_restore_counts_conflicts(kind):
+    board = kind()
+    board.set_board_item(5, 0, 0)
+    board.set_board_item(5, 8, 0)
+    restored = BitBoard()
+    restored.restore(board.snapshot())
+    assert not restored.is_valid() and not restored.get_copy().is_valid()
+    restored.set_board_item(None, 8, 0)
+    assert restored.is_valid()
+
+
+@pytest.mark.parametrize("n", [4, 5, 6])
+def test_big_boards(n):
+    size = n * n
+    board = BitBoard(n)
+    board.set_board_item(size, 0, 0)
+    board.set_board_item([1, size], 1, 0)
+    restored = Board()
+    restored.restore(board.snapshot())
+    assert restored.get_board_item(0, 0) == size and restored.get_board_item(1, 0) == [1, size]
+    assert BitBoard(n, board.snapshot()).get_candidate_mask(1, 0) == 1 | 1 << (size - 1)
@@ -0,0 +1,133 @@
+import random
+import pytest
+from benchmark import load_corpus
+from engines import verify
+import solution_cache
+from solution_cache import SolutionCache, canonical_form, signature
+
+PUZZLES = load_corpus("easy")[:5] + load_corpus("hard")[:5] + load_corpus("17clue")[:3]
+
+
+def _shuffled(rng, size=3):
+    """ A random order of the lines of a grid that keeps them in their bands. """
+    bands = list(range(size))
+    rng.shuffle(bands)
+    lines = []
+    for band in bands:
+        within = list(range(size))
+        rng.shuffle(within)
+        lines += [band * size + line for line in within]
+    return lines
+
+
+def _transform(puzzle, rng):
+    """ Apply a random sudoku symmetry to the puzzle: a transpose, band, stack, row and column shuffles and
+    a relabelling of the digits. """
+    rows = _shuffled(rng)
+    columns = _shuffled(rng)
+    labels = list("123456789")
+    rng.shuffle(labels)
+    relabel = dict(zip("123456789", labels), **{".": ".", "0": "."})
+    transposed = rng.random() < 0.5
+    cells = []
+    for y in range(9):
+        for x in range(9):
+            cells.append(columns[y] * 9 + rows[x] if transposed else rows[y] * 9 + columns[x])
+    return "".join(relabel[puzzle[cell]] for cell in cells)
+
+
+def _rotated(puzzle):
+    return "".join(puzzle[(8 - x) * 9 + y] for y in range(9) for x in range(9))
+
+
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_canonical_form_is_stable_under_symmetries(puzzle):
+    rng = random.Random(puzzle)
+    canonical = canonical_form(puzzle)[0]
+    assert canonical_form(_rotated(puzzle))[0] == canonical
+    assert canonical_form(puzzle[::-1])[0] == canonical
+    for _ in range(10):
+        assert canonical_form(_transform(puzzle, rng))[0] == canonical
+
+
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_transform_maps_the_puzzle_to_its_canonical_form(puzzle):
+    canonical, (cells, digits) = canonical_form(puzzle)
+    assert "".join(digits[puzzle[cell]] for cell in cells) == canonical
+
+
+def test_different_puzzles_have_different_forms():
+    forms = {canonical_form(puzzle)[0] for puzzle in PUZZLES}
+    assert len(forms) == len(set(PUZZLES))
+
+
+def test_symmetric_puzzle():
+    # Every row and column of the empty grid ties, only the first MAX_LINE_ORDERS orders are tried
+    assert canonical_form("." * 81)[0] == "." * 81
+    assert canonical_form("1" + "." * 80)[0] == canonical_form("." * 80 + "5")[0]
+
+
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_cached_solution_round_trips(puzzle):
+    cache = SolutionCache()
+    solution = cache.solve(puzzle)
+    assert verify(puzzle, solution) and cache.misses == 1
+    rng = random.Random(puzzle)
+    for _ in range(5):
+        equivalent = _transform(puzzle, rng)
+        assert verify(equivalent, cache.get(equivalent))
+    assert cache.hits == 5
+
+
+def test_cache_file_round_trips(tmp_path):
+    filename = str(tmp_path / "cache.txt")
+    cache = SolutionCache(filename=filename)
+    for puzzle in PUZZLES:
+        cache.solve(puzzle)
+    cache.close()
+    reloaded = SolutionCache(filename=filename)
+    rng = random.Random(0)
+    for puzzle in PUZZLES:
+        equivalent = _transform(puzzle, rng)
+        assert verify(equivalent, reloaded.get(equivalent))
+    reloaded.close()
+
+
+def test_least_recently_used_is_dropped():
+    cache = SolutionCache(size=2)
+    for puzzle in PUZZLES[:3]:
+        cache.solve(puzzle)
+    assert cache.get(PUZZLES[0]) is None
+    assert cache.get(PUZZLES[2]) is not None
+
+
+@pytest.mark.parametrize("puzzle", PUZZLES)
+def test_signature_is_stable_under_symmetries(puzzle):
+    rng = random.Random(puzzle)
+    assert signature(_rotated(puzzle)) == signature(puzzle)
+    for _ in range(10):
+        assert signature(_transform(puzzle, rng)) == signature(puzzle)
+
+
+def _no_canonical_form(puzzle):
+    raise AssertionError("canonical_form shouldn't be needed")
+
+
+def test_quick_lookups_skip_the_canonical_form(monkeypatch):
+    cache = SolutionCache()
+    solution = cache.solve(PUZZLES[0])
+    equivalent = _transform(PUZZLES[0], random.Random(0))
+    assert verify(equivalent, cache.get(equivalent))
+    monkeypatch.setattr(solution_cache, "canonical_form", _no_canonical_form)
+    # Puzzles already seen are looked up as they are, and others with signatures that aren't cached are misses
+    assert cache.get(PUZZLES[0]) == solution
+    assert verify(equivalent, cache.get(equivalent))
+    assert cache.get("." * 81) is None
+    assert cache.hits == 3 and cache.misses == 2
+
+
+def test_dropped_entries_drop_their_signatures():
+    cache = SolutionCache(size=1)
+    cache.solve(PUZZLES[0])
+    cache.solve(PUZZLES[1])
+    assert list(cache._signatures) == [signature(PUZZLES[1])]
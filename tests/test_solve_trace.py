@@ -0,0 +1,86 @@
+import io
+import pytest
+from backtrack_solver import BacktrackSolver
+from benchmark import load_corpus
+from conftest import load_board
+from constraint_backtrack_solver import ConstraintBacktrackSolver
+from constraint_solver import ConstraintSolver
+from dlx_solver import DLXSolver
+from propagator import RULES
+from solve_trace import KINDS, GridRenderer, Step, sampled, show
+
+HARD = load_corpus("hard")[:2]
+TRACES = {
+    "backtrack": lambda board: BacktrackSolver.trace(board, slice_nodes=16),
+    "backtrack_mrv": lambda board: BacktrackSolver.trace(board, "mrv", True),
+    "constraint": ConstraintSolver.trace,
+    "constraint_backtrack": ConstraintBacktrackSolver.trace,
+    "constraint_backtrack_mrv": lambda board: ConstraintBacktrackSolver.trace(board, "mrv", True),
+}
+
+
+def _drawn(board):
+    renderer = GridRenderer(board.n)
+    renderer.load(board)
+    return renderer.render()
+
+
+@pytest.mark.parametrize("puzzle", HARD)
+@pytest.mark.parametrize("name", sorted(TRACES))
+def test_replaying_a_trace_draws_the_result(name, puzzle):
+    board = load_board(puzzle)
+    renderer = GridRenderer()
+    renderer.load(board)
+    steps = list(TRACES[name](board))
+    assert steps[-1].kind == ("unsolved" if name == "constraint" else "solved")
+    assert all(step.cell is not None and step.kind in KINDS[:3] for step in steps[:-1])
+    for step in steps:
+        renderer.apply(step)
+        if step.kind == "eliminate":
+            assert step.rule in RULES
+        elif step.kind == "undo":
+            assert step.rule == "backtrack"
+    assert renderer.render() == _drawn(board)
+    if name != "constraint":
+        assert board.to_string() == DLXSolver.solve_board(load_board(puzzle)).to_string()
+
+
+def test_draws_like_the_board():
+    board = DLXSolver.solve_board(load_board(HARD[0]))
+    assert _drawn(board).split("\n") == [line.rstrip() for line in str(board).rstrip("\n").split("\n")]
+    assert _drawn(load_board("." * 81)).split("\n")[0] == ". . . | . . . | . . ."
+
+
+@pytest.mark.parametrize("n", [2, 4, 6])
+def test_sizes(n):
+    size = n * n
+    renderer = GridRenderer(n)
+    renderer.set(0, size)
+    renderer.set(size * size - 1, 1)
+    lines = renderer.render().split("\n")
+    assert len(lines) == size + n - 1
+    assert all(len(line) == renderer.line_width for line in lines)
+    assert lines[0].split()[0] == ("36" if n == 6 else "123456789ABCDEFG"[size - 1])
+    assert lines[-1].split()[-1] == "1"
+
+
+def test_sampled():
+    steps = [Step("place" if cell % 2 else "eliminate", cell, 1, "branch", 0) for cell in range(10)]
+    steps.append(Step("solved", None, None, None, 0))
+    assert [step.cell for step in sampled(steps, every=3)] == [2, 5, 8, None]
+    assert [step.cell for step in sampled(steps, kinds=("place",))] == [1, 3, 5, 7, 9, None]
+    assert [step.cell for step in sampled(steps, interval=60)] == [0, None]
+
+
+def test_show():
+    board = load_board(HARD[0])
+    start = _drawn(board)
+    steps = list(BacktrackSolver.trace(board, "mrv"))
+    moves = sum(step.kind in ("place", "undo") for step in steps)
+    file = io.StringIO()
+    show(steps, load_board(HARD[0]), every=moves + 1, file=file)
+    pictures = file.getvalue().split("=" * 21 + "\n")
+    assert pictures == [start + "\n", _drawn(board) + "\n", ""]
+    file = io.StringIO()
+    show(steps, load_board(HARD[0]), file=file)
+    assert file.getvalue().count("=" * 21) == moves + 1
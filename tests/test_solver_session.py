@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from benchmark import load_corpus
+from conftest import load_board
+from dlx_solver import DLXSolver
+from solver_session import SessionSolver, SolverSession, thread_session
+from stats import SolveStats
+
+PUZZLES = load_corpus("easy")[:5] + load_corpus("hard")[:5] + load_corpus("17clue")[:5]
+SOLUTIONS = [DLXSolver.solve_board(load_board(puzzle)).to_string() for puzzle in PUZZLES]
+NO_SOLUTION = "11" + "." * 79
+
+
+@pytest.mark.parametrize("options", [{}, {"rules": ()}, {"ordering": "mrv-degree", "forward_checking": False}])
+def test_solves_puzzle_after_puzzle(options):
+    session = SolverSession(**options)
+    engine, trail, candidates = session.engine, session.engine.trail, session.engine.candidates
+    for _ in range(2):
+        # Puzzles without a solution in among the others don't leave anything behind
+        assert session.solve(NO_SOLUTION) is None
+        assert [session.solve(puzzle) for puzzle in PUZZLES] == SOLUTIONS
+    assert session.puzzles == 2 * (len(PUZZLES) + 1)
+    # The same buffers every time
+    assert session.engine is engine and engine.trail is trail and engine.candidates is candidates
+
+
+def test_solve_values_and_boards():
+    session = SolverSession()
+    board = load_board(PUZZLES[5])
+    assert session.solve_board(board) is board
+    assert board.to_string() == SOLUTIONS[5]
+    board = load_board(NO_SOLUTION)
+    assert session.solve_board(board).to_string() == NO_SOLUTION
+    values = bytes(0 if cell == "." else int(cell) for cell in PUZZLES[6])
+    assert session.solve_values(values) == bytes(int(cell) for cell in SOLUTIONS[6])
+
+
+def test_stats():
+    stats = SolveStats()
+    SolverSession().solve(PUZZLES[5], stats)
+    assert stats.nodes > 0 and set(stats.timers) == {"load", "propagation", "search"}
+    assert sum(stats.eliminations.values()) > 0
+
+
+def test_other_sizes():
+    session = SolverSession(2)
+    assert session.solve("1..." + "." * 12) is not None
+    with pytest.raises(ValueError):
+        session.solve(PUZZLES[0])
+    with pytest.raises(ValueError):
+        session.solve_values(bytes(81))
+    with pytest.raises(ValueError):
+        session.solve_values(bytes([5] + [0] * 15))
+
+
+def test_thread_sessions():
+    assert thread_session() is thread_session()
+    assert thread_session(2) is not thread_session()
+    assert thread_session(2).n == 2
+    other = []
+    thread = threading.Thread(target=lambda: other.append(thread_session()))
+    thread.start()
+    thread.join()
+    assert other[0] is not thread_session()
+
+
+def test_threads_solve_at_once():
+    def solve_all(offset):
+        sessions = set()
+        solutions = []
+        for index in range(len(PUZZLES)):
+            index = (index + offset) % len(PUZZLES)
+            board = SessionSolver.solve_board(load_board(PUZZLES[index]))
+            solutions.append((index, board.to_string()))
+            sessions.add(id(thread_session()))
+        return solutions, sessions
+
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(solve_all, range(8)))
+    for solutions, sessions in results:
+        assert len(sessions) == 1
+        assert all(solution == SOLUTIONS[index] for index, solution in solutions)
@@ -0,0 +1,46 @@
+import pytest
+from backtrack_solver import BacktrackSolver
+from benchmark import load_corpus
+from board import Board
+from bit_board import BitBoard
+from solver import Solver
+from stats import SolveStats, phase
+
+
+@pytest.mark.parametrize("board_class", [Board, BitBoard])
+def test_is_valid_calls_counted_during_phases(board_class):
+    stats = SolveStats()
+    board = Solver.get_board_from_string(load_corpus("hard")[1], board_class, stats)
+    BacktrackSolver.solve_board(board, stats=stats)
+    assert board.is_solved()
+    assert stats.is_valid_calls == 9544
+    assert stats.nodes > 0 and set(stats.timers) == {"load", "candidates", "search"}
+    # The board stops counting once the phase is over
+    assert board.stats is None
+    board.is_valid()
+    assert stats.is_valid_calls == 9544
+
+
+def test_nested_phases_count_once():
+    stats = SolveStats()
+    board = BitBoard()
+    with phase(stats, "search", board):
+        with phase(stats, "propagation", board):
+            board.is_valid()
+        assert board.stats is stats
+        board.is_valid()
+    assert stats.is_valid_calls == 2 and board.stats is None
+    with phase(None, "search", board):
+        board.is_valid()
+    assert stats.is_valid_calls == 2
+
+
+def test_merge():
+    first, second = SolveStats(), SolveStats()
+    first.add_search(3, 1, 2)
+    second.add_search(4, 2, 5)
+    second.eliminations["naked single"] = 7
+    second.is_valid_calls = 9
+    total = SolveStats.aggregate([first, second])
+    assert (total.puzzles, total.nodes, total.backtracks, total.max_depth) == (2, 7, 3, 5)
+    assert total.to_dict()["eliminations"] == {"naked single": 7} and total.is_valid_calls == 9
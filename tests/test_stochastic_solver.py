@@ -0,0 +1,100 @@
+import random
+import pytest
+from benchmark import load_corpus
+from conftest import load_board
+from dlx_solver import DLXSolver
+from engines import verify
+from stats import SolveStats
+from stochastic_solver import RESTART_POLICIES, SCHEDULES, Annealer, StochasticSolver
+
+HARD = load_corpus("hard")[0]
+SOLUTION = DLXSolver.solve_board(load_board(HARD)).to_string()
+# Few enough blanks for annealing alone to fill in quickly
+BLANKS = set(random.Random(3).sample(range(81), 30))
+PUZZLE = "".join("." if index in BLANKS else digit for index, digit in enumerate(SOLUTION))
+
+
+def _recount(annealer):
+    """ The score worked out from scratch, repeats in the rows and columns. """
+    size = annealer.size
+    score = 0
+    for line in range(size):
+        row = [annealer.values[line * size + x] for x in range(size)]
+        column = [annealer.values[y * size + line] for y in range(size)]
+        score += (size - len(set(row))) + (size - len(set(column)))
+    return score
+
+
+def test_fillings_keep_sections_and_clues():
+    annealer = Annealer(load_board(HARD), random.Random(0))
+    for _ in range(3):
+        for section in annealer.sections:
+            assert sorted(annealer.values[index] for index in section) == list(range(1, 10))
+        assert all(not annealer.fixed[index] or annealer.values[index] == int(digit)
+                   for index, digit in enumerate(HARD.replace(".", "0")))
+        annealer.randomize()
+
+
+def test_swaps_keep_the_score():
+    rng = random.Random(1)
+    annealer = Annealer(load_board(HARD), rng)
+    assert annealer.score == _recount(annealer)
+    for _ in range(500):
+        score = annealer.score
+        first, second = rng.sample(rng.choice(annealer.movable), 2)
+        delta = annealer._swap(first, second)
+        assert annealer.score == score + delta == _recount(annealer)
+
+
+@pytest.mark.parametrize("restart_policy", RESTART_POLICIES)
+@pytest.mark.parametrize("schedule", sorted(SCHEDULES))
+def test_anneals_to_a_solution(schedule, restart_policy):
+    annealer = Annealer(load_board(PUZZLE), random.Random(1))
+    assert annealer.anneal(schedule=schedule, restart_policy=restart_policy)
+    assert annealer.best_score == 0
+    board = load_board(PUZZLE)
+    annealer.write_to(board)
+    assert board.to_string() == SOLUTION
+
+
+def test_restarts_and_budgets():
+    for restart_policy in RESTART_POLICIES:
+        annealer = Annealer(load_board(HARD), random.Random(2))
+        assert not annealer.anneal(restart_after=100, max_restarts=3, restart_policy=restart_policy)
+        assert annealer.restarts == 3 and 0 < annealer.best_score <= annealer.score == _recount(annealer)
+    annealer = Annealer(load_board(HARD), random.Random(2))
+    assert not annealer.anneal(max_iterations=1000)
+    assert annealer.iterations == 1000
+    annealer = Annealer(load_board(HARD), random.Random(2))
+    assert not annealer.anneal(time_limit=0.05)
+    assert annealer.iterations > 0
+
+
+def test_unknown_options():
+    annealer = Annealer(load_board(PUZZLE))
+    with pytest.raises(ValueError):
+        annealer.anneal(schedule="exponential")
+    with pytest.raises(ValueError):
+        annealer.anneal(restart_policy="never")
+
+
+def test_solver():
+    stats = SolveStats()
+    board = StochasticSolver.solve_board(load_board(PUZZLE), stats=stats, propagate=False, seed=4)
+    assert verify(PUZZLE, board.to_string())
+    assert stats.nodes > 0
+    # The same seed searches the same way
+    again = SolveStats()
+    StochasticSolver.solve_board(load_board(PUZZLE), stats=again, propagate=False, seed=4)
+    assert again.nodes == stats.nodes
+    # Propagation fills in everything for easy puzzles, so there's nothing left to anneal
+    puzzle = load_corpus("easy")[0]
+    assert verify(puzzle, StochasticSolver.solve_board(load_board(puzzle), seed=4).to_string())
+
+
+def test_stopped_early_and_conflicting_clues():
+    board = StochasticSolver.solve_board(load_board(HARD), propagate=False, seed=0, max_iterations=100)
+    assert "." not in board.to_string() and not board.is_solved()
+    puzzle = "11" + "." * 79
+    board = StochasticSolver.solve_board(load_board(puzzle), propagate=False, seed=0)
+    assert board.to_string() == puzzle
@@ -0,0 +1,57 @@
+import pytest
+from benchmark import load_corpus
+from conftest import load_board
+from dlx_solver import DLXSolver
+from engines import verify
+
+np = pytest.importorskip("numpy")
+from vectorized import (candidate_masks, find_invalid, load_grids, propagate_singles,  # noqa: E402
+                        solve_vectorized, to_strings)
+
+PUZZLES = load_corpus("easy")[:10] + load_corpus("hard")[:5] + load_corpus("17clue")[:5]
+SOLUTIONS = [DLXSolver.solve_board(load_board(puzzle)).to_string() for puzzle in PUZZLES]
+
+
+def test_load_grids_round_trip():
+    grids = load_grids(PUZZLES)
+    assert grids.shape == (len(PUZZLES), 9, 9) and grids.dtype == np.uint8
+    assert to_strings(grids) == [puzzle.replace("0", ".") for puzzle in PUZZLES]
+
+
+@pytest.mark.parametrize("puzzle", ["x" + "." * 80, " " + "." * 80, "A" + "." * 80, "-1" + "." * 79,
+                                    "é" + "." * 80, "." * 80, "." * 82])
+def test_load_grids_rejects_bad_puzzles(puzzle):
+    with pytest.raises(ValueError):
+        load_grids([PUZZLES[0], puzzle])
+
+
+def test_candidate_masks_match_the_boards():
+    masks = candidate_masks(load_grids(PUZZLES))
+    for puzzle, puzzle_masks in zip(PUZZLES, masks):
+        board = load_board(puzzle)
+        for y in range(9):
+            for x in range(9):
+                expected = 0 if board.contains_value(x, y) else board.get_candidate_mask(x, y)
+                assert puzzle_masks[y, x] == expected
+
+
+def test_find_invalid():
+    puzzles = [PUZZLES[0], "11" + "." * 79, "1" + "." * 8 + "1" + "." * 71, "1" + "." * 9 + "1" + "." * 70]
+    assert find_invalid(load_grids(puzzles)).tolist() == [False, True, True, True]
+
+
+def test_propagate_singles_keeps_the_solutions():
+    grids, solved, dead = propagate_singles(load_grids(PUZZLES + ["11" + "." * 79]))
+    assert dead.tolist() == [False] * len(PUZZLES) + [True]
+    assert solved[:10].all()  # Singles are enough for the easy ones
+    for partial, solution in zip(to_strings(grids), SOLUTIONS):
+        assert all(cell in ".0" or cell == digit for cell, digit in zip(partial, solution))
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 4096])
+def test_solve_vectorized(batch_size):
+    puzzles = PUZZLES + ["11" + "." * 79]
+    solutions = list(solve_vectorized(iter(puzzles), batch_size=batch_size))
+    assert solutions[:-1] == SOLUTIONS
+    assert all(verify(puzzle, solution) for puzzle, solution in zip(PUZZLES, solutions))
+    assert "." in solutions[-1]